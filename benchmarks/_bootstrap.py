@@ -0,0 +1,40 @@
+"""
+Import setup shared by the benchmarks, which run as scripts from any directory.
+
+`add_paths` puts `summarisation` and `extraction` on `sys.path`, as their
+modules import each other flat, and the repository's parent directory, so that
+modules with package-relative imports (`extractive`, `process`) can be loaded
+through the repository package with `repo_module`.
+"""
+import os
+import sys
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_paths():
+    for path in [os.path.dirname(ROOT), os.path.join(ROOT, "summarisation"), os.path.join(ROOT, "extraction")]:
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def repo_module(name):
+    """
+    The module `name` (e.g. "summarisation.extractive") of the repository package.
+    """
+    add_paths()
+    module = importlib.import_module(f"{os.path.basename(ROOT)}.{name}")
+    if name == "summarisation.extractive":
+        # process.py imports extractive flat; registering the package module under that name
+        # keeps a single copy, whose relative imports work
+        module = sys.modules.setdefault("extractive", module)
+    return module
+
+
+def process_module():
+    """
+    `summarisation.process`, which mixes package-relative and flat imports.
+    """
+    repo_module("summarisation.extractive")
+    return repo_module("summarisation.process")
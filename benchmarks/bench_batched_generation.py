@@ -0,0 +1,85 @@
+"""
+Compares per-prompt `generate_summary` against `generate_summaries_batch` on CPU
+with a tiny stand-in model, reporting generated tokens per second.
+
+    python benchmarks/bench_batched_generation.py --docs 4 --max-new-tokens 32
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from categorical_corpus import categorical_phrases
+from preprocess import chunk_text_by_word_limit
+from summarise import generate_summary, generate_summaries_batch, prompt_handler
+from tiny_lm import load_tiny_lm
+
+
+class CountingModel:
+    """
+    Wraps a model and counts the non-padding tokens produced by `generate`.
+    """
+
+    def __init__(self, model, pad_token_id):
+        self.model = model
+        self.pad_token_id = pad_token_id
+        self.new_tokens = 0
+
+    def generate(self, **kwargs):
+        out = self.model.generate(**kwargs)
+        new = out[:, kwargs["input_ids"].shape[1]:]
+        self.new_tokens += int((new != self.pad_token_id).sum())
+        return out
+
+
+def synthetic_document(seed, n_sentences=60):
+    import random
+    rnd = random.Random(seed)
+    phrases = sorted(p for phrases in categorical_phrases.values() for p in phrases)
+    return " ".join(
+        " ".join(rnd.choice(phrases) for _ in range(rnd.randint(4, 12))).capitalize() + "."
+        for _ in range(n_sentences)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=4)
+    parser.add_argument("--chunk-words", type=int, default=150)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed) for seed in range(args.docs)]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea") + prompt_handler("", "abstract")]
+    model, tokenizer = load_tiny_lm(corpus)
+
+    requests = []
+    for doc_id, document in enumerate(documents):
+        for summary_type in ["eea", "ea", "abstract"]:
+            for chunk_idx, chunk in enumerate(chunk_text_by_word_limit(document, args.chunk_words)):
+                requests.append(((doc_id, summary_type, chunk_idx), chunk, summary_type, "inabs"))
+
+    single = CountingModel(model, tokenizer.pad_token_id)
+    start = time.perf_counter()
+    for _, text, summary_type, dataset in requests:
+        generate_summary(text, single, tokenizer, device="cpu", dataset=dataset, type=summary_type,
+                         max_new_tokens=args.max_new_tokens)
+    single_time = time.perf_counter() - start
+
+    batched = CountingModel(model, tokenizer.pad_token_id)
+    start = time.perf_counter()
+    summaries = generate_summaries_batch(requests, batched, tokenizer, device="cpu",
+                                         batch_size=args.batch_size, max_new_tokens=args.max_new_tokens)
+    batched_time = time.perf_counter() - start
+    assert set(summaries) == {key for key, _, _, _ in requests}
+
+    print(f"prompts: {len(requests)}")
+    print(f"per-prompt: {single_time:.2f}s, {single.new_tokens / single_time:.1f} tokens/s")
+    print(f"batched:    {batched_time:.2f}s, {batched.new_tokens / batched_time:.1f} tokens/s "
+          f"({single_time / batched_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
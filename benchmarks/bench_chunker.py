@@ -0,0 +1,50 @@
+"""
+Compares the word-limit chunker with the token-aware chunker on the longest ILC
+cases: chunk counts, how many chunks overflow the model context once the prompt
+and generation budget are added, and chunking time.
+
+    python benchmarks/bench_chunker.py --model phi-4 --cases 20
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from datasets import load_dataset
+from transformers import AutoTokenizer
+from config import MODELS, MAX_SEQ_LEN, MAX_NEW_TOK
+from preprocess import chunk_text_by_word_limit, chunk_text_by_token_limit
+from summarise import prompt_overhead_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="phi-4", choices=list(MODELS))
+    parser.add_argument("--cases", type=int, default=20, help="number of longest ILC test cases")
+    parser.add_argument("--overlap", type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(MODELS[args.model])
+    max_len = MAX_SEQ_LEN[args.model]
+    reserved = prompt_overhead_tokens(tokenizer, "abstract", "ilc") + MAX_NEW_TOK
+
+    cases = load_dataset("d0r1h/ILC", split="test")["Case"]
+    cases = sorted(cases, key=len, reverse=True)[:args.cases]
+
+    for name, chunker in [
+        ("word limit", lambda text: chunk_text_by_word_limit(text, word_limit=max_len)),
+        ("token limit", lambda text: chunk_text_by_token_limit(text, tokenizer, max_len, reserved, args.overlap)),
+    ]:
+        start = time.perf_counter()
+        chunked = [chunker(text) for text in cases]
+        elapsed = time.perf_counter() - start
+
+        lengths = [len(ids) for chunks in chunked for ids in tokenizer(chunks, add_special_tokens=False)["input_ids"]]
+        overflow = sum(length + reserved > max_len for length in lengths)
+        print(f"{name:>11}: {elapsed:.2f}s, {len(lengths)} chunks, max {max(lengths)} tokens, "
+              f"{overflow} overflow {max_len} with {reserved} reserved")
+
+
+if __name__ == "__main__":
+    main()
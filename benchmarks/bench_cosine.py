@@ -0,0 +1,55 @@
+"""
+Per-pair sklearn `cosine_similarity` calls against the vectorized
+`paired_cosine_similarity`, and sklearn against `cosine_similarity_matrix` for
+the many-vs-many mode, on random 768-d embeddings. Checks the scores agree.
+
+    python benchmarks/bench_cosine.py --pairs 20000
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from evaluate import paired_cosine_similarity, cosine_similarity_matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--matrix", type=int, default=2000, help="rows per side for the many-vs-many check")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gen = rng.standard_normal((args.pairs, args.dim), dtype=np.float32)
+    ref = rng.standard_normal((args.pairs, args.dim), dtype=np.float32)
+
+    start = time.perf_counter()
+    loop = [cosine_similarity([g], [r])[0][0] for g, r in zip(gen, ref)]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = paired_cosine_similarity(gen, ref)
+    vectorized_time = time.perf_counter() - start
+    assert vectorized.dtype == np.float32
+    assert np.allclose(loop, vectorized, atol=1e-6)
+    print(f"paired, {args.pairs} pairs: loop {loop_time:.3f}s, vectorized {vectorized_time:.4f}s "
+          f"({loop_time / vectorized_time:.0f}x)")
+
+    a, b = gen[:args.matrix], ref[:args.matrix]
+    start = time.perf_counter()
+    expected = cosine_similarity(a, b)
+    sklearn_time = time.perf_counter() - start
+    start = time.perf_counter()
+    matrix = cosine_similarity_matrix(a, b)
+    matrix_time = time.perf_counter() - start
+    assert matrix.dtype == np.float32 and matrix.shape == (len(a), len(b))
+    assert np.allclose(expected, matrix, atol=1e-5)
+    print(f"matrix {matrix.shape}: sklearn {sklearn_time:.3f}s, float32 {matrix_time:.3f}s, {matrix.nbytes / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
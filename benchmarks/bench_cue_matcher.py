@@ -0,0 +1,78 @@
+"""
+Compares the single-pass cue phrase automaton against the original substring loops
+on IN-Abs judgments.
+
+    python benchmarks/bench_cue_matcher.py --limit 20
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import nltk
+from datasets import load_dataset
+from categorical_corpus import categorical_pairs, categorical_phrases
+from cue_matcher import CueMatcher
+from extraction import clean_and_normalize
+
+
+def substring_match(sentence):
+    """
+    The original per-phrase loops from `rank_by_categories`.
+    """
+    results = {category: {'score': 0, 'phrases': []} for category in categorical_phrases}
+    for category, phrases in categorical_phrases.items():
+        for phrase in phrases:
+            if phrase in sentence:
+                results[category]['score'] += 1
+                results[category]['phrases'].append(phrase)
+
+    for category, pairs in categorical_pairs.items():
+        for start_phrase, end_phrases in pairs.items():
+            if start_phrase in sentence:
+                start_index = sentence.find(start_phrase)
+                sentence_after_start = sentence[start_index + len(start_phrase):]
+                matched_end_phrases = [end_phrase for end_phrase in end_phrases if end_phrase in sentence_after_start]
+                results[category]['score'] += len(matched_end_phrases)
+                results[category]['phrases'].extend(matched_end_phrases)
+    return results
+
+
+def load_sentences(limit):
+    documents = load_dataset("Ashreen/dataset-IN-Abs", split="test")["document"][:limit]
+    return [clean_and_normalize(sent) for doc in documents for sent in nltk.sent_tokenize(doc)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=20, help="number of IN-Abs test documents")
+    args = parser.parse_args()
+
+    sentences = load_sentences(args.limit)
+
+    start = time.perf_counter()
+    matcher = CueMatcher(categorical_phrases, categorical_pairs)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [substring_match(sent) for sent in sentences]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [matcher.match(sent) for sent in sentences]
+    matcher_time = time.perf_counter() - start
+
+    for exp, act in zip(expected, actual):
+        for category in exp:
+            assert exp[category]['score'] == act[category]['score']
+            assert sorted(exp[category]['phrases']) == sorted(act[category]['phrases'])
+
+    print(f"documents: {args.limit}, sentences: {len(sentences)}, patterns: {len(matcher.patterns)}")
+    print(f"automaton build: {build_time:.3f}s")
+    print(f"substring loops: {loop_time:.3f}s")
+    print(f"cue matcher:     {matcher_time:.3f}s ({loop_time / matcher_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
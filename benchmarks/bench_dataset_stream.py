@@ -0,0 +1,78 @@
+"""
+Peak memory of reading a split through `DatasetHandler.dataset_loader` (both
+splits as DataFrames) against streaming it with `iter_documents`. Each mode runs
+in its own process; both must see the same documents.
+
+    python benchmarks/bench_dataset_stream.py --dataset ilc --split train
+"""
+import sys
+import json
+import time
+import hashlib
+import argparse
+import resource
+import subprocess
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import pandas as pd
+from config import DATASET_INDEX, DATASET_DOC, SUMMARY_NAME
+from dataset import DatasetHandler
+
+
+def load_split(handler, dataset_name, split):
+    loaded = handler.dataset_loader(dataset_name)
+    if isinstance(loaded, pd.DataFrame):
+        # civilsum is a single local csv
+        return loaded
+    train_set, test_set = loaded
+    return test_set if split == "test" else train_set
+
+
+def records(mode, dataset_name, split):
+    handler = DatasetHandler()
+    if mode == "stream":
+        yield from handler.iter_documents(dataset_name, split)
+        return
+    df = load_split(handler, dataset_name, split)
+    for _, row in df.iterrows():
+        yield row[DATASET_INDEX[dataset_name]], row[DATASET_DOC[dataset_name]], row[SUMMARY_NAME[dataset_name]]
+
+
+def child(args):
+    start = time.perf_counter()
+    digest = hashlib.sha1()
+    count = 0
+    for doc_id, text, reference in records(args.child, args.dataset, args.split):
+        digest.update(f"{doc_id}\0{text}\0{reference}\0".encode("utf-8"))
+        count += 1
+    json.dump({
+        "elapsed": time.perf_counter() - start,
+        "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "count": count,
+        "digest": digest.hexdigest(),
+    }, sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="ilc")
+    parser.add_argument("--split", default="train")
+    parser.add_argument("--child", choices=["dataframe", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    runs = {}
+    for mode in ["dataframe", "stream"]:
+        out = subprocess.run([sys.executable, __file__, "--child", mode, "--dataset", args.dataset, "--split", args.split],
+                             check=True, capture_output=True, text=True).stdout
+        runs[mode] = json.loads(out[out.index("{"):])
+        print(f"{mode:>9}: {runs[mode]['count']} documents in {runs[mode]['elapsed']:.1f}s, "
+              f"peak RSS {runs[mode]['peak_mb']:.0f} MB")
+    assert runs["dataframe"]["digest"] == runs["stream"]["digest"], "streamed documents differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Generation with and without request deduplication in `chunked_generate_summaries`,
+on the eea, ea and abstract inputs `process_dataset` builds for a plan of
+synthetic judgments, with a tiny stand-in model. For each dataset prompt, checks
+that both runs return the same summaries and reports the generations run and time.
+`--repeats` adds copies of the first judgments, as datasets that collect the same
+judgment twice have.
+
+    python benchmarks/bench_dedup.py --docs 8 --datasets civilsum inabs
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from config import THRESHOLD, TOKEN_BUDGETS
+from summarise import prompt_handler
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+extractive = _bootstrap.repo_module("summarisation.extractive")
+process = _bootstrap.process_module()
+
+
+def plan_inputs(documents, dataset):
+    extracts = [formatted for _, formatted in extractive.extract_batch(documents, THRESHOLD[dataset], workers=1)]
+    inputs = []
+    for doc_id, (document, extract) in enumerate(zip(documents, extracts)):
+        inputs += [(doc_id, "eea", extract), (doc_id, "ea", extract), (doc_id, "abstract", document)]
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--datasets", nargs="+", default=["civilsum", "inabs"])
+    parser.add_argument("--context", type=int, default=3072)
+    parser.add_argument("--max-new-tokens", type=int, default=32, help="one budget for every generation")
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed, n_sentences=args.sentences) for seed in range(args.docs)]
+    documents += documents[:args.repeats]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea") + prompt_handler("", "abstract")]
+    model, tokenizer = load_tiny_lm(corpus)
+
+    # Short budgets keep the CPU run quick; token_budget reads config.TOKEN_BUDGETS at call time
+    TOKEN_BUDGETS.update({summary_type: {"chunk_ratio": 0, "chunk_min": args.max_new_tokens,
+        "chunk_max": args.max_new_tokens, "final": args.max_new_tokens} for summary_type in ["eea", "ea", "abstract"]})
+    for dataset in args.datasets:
+        inputs = plan_inputs(documents, dataset)
+        results = {}
+        for deduplicate in [False, True]:
+            usage, deduplicated = {}, {}
+            start = time.perf_counter()
+            results[deduplicate] = process.chunked_generate_summaries(inputs, dataset, args.context, model, tokenizer,
+                device="cpu", stop_on_degeneration=False, token_usage=usage, deduplicate=deduplicate,
+                deduplicated=deduplicated)
+            elapsed = time.perf_counter() - start
+            print(f"{dataset:>8} deduplicate {str(deduplicate):>5}: {len(usage) - len(deduplicated)} generations, "
+                  f"{len(deduplicated)} served from another, {elapsed:.2f}s")
+        assert results[True] == results[False], f"{dataset}: deduplicated summaries differ"
+    print(f"{len(documents)} documents: summaries identical with and without deduplication")
+
+
+if __name__ == "__main__":
+    main()
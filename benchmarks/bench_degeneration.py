@@ -0,0 +1,76 @@
+"""
+Decode time of `generate_summaries_batch` with and without the online
+degeneration stop, using a tiny randomly initialised model (whose greedy output
+loops, like the small Llama models do). Checks that rows which are not stopped
+come out unchanged and that stopped rows are prefixes of the full output, and
+that a refusal is stopped as a punt.
+
+    python benchmarks/bench_degeneration.py --prompts 16 --max-new-tokens 512
+"""
+import time
+import argparse
+from collections import Counter
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import torch
+from config import DEGENERATION_PUNT_WINDOW
+from degeneration import DegenerationStop
+from summarise import generate_summaries_batch, prompt_handler
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+
+def check_punt(tokenizer):
+    """
+    Feed a refusal to the criterion one token at a time, as generate() would.
+    """
+    prompt = tokenizer("summary:")["input_ids"]
+    reply = tokenizer("I cannot provide a summary of this judgment because " * 4)["input_ids"]
+    stop = DegenerationStop(len(prompt), tokenizer)
+    for step in range(1, len(reply) + 1):
+        if stop(torch.tensor([prompt + reply[:step]]), None)[0]:
+            return stop.reasons[0], step
+    return None, len(reply)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed, n_sentences=10) for seed in range(args.prompts)]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea")]
+    model, tokenizer = load_tiny_lm(corpus, seed=1)
+    requests = [(i, document, "abstract", "civilsum") for i, document in enumerate(documents)]
+
+    results = {}
+    for stop_on_degeneration in [False, True]:
+        stop_reasons = {}
+        start = time.perf_counter()
+        summaries = generate_summaries_batch(requests, model, tokenizer, device="cpu", batch_size=args.batch_size,
+            max_new_tokens=args.max_new_tokens, stop_on_degeneration=stop_on_degeneration, stop_reasons=stop_reasons)
+        elapsed = time.perf_counter() - start
+        results[stop_on_degeneration] = summaries, stop_reasons
+        tokens = sum(len(tokenizer(s)["input_ids"]) for s in summaries.values())
+        print(f"stop on degeneration {str(stop_on_degeneration):>5}: {elapsed:6.2f}s, {tokens} summary tokens, "
+              f"stopped {dict(Counter(r for r in stop_reasons.values() if r))}")
+
+    (full, _), (stopped, reasons) = results[False], results[True]
+    for key in full:
+        if reasons[key] is None:
+            assert stopped[key] == full[key], f"{key}: unstopped output changed"
+        else:
+            assert full[key].startswith(stopped[key]), f"{key}: stopped output is not a prefix of the full one"
+    print("unstopped rows identical, stopped rows are prefixes of the full output")
+
+    reason, step = check_punt(tokenizer)
+    assert reason == "punt" and step == DEGENERATION_PUNT_WINDOW
+    print(f"refusal stopped as a punt after {step} tokens")
+
+
+if __name__ == "__main__":
+    main()
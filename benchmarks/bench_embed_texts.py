@@ -0,0 +1,82 @@
+"""
+Throughput (texts/sec) of the length-sorted, token-budget `embed_texts` against
+the previous fixed-size DataLoader loop, on summaries of mixed length, and the
+largest difference in the embeddings each variant produces.
+
+    python benchmarks/bench_embed_texts.py --texts 256
+    python benchmarks/bench_embed_texts.py --model /path/to/bert --texts 256
+"""
+import time
+import random
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from evaluate import embed_texts, scorers
+
+
+def legacy_embed_texts(texts, tokenizer, model, device, batch_size=8):
+    """
+    `embed_texts` as it was: input order, fixed batch size, padded to the longest text.
+    """
+    embeddings = []
+    with torch.no_grad():
+        for batch in DataLoader(texts, batch_size=batch_size):
+            batch = list(batch)
+            inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
+            outputs = model(**inputs)
+            attention_mask = inputs['attention_mask'].unsqueeze(-1)
+            hidden_states = outputs.last_hidden_state * attention_mask
+            summed = hidden_states.sum(dim=1)
+            counts = attention_mask.sum(dim=1).clamp(min=1e-9)
+            embeddings.append((summed / counts).cpu())
+    return torch.cat(embeddings, dim=0).numpy()
+
+
+def mixed_length_texts(n, seed=0):
+    rnd = random.Random(seed)
+    words = ("the court held that appellant respondent section act appeal dismissed allowed evidence "
+             "high court tribunal order petition writ contract property tax notice").split()
+    # Mostly short summaries with the occasional very long one, as in generated output
+    return [" ".join(rnd.choice(words) for _ in range(rnd.choice([30, 60, 90, 120, 600]))) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="law-ai/InLegalBERT")
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    device = "cpu"
+    texts = mixed_length_texts(args.texts)
+    tokenizer, model = scorers.embedding_model(args.model, device)
+    _, model_int8 = scorers.embedding_model(args.model, device, int8=True)
+
+    start = time.perf_counter()
+    reference = legacy_embed_texts(texts, tokenizer, model, device, args.batch_size)
+    legacy_time = time.perf_counter() - start
+    print(f"{'DataLoader loop':>22}: {args.texts / legacy_time:8.1f} texts/s")
+
+    variants = [
+        ("token budget", lambda: embed_texts(texts, tokenizer, model, device, args.batch_size)),
+        ("token budget + bf16", lambda: embed_texts(texts, tokenizer, model, device, args.batch_size, bf16=True)),
+        ("token budget + int8", lambda: embed_texts(texts, tokenizer, model_int8, device, args.batch_size)),
+    ]
+    for name, run in variants:
+        start = time.perf_counter()
+        emb = run()
+        elapsed = time.perf_counter() - start
+        cos = (emb * reference).sum(1) / np.linalg.norm(emb, axis=1) / np.linalg.norm(reference, axis=1)
+        print(f"{name:>22}: {args.texts / elapsed:8.1f} texts/s ({legacy_time / elapsed:.1f}x), "
+              f"max abs diff {np.abs(emb - reference).max():.1e}, min cosine to legacy {cos.min():.4f}")
+        if name == "token budget":
+            assert np.allclose(emb, reference, atol=1e-4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Wall-clock and peak memory of scoring three summary columns with BERTScore and
+InLegalBERT similarity, before (each call loads its model and scores one column)
+and after (models kept in the `ScorerRegistry`, all columns in one pass). Each
+mode runs in its own process so peak RSS is measured separately; the scores of
+the two modes are checked to agree.
+
+    python benchmarks/bench_evaluation.py --docs 50
+    python benchmarks/bench_evaluation.py --bert-model /path/to/bert --num-layers 2 --embedding-model /path/to/bert
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+
+import _bootstrap
+_bootstrap.add_paths()
+
+COLUMNS = ["eea_summary", "ea_summary", "abstract"]
+
+
+def synthetic_columns(n_docs, seed=0):
+    rnd = random.Random(seed)
+    words = ("the court held that appellant respondent section act appeal dismissed allowed evidence "
+             "high court tribunal order petition writ contract property tax notice").split()
+    def summary():
+        return " ".join(rnd.choice(words) for _ in range(rnd.randint(40, 120))) + "."
+    references = [summary() for _ in range(n_docs)]
+    return {name: [summary() for _ in range(n_docs)] for name in COLUMNS}, references
+
+
+def run_before(columns, references, args):
+    from transformers import AutoTokenizer, AutoModel
+    from sklearn.metrics.pairwise import cosine_similarity
+    from bert_score import BERTScorer
+    from evaluate import get_device
+    from bench_embed_texts import legacy_embed_texts
+
+    results = {}
+    for name, generated in columns.items():
+        scorer = BERTScorer(model_type=args.bert_model, num_layers=args.num_layers, lang="en",
+                            device="cpu", batch_size=8, rescale_with_baseline=False)
+        P, R, F1 = scorer.score(generated, references, batch_size=8)
+        results[f"{name}_bertscore_f1"] = F1.numpy().tolist()
+    for name, generated in columns.items():
+        device = get_device()
+        tokenizer = AutoTokenizer.from_pretrained(args.embedding_model)
+        model = AutoModel.from_pretrained(args.embedding_model).to(device)
+        model.eval()
+        gen_emb = legacy_embed_texts(generated, tokenizer, model, device, 8)
+        ref_emb = legacy_embed_texts(references, tokenizer, model, device, 8)
+        results[f"{name}_inlegalbert_sim"] = [float(cosine_similarity([g], [r])[0][0]) for g, r in zip(gen_emb, ref_emb)]
+    return results
+
+
+def run_after(columns, references, args):
+    from evaluate import compute_bertscore_columns, compute_semantic_similarity_columns
+
+    results = {}
+    for name, berts in compute_bertscore_columns(columns, references, args.bert_model, num_layers=args.num_layers).items():
+        results[f"{name}_bertscore_f1"] = berts["f1"]
+    for name, sims in compute_semantic_similarity_columns(columns, references, args.embedding_model).items():
+        results[f"{name}_inlegalbert_sim"] = [float(s) for s in sims]
+    return results
+
+
+def child(args):
+    columns, references = synthetic_columns(args.docs)
+    run = run_before if args.child == "before" else run_after
+    start = time.perf_counter()
+    results = run(columns, references, args)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    json.dump({"elapsed": elapsed, "peak_mb": peak_mb, "results": results}, sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--bert-model", default="roberta-large")
+    parser.add_argument("--num-layers", type=int, default=None)
+    parser.add_argument("--embedding-model", default="law-ai/InLegalBERT")
+    parser.add_argument("--child", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    runs = {}
+    for mode in ["before", "after"]:
+        cmd = [sys.executable, __file__, "--child", mode, "--docs", str(args.docs),
+               "--bert-model", args.bert_model, "--embedding-model", args.embedding_model]
+        if args.num_layers is not None:
+            cmd += ["--num-layers", str(args.num_layers)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        runs[mode] = json.loads(out[out.index("{"):])
+        print(f"{mode:>6}: {runs[mode]['elapsed']:.2f}s, peak RSS {runs[mode]['peak_mb']:.0f} MB")
+
+    worst = max(
+        abs(a - b)
+        for name in runs["before"]["results"]
+        for a, b in zip(runs["before"]["results"][name], runs["after"]["results"][name])
+    )
+    assert worst < 1e-4, worst
+    print(f"speedup {runs['before']['elapsed'] / runs['after']['elapsed']:.1f}x, max score difference {worst:.1e}")
+
+
+if __name__ == "__main__":
+    main()
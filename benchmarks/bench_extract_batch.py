@@ -0,0 +1,41 @@
+"""
+Times `extract_batch` over the IN-Abs test split with 1, 2, 4 and 8 workers.
+
+    python benchmarks/bench_extract_batch.py --limit 100
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from datasets import load_dataset
+
+extractive = _bootstrap.repo_module("summarisation.extractive")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=None, help="number of IN-Abs test documents")
+    parser.add_argument("--threshold", type=float, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    documents = load_dataset("Ashreen/dataset-IN-Abs", split="test")["document"]
+    documents = documents[:args.limit] if args.limit else documents
+
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = list(extractive.extract_batch(documents, args.threshold, workers=workers))
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = (results, elapsed)
+        assert results == baseline[0], f"{workers} workers changed the output"
+        print(f"workers={workers}: {elapsed:.2f}s, {len(documents) / elapsed:.2f} docs/s, "
+              f"{baseline[1] / elapsed:.2f}x vs workers={args.workers[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cost of the stage profiler on extraction and batched generation with a tiny
+stand-in model: the same work is timed with profiling off and on, then the
+per-document columns of one document and a Chrome trace are written.
+
+    python benchmarks/bench_profiling.py --docs 8 --trace /tmp/trace.json
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from profiling import profiler
+from preprocess import chunk_text_by_word_limit
+from summarise import generate_summaries_batch, prompt_handler
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+extractive = _bootstrap.repo_module("summarisation.extractive")
+
+
+def run(documents, model, tokenizer, args):
+    extracted = list(extractive.extract_batch(documents, 0.1, workers=args.workers, doc_ids=range(len(documents))))
+    for doc_id, (_, formatted) in enumerate(extracted):
+        with profiler.document(doc_id):
+            requests = [((doc_id, chunk_idx), chunk, "eea", "civilsum")
+                        for chunk_idx, chunk in enumerate(chunk_text_by_word_limit(formatted, args.chunk_words))]
+            generate_summaries_batch(requests, model, tokenizer, device="cpu", max_new_tokens=args.max_new_tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--chunk-words", type=int, default=150)
+    parser.add_argument("--max-new-tokens", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--trace", default=None)
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed) for seed in range(args.docs)]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea")]
+    model, tokenizer = load_tiny_lm(corpus)
+    run(documents[:1], model, tokenizer, args)
+
+    timings = {}
+    for enabled in [False, True]:
+        best = float("inf")
+        for _ in range(args.repeats):
+            profiler.reset()
+            profiler.enable(enabled)
+            start = time.perf_counter()
+            run(documents, model, tokenizer, args)
+            best = min(best, time.perf_counter() - start)
+        timings[enabled] = best
+        print(f"profiling {'on ' if enabled else 'off'}: {best:.3f}s, {len(profiler.records)} stage records")
+    print(f"overhead: {100 * (timings[True] / timings[False] - 1):+.1f}%")
+
+    for column, value in sorted(profiler.document_columns(0).items()):
+        print(f"  {column}: {value:.4g}")
+    if args.trace:
+        profiler.write_trace(args.trace)
+        print(f"trace written to {args.trace}")
+    profiler.enable(False)
+
+
+if __name__ == "__main__":
+    main()
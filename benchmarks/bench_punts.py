@@ -0,0 +1,82 @@
+"""
+Per-row `is_punt_response` against the batched `detect_punts` on a synthetic
+results table, checking that both flag the same rows. The per-row loop is only
+run on the first `--legacy-rows` rows and its time for the full table is
+extrapolated from them.
+
+    python benchmarks/bench_punts.py --rows 10000
+    python benchmarks/bench_punts.py --rows 2000 --model /path/to/sentence-transformer
+"""
+import os
+import time
+import random
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_similarity
+from sentence_transformers import SentenceTransformer, models
+from punts import generic_punts, is_punt_response, detect_punts
+from legal_text import generated_summary
+
+SUMMARY_COLS = ["abstract_summary", "ea_summary", "eea_summary"]
+PUNTS = ["I cannot provide legal advice on this matter.", "Please provide the text you want summarised.",
+         "I'm unable to summarise this judgment."]
+
+
+def results_table(rows, seed=0):
+    rnd = random.Random(seed)
+
+    def response(i):
+        # About one response in twenty is a punt, and generated summaries vary in length
+        if rnd.random() < 0.05:
+            return rnd.choice(PUNTS)
+        return generated_summary(rnd.choice([40, 80, 120, 250]), seed=i)
+
+    return pd.DataFrame({col: [response(i) for i in range(rows)] for col in SUMMARY_COLS})
+
+
+def load_model(path):
+    if os.path.isdir(path) and not os.path.exists(os.path.join(path, "modules.json")):
+        # A plain Hugging Face encoder, mean pooled
+        transformer = models.Transformer(path)
+        return SentenceTransformer(modules=[transformer, models.Pooling(transformer.get_word_embedding_dimension())])
+    return SentenceTransformer(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--legacy-rows", type=int, default=200)
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-mpnet-base-v2")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    df = results_table(args.rows)
+    model = load_model(args.model)
+    generic_embeddings = model.encode(generic_punts)
+
+    legacy = df.head(args.legacy_rows)
+    start = time.perf_counter()
+    expected = {col: [is_punt_response(str(r), model, generic_embeddings) for r in legacy[col]] for col in SUMMARY_COLS}
+    legacy_time = (time.perf_counter() - start) * args.rows / len(legacy)
+    print(f"per-row loop: {legacy_time:8.1f}s for {args.rows} rows (extrapolated from {len(legacy)})")
+
+    start = time.perf_counter()
+    detect_punts(df, SUMMARY_COLS, model, generic_embeddings, batch_size=args.batch_size)
+    batched_time = time.perf_counter() - start
+    print(f"     batched: {batched_time:8.1f}s for {args.rows} rows ({legacy_time / batched_time:.0f}x)")
+
+    for col in SUMMARY_COLS:
+        flags = df[f"{col}_punt"].head(len(legacy)).tolist()
+        assert flags == expected[col], f"{col}: batched flags differ from is_punt_response"
+        reference = cosine_similarity(model.encode(legacy[col].tolist()), generic_embeddings).max(axis=1)
+        assert np.allclose(df[f"{col}_punt_similarity"].head(len(legacy)), reference, atol=1e-4)
+    print(f"flags agree on the first {len(legacy)} rows; {int(sum(df[f'{c}_punt'].sum() for c in SUMMARY_COLS))} punts in total")
+
+
+if __name__ == "__main__":
+    main()
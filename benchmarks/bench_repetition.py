@@ -0,0 +1,109 @@
+"""
+Checks `jaccard_repetition` against the original all-pairs `has_jaccard_repetition`
+on a corpus of synthetic summaries (clean, looping and with near-duplicate
+sentences) and compares their run time as the text grows.
+
+    python benchmarks/bench_repetition.py --docs 200 --sizes 1000 10000 50000
+"""
+import time
+import random
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from nltk.tokenize import sent_tokenize
+from repetition import jaccard_repetition
+from legal_text import generated_summary
+
+
+def original_has_jaccard_repetition(text, threshold=0.95):
+    """
+    The original all-pairs `has_jaccard_repetition`.
+    """
+    sentences = sent_tokenize(text)
+    for i in range(len(sentences)):
+        for j in range(i + 1, len(sentences)):
+            set1 = set(sentences[i].lower().split())
+            set2 = set(sentences[j].lower().split())
+            if len(set1 | set2) == 0:
+                continue
+            sim = len(set1 & set2) / len(set1 | set2)
+            if sim > threshold:
+                return True
+    return False
+
+
+def all_pairs(text, threshold=0.95):
+    sets = [set(sentence.lower().split()) for sentence in sent_tokenize(text)]
+    return [(i, j) for i in range(len(sets)) for j in range(i + 1, len(sets))
+            if sets[i] | sets[j] and len(sets[i] & sets[j]) / len(sets[i] | sets[j]) > threshold]
+
+
+def near_duplicates(n_words, seed):
+    """
+    A summary where some long sentences come back with one word added, as looping generations do.
+    """
+    rnd = random.Random(seed)
+    sentences = sent_tokenize(generated_summary(n_words, seed=seed))
+    for i in range(len(sentences)):
+        if rnd.random() < 0.1 and len(sentences[i].split()) >= 25:
+            sentences.append(sentences[i][:-1] + " again.")
+    rnd.shuffle(sentences)
+    return " ".join(sentences)
+
+
+def corpus(docs):
+    rnd = random.Random(0)
+    texts = []
+    for seed in range(docs):
+        n_words = rnd.choice([100, 300, 1000, 3000])
+        kind = seed % 3
+        if kind == 0:
+            texts.append(generated_summary(n_words, seed=seed))
+        elif kind == 1:
+            texts.append(generated_summary(n_words, seed=seed, repeat_every=rnd.choice([3, 10, 50])))
+        else:
+            texts.append(near_duplicates(n_words, seed))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    texts = corpus(args.docs)
+    repeating = 0
+    for text in texts:
+        expected = original_has_jaccard_repetition(text)
+        report = jaccard_repetition(text)
+        assert bool(report.pairs) == expected
+        assert report.pairs == all_pairs(text)
+        assert report.ratio == len({i for pair in report.pairs for i in pair}) / max(len(report.sentences), 1)
+        repeating += expected
+    print(f"{len(texts)} texts, {repeating} with repetition: booleans, pairs and ratios agree with the all-pairs check")
+
+    # A generation stuck in a loop: the first repeat is enough, without listing every pair
+    looping = " ".join(["The appeal is dismissed with costs."] * 4000)
+    start = time.perf_counter()
+    assert jaccard_repetition(looping, max_pairs=1).pairs == [(0, 1)]
+    print(f"4000-sentence loop: first pair in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for n_words in args.sizes:
+        # No repetition, so the original compares every pair
+        text = generated_summary(n_words, seed=1)
+        start = time.perf_counter()
+        original_has_jaccard_repetition(text)
+        original_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        jaccard_repetition(text)
+        lsh_time = time.perf_counter() - start
+        print(f"{n_words:>7} words: all pairs {original_time * 1000:10.1f} ms, "
+              f"MinHash/LSH {lsh_time * 1000:8.1f} ms ({original_time / lsh_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Run time of `rouge_scores_columns` against one `RougeScorer.score` call per pair
+and per summary column, on synthetic legal summaries. Exact equality of the
+scores is checked by tests/test_rouge_batch.py.
+
+    python benchmarks/bench_rouge.py --docs 200 --workers 4
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from rouge_score import rouge_scorer
+from rouge_batch import rouge_scores_columns
+from bench_batched_generation import synthetic_document
+
+ROUGE_TYPES = ["rouge1", "rouge2", "rougeL"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    references = [synthetic_document(seed, args.sentences) for seed in range(args.docs)]
+    columns = {
+        name: [synthetic_document(10_000 * (k + 1) + seed, args.sentences) for seed in range(args.docs)]
+        for k, name in enumerate(["eea_summary", "ea_summary", "abstract"])
+    }
+    # Identical candidates across columns, as happens when two summary types agree
+    columns["ea_summary"][::5] = columns["eea_summary"][::5]
+
+    scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, use_stemmer=True)
+    start = time.perf_counter()
+    for name, generated in columns.items():
+        for g, r in zip(generated, references):
+            scorer.score(r, g)
+    baseline_time = time.perf_counter() - start
+
+    for workers in [1, args.workers]:
+        start = time.perf_counter()
+        rouge_scores_columns(columns, references, ROUGE_TYPES, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers}: {elapsed:.2f}s vs RougeScorer {baseline_time:.2f}s "
+              f"({baseline_time / elapsed:.1f}x), {len(references) * len(columns)} pairs")
+
+
+if __name__ == "__main__":
+    main()
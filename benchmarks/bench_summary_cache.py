@@ -0,0 +1,77 @@
+"""
+Runs the same batched generation twice against a `SummaryCache` on CPU with a
+tiny stand-in model, then once more with the chunk size changed for half the
+documents, and checks that cached summaries equal freshly generated ones.
+
+    python benchmarks/bench_summary_cache.py --docs 4 --max-new-tokens 32
+"""
+import time
+import shutil
+import argparse
+import tempfile
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from preprocess import chunk_text_by_word_limit
+from summarise import generate_summaries_batch, prompt_handler
+from summary_cache import SummaryCache
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+
+def build_requests(documents, chunk_words):
+    requests = []
+    for doc_id, document in enumerate(documents):
+        for summary_type in ["eea", "abstract"]:
+            for chunk_idx, chunk in enumerate(chunk_text_by_word_limit(document, chunk_words[doc_id])):
+                requests.append(((doc_id, summary_type, chunk_idx), chunk, summary_type, "civilsum"))
+    return requests
+
+
+def timed_run(requests, model, tokenizer, max_new_tokens, summary_cache=None):
+    start = time.perf_counter()
+    summaries = generate_summaries_batch(requests, model, tokenizer, device="cpu",
+                                         max_new_tokens=max_new_tokens, summary_cache=summary_cache)
+    return summaries, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=4)
+    parser.add_argument("--chunk-words", type=int, default=150)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed) for seed in range(args.docs)]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea") + prompt_handler("", "abstract")]
+    model, tokenizer = load_tiny_lm(corpus)
+
+    directory = tempfile.mkdtemp()
+    try:
+        cache = SummaryCache(directory)
+        requests = build_requests(documents, [args.chunk_words] * args.docs)
+        uncached, _ = timed_run(requests, model, tokenizer, args.max_new_tokens)
+        cold, cold_time = timed_run(requests, model, tokenizer, args.max_new_tokens, cache)
+        warm, warm_time = timed_run(requests, model, tokenizer, args.max_new_tokens, cache)
+        assert cold == uncached and warm == uncached
+        print(f"cold: {cold_time:.2f}s, warm: {warm_time:.3f}s, {cache.stats()}")
+
+        # Re-chunk half of the documents: only their prompts should miss
+        cache.hits = cache.misses = 0
+        chunk_words = [args.chunk_words // 2 if doc_id % 2 else args.chunk_words for doc_id in range(args.docs)]
+        requests = build_requests(documents, chunk_words)
+        partial, partial_time = timed_run(requests, model, tokenizer, args.max_new_tokens, cache)
+        assert partial == timed_run(requests, model, tokenizer, args.max_new_tokens)[0]
+        print(f"half re-chunked: {partial_time:.2f}s, {cache.stats()}")
+
+        # A bound smaller than the stored summaries evicts the least recently used ones
+        small = SummaryCache(directory, max_bytes=1024)
+        small.put("probe", "x" * 10)
+        print(f"bounded to 1 KiB: evicted {small.evictions} entries")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
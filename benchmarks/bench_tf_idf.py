@@ -0,0 +1,68 @@
+"""
+Checks the sparse TF-IDF engine against the original per-word definition and
+compares their run time on IN-Abs judgments.
+
+    python benchmarks/bench_tf_idf.py --limit 5
+"""
+import time
+import argparse
+from math import log
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import nltk
+from nltk.corpus import stopwords
+from datasets import load_dataset
+from tf_idf import calculate_tf_idf
+
+
+def original_tf_idf(text):
+    """
+    The original quadratic `calculate_tf_idf`.
+    """
+    text = ' '.join(text)
+    words = nltk.word_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+
+    total_sentences = len(nltk.sent_tokenize(text))
+    tf_idf_scores = {}
+    for word in set(words):
+        if word.lower() not in stop_words:
+            tf = text.lower().count(word.lower())
+            di = sum(1 for sent in nltk.sent_tokenize(text) if word.lower() in sent.lower())
+            di = di if di != 0 else 0.5
+            idf = log(total_sentences / di)
+            tf_idf_scores[word.lower()] = tf * idf
+
+    return tf_idf_scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=5, help="number of IN-Abs test documents")
+    args = parser.parse_args()
+
+    documents = load_dataset("Ashreen/dataset-IN-Abs", split="test")["document"][:args.limit]
+    for idx, document in enumerate(documents):
+        sentences = nltk.sent_tokenize(document)
+
+        start = time.perf_counter()
+        expected = original_tf_idf(sentences)
+        original_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = calculate_tf_idf(sentences)
+        sparse_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        calculate_tf_idf(sentences, proper_tokens=True)
+        token_time = time.perf_counter() - start
+
+        assert actual == expected, f"document {idx}: scores differ"
+        print(f"doc {idx}: {len(document.split())} words, original {original_time:.2f}s, "
+              f"sparse {sparse_time:.3f}s ({original_time / sparse_time:.0f}x), proper tokens {token_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Per-summary-type token budgets against the flat `MAX_NEW_TOK` budget, on chunked
+generation with a tiny stand-in model (which, like a looping model, never stops
+by itself): generated tokens and time for each policy. Also checks that rows with
+their own budget in one batch come out as prefixes of the same batch generated
+with one shared budget.
+
+    python benchmarks/bench_token_budgets.py --docs 2 --flat-budget 512
+"""
+import time
+import copy
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from config import TOKEN_BUDGETS
+from summarise import generate_summaries_batch, prompt_handler, token_budget
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+process = _bootstrap.process_module()
+
+
+def check_row_budgets(model, tokenizer, documents):
+    requests = [(i, document, "abstract", "civilsum") for i, document in enumerate(documents)]
+    budgets = {key: 8 + 8 * key for key, _, _, _ in requests}
+    usage = {}
+    own = generate_summaries_batch(requests, model, tokenizer, device="cpu", batch_size=len(requests),
+        max_new_tokens=budgets, stop_on_degeneration=False, token_usage=usage)
+    shared = generate_summaries_batch(requests, model, tokenizer, device="cpu", batch_size=len(requests),
+        max_new_tokens=max(budgets.values()), stop_on_degeneration=False)
+    for key in budgets:
+        assert usage[key][0] <= budgets[key]
+        assert shared[key].startswith(own[key]), f"row {key} differs from the shared-budget batch"
+    print(f"row budgets {sorted(budgets.values())}: generated {[usage[key][0] for key in sorted(usage)]}, "
+          "each a prefix of the shared-budget batch")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2)
+    parser.add_argument("--sentences", type=int, default=60)
+    parser.add_argument("--context", type=int, default=3072)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--flat-budget", type=int, default=512,
+                        help="stand-in for MAX_NEW_TOK, which is too long for a CPU run")
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed, n_sentences=args.sentences) for seed in range(args.docs)]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea") + prompt_handler("", "abstract")]
+    model, tokenizer = load_tiny_lm(corpus)
+    check_row_budgets(model, tokenizer, documents[:1] * 4)
+
+    inputs = [(doc_id, summary_type, document) for doc_id, document in enumerate(documents)
+              for summary_type in ["eea", "ea", "abstract"]]
+    print(f"final budgets: {({t: token_budget(t, 'civilsum') for t in ['eea', 'ea', 'abstract']})}")
+
+    flat = {summary_type: {"chunk_ratio": 0, "chunk_min": args.flat_budget, "chunk_max": args.flat_budget,
+                           "final": args.flat_budget} for summary_type in ["eea", "ea", "abstract"]}
+    default = copy.deepcopy(TOKEN_BUDGETS)
+    for name, policy in [("flat", flat), ("per type", default)]:
+        # token_budget reads config.TOKEN_BUDGETS at call time. The stand-in model always fills its
+        # budget, so its chunk summaries never shrink; without tree reduction both policies run two passes
+        TOKEN_BUDGETS.update(policy)
+        usage, deduplicated = {}, {}
+        start = time.perf_counter()
+        process.chunked_generate_summaries(inputs, "civilsum", args.context, model, tokenizer, args.batch_size,
+            tree_reduce=False, device="cpu", stop_on_degeneration=False, token_usage=usage, deduplicated=deduplicated)
+        elapsed = time.perf_counter() - start
+        # Keys served by deduplication repeat their source's usage
+        usage = {key: value for key, value in usage.items() if key not in deduplicated}
+        generated = sum(tokens for tokens, _ in usage.values())
+        budgeted = sum(budget for _, budget in usage.values())
+        print(f"{name:>8}: {len(usage)} generations, {generated} tokens generated of {budgeted} budgeted, {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Flat versus tree reduction in `chunked_generate_summaries` on a long synthetic
+judgment, with a stand-in model whose "summary" is a fixed number of tokens taken
+from its prompt. Reports the generation passes, the longest prompt seen against
+the context length, and time.
+
+    python benchmarks/bench_tree_reduce.py --sentences 3000 --fan-in 4
+"""
+import time
+import argparse
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import torch
+from summarise import prompt_handler, prompt_overhead_tokens, max_token_budget
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+process = _bootstrap.process_module()
+
+
+class ExcerptModel:
+    """
+    Answers every prompt with `summary_tokens` tokens copied from the middle of it,
+    and records the longest prompt it was given.
+    """
+
+    def __init__(self, summary_tokens):
+        self.summary_tokens = summary_tokens
+        self.calls = 0
+        self.longest_prompt = 0
+
+    def generate(self, input_ids, attention_mask=None, **kwargs):
+        self.calls += 1
+        lengths = attention_mask.sum(dim=1) if attention_mask is not None else [input_ids.shape[1]] * len(input_ids)
+        self.longest_prompt = max(self.longest_prompt, int(max(lengths)))
+        middle = input_ids.shape[1] // 2
+        excerpt = input_ids[:, middle:middle + self.summary_tokens]
+        return torch.cat([input_ids, excerpt], dim=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=3000)
+    parser.add_argument("--budget", type=int, default=600, help="document tokens per prompt")
+    parser.add_argument("--summary-tokens", type=int, default=120)
+    parser.add_argument("--fan-in", type=int, default=4)
+    args = parser.parse_args()
+
+    document = synthetic_document(0, n_sentences=args.sentences)
+    corpus = [document] + [m["content"] for m in prompt_handler("", "abstract")]
+    _, tokenizer = load_tiny_lm(corpus)
+    overhead = prompt_overhead_tokens(tokenizer, "abstract", "civilsum")
+    generation = max_token_budget("abstract", "civilsum")
+    max_len = args.budget + overhead + generation
+    print(f"document: {len(tokenizer(document)['input_ids'])} tokens, context {max_len} "
+          f"({args.budget} for text + {overhead} prompt + {generation} generation)")
+
+    for name, options in [("flat", {"tree_reduce": False}), ("tree", {"tree_reduce": True, "fan_in": args.fan_in})]:
+        model = ExcerptModel(args.summary_tokens)
+        start = time.perf_counter()
+        summaries = process.chunked_generate_summaries([(0, "abstract", document)], "civilsum", max_len, model, tokenizer,
+                                                       device="cpu", **options)
+        elapsed = time.perf_counter() - start
+        assert summaries[(0, "abstract")]
+        print(f"{name}: {model.calls} generate calls, longest prompt {model.longest_prompt} tokens "
+              f"({model.longest_prompt - overhead} text, budget {args.budget}), {elapsed:.2f}s")
+        if name == "tree":
+            assert model.longest_prompt <= args.budget + overhead, "tree reduction overflowed the budget"
+
+
+if __name__ == "__main__":
+    main()
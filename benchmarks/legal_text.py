@@ -0,0 +1,95 @@
+"""
+Seeded generator of judgment-like text for offline benchmarks.
+
+Sentences are built from the cue phrases and cue pairs of `categorical_corpus`
+mixed with common legal filler, so extraction finds cues at a realistic rate.
+Documents have numbered paragraphs, abbreviations (`Mr.`, `No.`, `v.`, `Rs.`),
+section citations and judges' names like `D.S. Sinha, J.`, which exercise the
+sentence splitting and merging code. The same seed always gives the same text.
+"""
+import random
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from categorical_corpus import categorical_phrases, categorical_pairs
+
+FILLER = (
+    "the of and to in that is was be by for on with as this it which any such under said or an "
+    "from at not have been has are were shall may would other there their these them upon "
+    "appellant respondent petitioner learned counsel tribunal authority assessee evidence witness "
+    "judgment order decree section act provision statute rule clause schedule notification "
+    "prosecution accused conviction sentence bail custody trial magistrate sessions high supreme "
+    "property land tenancy lease possession title deed sale mortgage compensation damages interest "
+    "contract agreement breach performance consideration liability injunction relief costs"
+).split()
+
+NAMES = ["Ramesh Kumar", "Sunita Devi", "M/s Bharat Steel Ltd.", "the State of Punjab", "Union of India",
+         "Mohd. Iqbal", "K. Venkataraman", "the Commissioner of Income Tax"]
+PLAIN_NAMES = [name for name in NAMES if "." not in name]
+JUDGES = ["D.S. Sinha, J.", "A.K. Patnaik, J.", "R.V. Raveendran, J.", "S.B. Sinha, C.J."]
+CITATIONS = ["Section {} of the Code of Civil Procedure", "Article {} of the Constitution",
+             "Section {} of the Indian Penal Code", "Rule {} of the Rules", "Order {} Rule 1"]
+ABBREVIATED = ["Mr. {} appeared for the appellant", "Civil Appeal No. {} of 2011", "{} v. State",
+               "a sum of Rs. {} was deposited", "Writ Petition No. {} was tagged"]
+
+_phrases = sorted(p for phrases in categorical_phrases.values() for p in phrases)
+_plain_phrases = [phrase for phrase in _phrases if "." not in phrase]
+_pairs = sorted((word, follow) for pairs in categorical_pairs.values() for word, follows in pairs.items()
+                for follow in follows)
+
+
+def _sentence(rnd, abbreviations=True):
+    parts = []
+    for _ in range(rnd.randint(1, 3)):
+        kind = rnd.random()
+        if kind < 0.35:
+            parts.append(rnd.choice(_phrases if abbreviations else _plain_phrases))
+        elif kind < 0.6:
+            word, follow = rnd.choice(_pairs)
+            parts.append(f"{word} {follow}")
+        elif kind < 0.7:
+            parts.append(rnd.choice(CITATIONS).format(rnd.randint(2, 400)))
+        elif kind < 0.78 and abbreviations:
+            parts.append(rnd.choice(ABBREVIATED).format(rnd.choice([rnd.randint(10, 9999), rnd.choice(NAMES)])))
+        else:
+            parts.append(rnd.choice(NAMES if abbreviations else PLAIN_NAMES))
+        parts.append(" ".join(rnd.choice(FILLER) for _ in range(rnd.randint(3, 14))))
+    sentence = " ".join(parts)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def legal_document(n_words, seed=0):
+    """
+    A judgment of about `n_words` words.
+    """
+    rnd = random.Random(seed)
+    paragraphs = [f"{rnd.choice(JUDGES)}"]
+    words = 0
+    paragraph_number = 1
+    while words < n_words:
+        sentences = [_sentence(rnd) for _ in range(rnd.randint(2, 7))]
+        paragraph = f"{paragraph_number}. " + " ".join(sentences)
+        paragraphs.append(paragraph)
+        words += len(paragraph.split())
+        paragraph_number += 1
+    return "\n\n".join(paragraphs)
+
+
+def generated_summary(n_words, seed=0, repeat_every=0):
+    """
+    A summary-like text of about `n_words` words, without the abbreviations that
+    split into short fragments. With `repeat_every`, every `repeat_every`-th
+    sentence repeats an earlier one, like a looping generation.
+    """
+    rnd = random.Random(seed)
+    sentences = []
+    words = 0
+    while words < n_words:
+        if repeat_every and sentences and len(sentences) % repeat_every == 0:
+            sentence = rnd.choice(sentences)
+        else:
+            sentence = _sentence(rnd, abbreviations=False)
+        sentences.append(sentence)
+        words += len(sentence.split())
+    return " ".join(sentences)
@@ -0,0 +1,97 @@
+"""
+Load test of the continuous-batching `GenerationServer` with a tiny CPU model.
+
+Starts the server in-process, sends `--requests` summarisation requests from
+`--clients` concurrent clients with staggered arrivals, checks every summary
+against sequential `generate_summary`, and prints throughput, latency and the
+/metrics endpoint.
+
+    python benchmarks/load_test_server.py --requests 32 --clients 8 --max-new-tokens 24
+"""
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import _bootstrap
+_bootstrap.add_paths()
+
+from aiohttp import web
+from preprocess import chunk_text_by_word_limit
+from server import GenerationServer, GenerationClient, make_app
+from summarise import generate_summary, prompt_handler
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(server, port):
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(make_app(server))
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-new-tokens", type=int, default=24)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--arrival-gap", type=float, default=0.02, help="seconds between request arrivals")
+    args = parser.parse_args()
+
+    documents = [synthetic_document(seed, n_sentences=20) for seed in range(4)]
+    corpus = documents + [m["content"] for m in prompt_handler("", "eea") + prompt_handler("", "abstract")]
+    model, tokenizer = load_tiny_lm(corpus, hidden_size=args.hidden_size, num_layers=args.layers)
+    # Vary the length of the generations so requests finish at different steps
+    model.generation_config.eos_token_id = tokenizer.convert_tokens_to_ids("e")
+
+    chunks = [chunk for document in documents for chunk in chunk_text_by_word_limit(document, 60)]
+    work = [(chunks[i % len(chunks)], ["eea", "abstract"][i % 2], "civilsum") for i in range(args.requests)]
+
+    start = time.perf_counter()
+    expected = [generate_summary(text, model, tokenizer, device="cpu", dataset=dataset, type=type,
+                                 max_new_tokens=args.max_new_tokens) for text, type, dataset in work]
+    sequential_time = time.perf_counter() - start
+
+    port = free_port()
+    server = GenerationServer(model, tokenizer, device="cpu", max_batch_size=args.max_batch_size,
+                              max_new_tokens=args.max_new_tokens)
+    start_server(server, port)
+    client = GenerationClient(f"http://127.0.0.1:{port}")
+
+    def send(i):
+        time.sleep(i * args.arrival_gap)
+        sent = time.perf_counter()
+        text, type, dataset = work[i]
+        summary = client.generate_summary(text, type, dataset)
+        return summary, time.perf_counter() - sent
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        results = list(pool.map(send, range(args.requests)))
+    served_time = time.perf_counter() - start
+
+    mismatches = sum(summary != want for (summary, _), want in zip(results, expected))
+    latencies = sorted(latency for _, latency in results)
+    print(f"sequential generate_summary: {sequential_time:.2f}s ({args.requests / sequential_time:.1f} req/s)")
+    print(f"server, {args.clients} clients: {served_time:.2f}s ({args.requests / served_time:.1f} req/s), "
+          f"latency p50 {latencies[len(latencies) // 2]:.2f}s p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s")
+    print(f"summaries differing from generate_summary: {mismatches} of {args.requests}")
+    print(f"metrics: {client.metrics()}")
+    assert mismatches == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark suite for the extraction and evaluation hot paths, on synthetic
+judgment text from `legal_text` so it runs offline and gives the same input on
+every machine. Each benchmark is timed at every document length in `--sizes`
+(words) and the results are written to JSON. With `--baseline`, the run is
+compared against an earlier results file and exits non-zero if any benchmark got
+slower by more than `--tolerance`.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --only extraction tf_idf
+    python benchmarks/run_benchmarks.py --output new.json --baseline bench.json
+
+Benchmarks whose run at one size takes longer than `--max-seconds` are not run
+at the larger sizes and are recorded as skipped there.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import statistics
+
+import _bootstrap
+_bootstrap.add_paths()
+
+import nltk
+import torch
+from config import THRESHOLD
+from tf_idf import calculate_tf_idf
+from preprocess import chunk_text_by_word_limit
+from evaluate import compute_rouge_scores_batch, embed_texts
+from legal_text import legal_document, generated_summary
+from tiny_lm import load_tiny_encoder
+
+extractive = _bootstrap.repo_module("summarisation.extractive")
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+SUMMARY_WORDS = 250
+
+
+def bench_preprocess_text(n_words):
+    text = legal_document(n_words)
+    return lambda: extractive.preprocess_text(text)
+
+
+def bench_merge_abbreviated_sentences(n_words):
+    sentences = nltk.sent_tokenize(" ".join(legal_document(n_words).split()))
+    return lambda: extractive.merge_abbreviated_sentences(sentences)
+
+
+def bench_tf_idf(n_words):
+    sentences, _ = extractive.preprocess_text(legal_document(n_words))
+    return lambda: calculate_tf_idf(sentences)
+
+
+def bench_rank_by_categories(n_words):
+    sentences, _ = extractive.preprocess_text(legal_document(n_words))
+    return lambda: [extractive.rank_by_categories(sentence) for sentence in sentences]
+
+
+def bench_extraction(n_words):
+    text = legal_document(n_words)
+    return lambda: extractive.extraction(text, THRESHOLD["civilsum"])
+
+
+def bench_chunk_text_by_word_limit(n_words):
+    text = legal_document(n_words)
+    return lambda: chunk_text_by_word_limit(text, word_limit=1024)
+
+
+def _summaries(n_words, seed):
+    # `n_words` in total, as summaries of SUMMARY_WORDS words
+    return [generated_summary(SUMMARY_WORDS, seed=seed + i) for i in range(max(1, n_words // SUMMARY_WORDS))]
+
+
+def bench_rouge(n_words):
+    generated, references = _summaries(n_words, 0), _summaries(n_words, 10 ** 6)
+    return lambda: compute_rouge_scores_batch(generated, references)
+
+
+def bench_jaccard_repetition(n_words):
+    # Imported here because punts needs sentence-transformers, which the other benchmarks do not
+    from punts import has_jaccard_repetition
+    # No repeated sentences, so every pair is compared
+    text = generated_summary(n_words, seed=0)
+    return lambda: has_jaccard_repetition(text)
+
+
+_encoder = None
+
+
+def bench_embed_texts(n_words):
+    global _encoder
+    if _encoder is None:
+        _encoder = load_tiny_encoder([legal_document(20000, seed=1)])
+    tokenizer, model = _encoder
+    texts = _summaries(n_words, 0)
+    return lambda: embed_texts(texts, tokenizer, model, "cpu")
+
+
+BENCHMARKS = {
+    "preprocess_text": bench_preprocess_text,
+    "merge_abbreviated_sentences": bench_merge_abbreviated_sentences,
+    "tf_idf": bench_tf_idf,
+    "rank_by_categories": bench_rank_by_categories,
+    "extraction": bench_extraction,
+    "chunk_text_by_word_limit": bench_chunk_text_by_word_limit,
+    "rouge": bench_rouge,
+    "jaccard_repetition": bench_jaccard_repetition,
+    "embed_texts": bench_embed_texts,
+}
+
+
+def time_call(fn, repeats, warmup=True):
+    if warmup:
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=_bootstrap.ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def run(names, sizes, repeats, max_seconds):
+    results = []
+    for name in names:
+        skip = False
+        for n_words in sizes:
+            if skip:
+                results.append({"benchmark": name, "words": n_words, "skipped": True})
+                print(f"{name:>28} {n_words:>7} words: skipped")
+                continue
+            fn = BENCHMARKS[name](n_words)
+            timings = time_call(fn, repeats)
+            best = min(timings)
+            results.append({
+                "benchmark": name,
+                "words": n_words,
+                "repeats": repeats,
+                "best_s": best,
+                "median_s": statistics.median(timings),
+                "words_per_s": n_words / best,
+            })
+            print(f"{name:>28} {n_words:>7} words: {best * 1000:10.1f} ms  {n_words / best:12.0f} words/s")
+            skip = best > max_seconds
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Benchmarks at least `tolerance` slower than in `baseline`, as printable lines.
+    """
+    previous = {(r["benchmark"], r["words"]): r for r in baseline["results"] if not r.get("skipped")}
+    regressions = []
+    for result in results:
+        before = previous.get((result["benchmark"], result["words"]))
+        if before is None or result.get("skipped"):
+            continue
+        ratio = result["best_s"] / before["best_s"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['benchmark']} at {result['words']} words: "
+                               f"{before['best_s'] * 1000:.1f} ms -> {result['best_s'] * 1000:.1f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="document lengths in words")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=60.0,
+                        help="skip larger sizes of a benchmark once one run takes longer than this")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    results = run(args.only, sorted(args.sizes), args.repeats, args.max_seconds)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
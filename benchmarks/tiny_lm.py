@@ -0,0 +1,94 @@
+"""
+A tiny randomly initialised causal LM and tokenizer that stand in for the 4-bit
+unsloth models in CPU benchmarks. Outputs are meaningless; only the shapes and
+the generate/chat template code paths matter.
+"""
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+SPECIAL_TOKENS = ["<unk>", "<pad>", "<|im_start|>", "<|im_sep|>", "<|im_end|>", "<|endoftext|>"]
+
+# Same shape as the phi-4 template, so `summary:assistant` survives skip_special_tokens
+CHAT_TEMPLATE = (
+    "{% for message in messages %}"
+    "<|im_start|>{{ message['role'] }}<|im_sep|>{{ message['content'] }}<|im_end|>"
+    "{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant<|im_sep|>{% endif %}"
+)
+
+
+def load_tiny_lm(corpus, vocab_size=2000, hidden_size=64, num_layers=2, seed=0):
+    """
+    Train a byte-level BPE tokenizer on `corpus` (a list of strings) and build a
+    matching tiny Llama model. Returns (model, tokenizer) like `ModelLoader.load_model`.
+    """
+    import torch
+    torch.manual_seed(seed)
+
+    tok = Tokenizer(models.BPE(unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=vocab_size,
+        special_tokens=SPECIAL_TOKENS,
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    tok.train_from_iterator(corpus, trainer)
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tok,
+        unk_token="<unk>",
+        pad_token="<pad>",
+        eos_token="<|endoftext|>",
+        additional_special_tokens=SPECIAL_TOKENS[2:5],
+    )
+    tokenizer.chat_template = CHAT_TEMPLATE
+
+    config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 4,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=8192,
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        bos_token_id=tokenizer.eos_token_id,
+    )
+    model = LlamaForCausalLM(config).eval()
+    return model, tokenizer
+
+
+def load_tiny_encoder(corpus, vocab_size=2000, hidden_size=64, num_layers=2, max_length=512, seed=0):
+    """
+    A tiny randomly initialised BERT encoder and tokenizer standing in for
+    InLegalBERT in `embed_texts` benchmarks. Returns (tokenizer, model) like
+    `ScorerRegistry.embedding_model`.
+    """
+    import torch
+    from transformers import BertConfig, BertModel
+    torch.manual_seed(seed)
+
+    tok = Tokenizer(models.BPE(unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=vocab_size,
+        special_tokens=["<unk>", "<pad>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    tok.train_from_iterator(corpus, trainer)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, unk_token="<unk>", pad_token="<pad>")
+
+    config = BertConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 4,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        max_position_embeddings=max_length,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    model = BertModel(config).eval()
+    return tokenizer, model
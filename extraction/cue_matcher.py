@@ -0,0 +1,129 @@
+from collections import deque
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over a fixed list of patterns.
+
+    Matching is case-sensitive substring matching, the same as `pattern in text`,
+    but every pattern is found in a single pass over the text.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.lengths = [len(pattern) for pattern in self.patterns]
+
+        goto = [{}]
+        output = [[]]
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    output.append([])
+                state = nxt
+            output[state].append(pid)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(out) for out in output]
+
+    def finditer(self, text):
+        """
+        Yield (pattern id, start, end) for every occurrence, overlapping ones included,
+        in order of end position.
+        """
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self.lengths
+        state = 0
+        for pos, ch in enumerate(text, 1):
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            for pid in output[state]:
+                yield pid, pos - lengths[pid], pos
+
+
+class CueMatcher:
+    """
+    Matches the categorical cue phrases and pairs against a sentence.
+
+    All phrases, pair start phrases and pair end phrases are compiled into a
+    single automaton, so a sentence is scanned once instead of once per phrase.
+    """
+
+    def __init__(self, categorical_phrases, categorical_pairs):
+        self.categories = list(dict.fromkeys(list(categorical_phrases) + list(categorical_pairs)))
+        self._pattern_ids = {}
+
+        # pattern id -> categories in which the pattern is a plain cue phrase
+        self.phrase_categories = {}
+        # pattern id -> [(category, start pattern id)] for which it is an end phrase
+        self.end_of = {}
+
+        for category, phrases in categorical_phrases.items():
+            for phrase in phrases:
+                pid = self._add_pattern(phrase)
+                self.phrase_categories.setdefault(pid, []).append(category)
+
+        for category, pairs in categorical_pairs.items():
+            for start_phrase, end_phrases in pairs.items():
+                start_id = self._add_pattern(start_phrase)
+                for end_phrase in end_phrases:
+                    end_id = self._add_pattern(end_phrase)
+                    self.end_of.setdefault(end_id, []).append((category, start_id))
+
+        self.automaton = PhraseAutomaton(self._pattern_ids)
+        self.patterns = self.automaton.patterns
+
+    def _add_pattern(self, pattern):
+        return self._pattern_ids.setdefault(pattern, len(self._pattern_ids))
+
+    def scan(self, sentence):
+        """
+        Scan the sentence once and return {pattern id: (first start, last start)}.
+        """
+        spans = {}
+        for pid, start, _ in self.automaton.finditer(sentence):
+            first = spans.get(pid)
+            spans[pid] = (start, start) if first is None else (first[0], start)
+        return spans
+
+    def match(self, sentence):
+        """
+        Match all cue phrases and pairs in the sentence in a single pass.
+
+        Returns a dict of category -> {'score': hit count, 'phrases': matched phrases}.
+        A pair contributes its end phrases found after the first occurrence of its
+        start phrase, as in the original nested loops.
+        """
+        results = {category: {'score': 0, 'phrases': []} for category in self.categories}
+        spans = self.scan(sentence)
+
+        for pid, (_, last_start) in spans.items():
+            for category in self.phrase_categories.get(pid, ()):
+                results[category]['phrases'].append(self.patterns[pid])
+            for category, start_id in self.end_of.get(pid, ()):
+                start_span = spans.get(start_id)
+                if start_span is not None and last_start >= start_span[0] + self.automaton.lengths[start_id]:
+                    results[category]['phrases'].append(self.patterns[pid])
+
+        for details in results.values():
+            details['score'] = len(details['phrases'])
+        return results
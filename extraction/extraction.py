@@ -1,11 +1,11 @@
 import re
 from collections import OrderedDict
-from math import log
 import json
 import nltk
-from nltk.corpus import stopwords
 from rouge_score import rouge_scorer
 from categorical_corpus import categorical_pairs, categorical_phrases
+from cue_matcher import CueMatcher
+from tf_idf import calculate_tf_idf
 from datasets import load_dataset
 import pandas as pd
 
@@ -18,6 +18,9 @@ abbreviations = set([
     "Inc.", "Ltd.", "Corp.", "Prof.", "Sr.", "Jr.", "A.M.", "P.M.", "St.", "no.", "No.", "E.g.", "Nos.", "v."
 ])
 
+# Compiled once, scans each sentence for every cue phrase and pair in a single pass
+cue_matcher = CueMatcher(categorical_phrases, categorical_pairs)
+
 # Summary division percentages based on categories
 summary_division = {'Introduction': 10, 'Context': 24, 'Analysis': 60, 'Conclusion': 6}
 
@@ -75,27 +78,6 @@ def clean_and_normalize(sentence):
     sentence = re.sub(r'\s+', ' ', sentence).strip()  # Normalize whitespace
     return sentence.lower()
 
-def calculate_tf_idf(text):
-    """
-    Calculate TF-IDF scores for words in the entire text.
-    """
-    text = ' '.join(text)
-    words = nltk.word_tokenize(text)
-    stop_words = set(stopwords.words('english'))
-
-
-    total_sentences = len(nltk.sent_tokenize(text))
-    tf_idf_scores = {}
-    for word in set(words):
-        if word.lower() not in stop_words:
-            tf = text.lower().count(word.lower())
-            di = sum(1 for sent in nltk.sent_tokenize(text) if word.lower() in sent.lower())
-            di = di if di != 0 else 0.5  # Avoid division by zero
-            idf = log(total_sentences / di)
-            tf_idf_scores[word.lower()] = tf * idf
-
-    return tf_idf_scores
-
 def calculate_sentence_tf_idf(sentence, tf_idf_scores):
     """
     Calculate the TF-IDF score for a sentence by summing the TF-IDF values of words in it.
@@ -116,24 +98,11 @@ def rank_by_categories(sentence):
     }
     scores = {'Introduction': 0, 'Context': 0, 'Analysis': 0, 'Conclusion': 0}
 
-    for category, phrases in categorical_phrases.items():
-        mapped_category = map_to_category(category)
-        for phrase in phrases:
-            if phrase in sentence:
-                scores[mapped_category] += 1
-                scores_categories[category]['score'] += 1
-                scores_categories[category]['phrases'].append(phrase)
-
-    for category, pairs in categorical_pairs.items():
+    for category, details in cue_matcher.match(sentence).items():
         mapped_category = map_to_category(category)
-        for start_phrase, end_phrases in pairs.items():
-            if start_phrase in sentence:
-                start_index = sentence.find(start_phrase)
-                sentence_after_start = sentence[start_index + len(start_phrase):]
-                matched_end_phrases = [end_phrase for end_phrase in end_phrases if end_phrase in sentence_after_start]
-                scores[mapped_category] += len(matched_end_phrases)
-                scores_categories[category]['score'] += len(matched_end_phrases)
-                scores_categories[category]['phrases'].extend(matched_end_phrases)
+        scores[mapped_category] += details['score']
+        scores_categories[category]['score'] += details['score']
+        scores_categories[category]['phrases'].extend(details['phrases'])
 
  
     print("\nDetailed Scores by Categories:")
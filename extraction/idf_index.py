@@ -0,0 +1,171 @@
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+from nltk.corpus import stopwords
+
+try:
+    from .tf_idf import tokenize
+except ImportError:
+    from tf_idf import tokenize
+
+
+class IdfIndex:
+    """
+    Corpus-level document frequencies stored on disk.
+
+    The index directory holds `vocab.<generation>.json` (terms in column order),
+    `df.<generation>.npy` (document frequency per term, memory-mapped when loaded)
+    and `meta.json` (the current generation, number of documents and the ids
+    already counted). Documents here are whole judgments, and terms are
+    lowercased non-stopword tokens.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.terms = []
+        self.term_ids = {}
+        self.df = np.zeros(0, dtype=np.int64)
+        self.num_documents = 0
+        self.doc_ids = set()
+        self.generation = 0
+        # Whether documents were added since the index was loaded or saved
+        self.modified = False
+
+    @staticmethod
+    def _read_meta(path):
+        # meta.json is written last and names the generation of the files that belong to it
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        meta = cls._read_meta(path)
+        index.generation = meta.get("generation", 0)
+        with open(index._file("vocab", "json"), "r", encoding="utf-8") as f:
+            index.terms = json.load(f)
+        index.term_ids = {term: pid for pid, term in enumerate(index.terms)}
+        index.df = np.load(index._file("df", "npy"), mmap_mode="r")
+        if len(index.df) != len(index.terms):
+            raise ValueError(f"IDF index at {path} has {len(index.df)} frequencies for {len(index.terms)} terms")
+        index.num_documents = meta["num_documents"]
+        index.doc_ids = set(meta["doc_ids"])
+        return index
+
+    @classmethod
+    def open(cls, path):
+        """
+        Load the index at `path`, or start an empty one if it does not exist yet.
+        """
+        if os.path.exists(os.path.join(path, "meta.json")):
+            return cls.load(path)
+        return cls(path)
+
+    def _file(self, name, extension, generation=None):
+        generation = self.generation if generation is None else generation
+        if generation == 0:
+            # Indexes written before generations were numbered
+            return os.path.join(self.path, f"{name}.{extension}")
+        return os.path.join(self.path, f"{name}.{generation}.{extension}")
+
+    def save(self):
+        """
+        Write the index as a new generation. The data files are written under new
+        names first and `meta.json` is replaced last, so a reader (or a crash) at
+        any point sees either the previous index or the new one, never a mix.
+        The files of older generations are removed, keeping the previous one for
+        readers that are still loading it.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        generation = self.generation + 1
+        df_path = self._file("df", "npy", generation)
+        with open(df_path + ".tmp", "wb") as f:
+            np.save(f, np.asarray(self.df))
+        os.replace(df_path + ".tmp", df_path)
+        self._write_json(self._file("vocab", "json", generation), self.terms)
+        self._write_json(os.path.join(self.path, "meta.json"), {
+            "generation": generation,
+            "num_documents": self.num_documents,
+            "doc_ids": sorted(self.doc_ids),
+        })
+        previous, self.generation = self.generation, generation
+        self.df = np.load(df_path, mmap_mode="r")
+        self.modified = False
+
+        keep = {self._file(name, extension, g) for g in [previous, generation] for name, extension in [("df", "npy"), ("vocab", "json")]}
+        for stale in glob.glob(os.path.join(self.path, "df*.npy")) + glob.glob(os.path.join(self.path, "vocab*.json")):
+            if stale not in keep:
+                os.remove(stale)
+
+    def check_saved(self):
+        """
+        Raise a ValueError unless the current files at `path` hold exactly this
+        index, e.g. before other processes load it from there.
+        """
+        if self.modified or not os.path.exists(os.path.join(self.path, "meta.json")):
+            raise ValueError(f"IDF index at {self.path} has unsaved changes; call save() first")
+        saved = self._read_meta(self.path).get("generation", 0)
+        if saved != self.generation:
+            raise ValueError(f"IDF index at {self.path} is generation {self.generation} but generation {saved} "
+                             f"was saved since; load it again")
+
+    def _write_json(self, target, data):
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(target + ".tmp", target)
+
+    def add_documents(self, texts, doc_ids=None):
+        """
+        Count the terms of new judgments into the index. Documents whose id is already
+        in the index are skipped, so the same split can be fed again safely.
+        Documents without an id are identified by a hash of their text.
+        Returns the number of documents added; call `save` to persist them.
+        """
+        stop_words = set(stopwords.words('english'))
+        if doc_ids is None:
+            doc_ids = [None] * len(texts)
+
+        df = np.array(self.df, dtype=np.int64)
+        counts = {}
+        added = 0
+        for doc_id, text in zip(doc_ids, texts):
+            if doc_id is None:
+                doc_id = "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+            # ids are kept as strings so they round-trip through meta.json
+            doc_id = str(doc_id)
+            if doc_id in self.doc_ids:
+                continue
+            self.doc_ids.add(doc_id)
+            _, tokens = tokenize(text)
+            for term in {token.lower() for sent_tokens in tokens for token in sent_tokens}:
+                if term not in stop_words:
+                    counts[term] = counts.get(term, 0) + 1
+            added += 1
+
+        new_terms = [term for term in counts if term not in self.term_ids]
+        for term in new_terms:
+            self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        df = np.concatenate([df, np.zeros(len(new_terms), dtype=np.int64)])
+        for term, count in counts.items():
+            df[self.term_ids[term]] += count
+
+        self.df = df
+        self.num_documents += added
+        self.modified = self.modified or added > 0
+        return added
+
+    def idf(self, terms):
+        """
+        IDF of each term over the corpus, log(N / df) with unseen terms given a DF of 0.5.
+        """
+        if self.num_documents == 0:
+            raise ValueError(f"IDF index at {self.path} is empty")
+        ids = np.array([self.term_ids.get(term, -1) for term in terms], dtype=np.int64)
+        known = ids >= 0
+        df = np.zeros(len(ids), dtype=np.float64)
+        df[known] = self.df[ids[known]]
+        df[df == 0] = 0.5
+        return np.log(self.num_documents / df)
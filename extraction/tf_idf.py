@@ -0,0 +1,150 @@
+from math import log
+import numpy as np
+import nltk
+from nltk.corpus import stopwords
+from scipy.sparse import csr_matrix
+
+try:
+    from .cue_matcher import PhraseAutomaton
+except ImportError:
+    from cue_matcher import PhraseAutomaton
+
+
+def tokenize(text):
+    """
+    Split the text into sentences and word tokens once.
+
+    The tokens are the same as `nltk.word_tokenize(text)`, which itself runs the
+    treebank tokenizer over the output of `nltk.sent_tokenize(text)`.
+    """
+    sentences = nltk.sent_tokenize(text)
+    tokens = [nltk.word_tokenize(sent, preserve_line=True) for sent in sentences]
+    return sentences, tokens
+
+
+def sentence_spans(text, sentences):
+    """
+    Locate each sentence in the text, returning (start, end) offsets or None if it cannot be found.
+    """
+    spans = []
+    cursor = 0
+    for sent in sentences:
+        start = text.find(sent, cursor)
+        if start < 0:
+            spans.append(None)
+            continue
+        cursor = start + len(sent)
+        spans.append((start, cursor))
+    return spans
+
+
+def substring_term_matrix(text, sentences, terms):
+    """
+    Count term occurrences as substrings of the lowercased text.
+
+    Returns the total non-overlapping count of each term in the whole text (as
+    `str.count`) and a sentence x term matrix of occurrences inside each sentence.
+    Both come from a single automaton pass over the text.
+    """
+    automaton = PhraseAutomaton(terms)
+    lowered = text.lower()
+    lowered_sentences = [sent.lower() for sent in sentences]
+    spans = sentence_spans(lowered, lowered_sentences)
+
+    tf = np.zeros(len(terms), dtype=np.int64)
+    last_end = [0] * len(terms)
+    rows, cols = [], []
+    located = [(idx, span) for idx, span in enumerate(spans) if span is not None]
+    cursor = 0
+    for pid, start, end in automaton.finditer(lowered):
+        if start >= last_end[pid]:
+            tf[pid] += 1
+            last_end[pid] = end
+        while cursor < len(located) and located[cursor][1][1] < end:
+            cursor += 1
+        if cursor < len(located) and located[cursor][1][0] <= start:
+            rows.append(located[cursor][0])
+            cols.append(pid)
+
+    # Sentences whose lowercased form is not a slice of the lowercased text are scanned on their own
+    for idx, span in enumerate(spans):
+        if span is None:
+            for pid, _, _ in automaton.finditer(lowered_sentences[idx]):
+                rows.append(idx)
+                cols.append(pid)
+
+    matrix = csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+        shape=(len(sentences), len(terms))
+    )
+    return tf, matrix
+
+
+def substring_counts(text, terms):
+    """
+    Total non-overlapping count of each term in the lowercased text, as `str.count`.
+    """
+    # Without sentences, the matrix pass reduces to the term counts
+    return substring_term_matrix(text, [], terms)[0]
+
+
+def token_term_matrix(tokens, terms):
+    """
+    Count whole (lowercased) tokens per sentence as a sentence x term matrix.
+    """
+    term_ids = {term: pid for pid, term in enumerate(terms)}
+    rows, cols = [], []
+    for idx, sent_tokens in enumerate(tokens):
+        for token in sent_tokens:
+            pid = term_ids.get(token.lower())
+            if pid is not None:
+                rows.append(idx)
+                cols.append(pid)
+
+    matrix = csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (rows, cols)),
+        shape=(len(tokens), len(terms))
+    )
+    return np.asarray(matrix.sum(axis=0)).ravel(), matrix
+
+
+def calculate_tf_idf(text, proper_tokens=False, idf_index=None):
+    """
+    Calculate TF-IDF scores for words in the entire text, treating sentences as documents.
+
+    By default TF is the number of times the word occurs as a substring of the
+    lowercased text and DF the number of sentences containing it as a substring.
+    With `proper_tokens=True` both count whole word tokens instead.
+    A DF of zero is floored to 0.5.
+
+    If an `IdfIndex` is given, IDF is taken from the corpus index and the
+    per-document DF pass is skipped.
+    """
+    text = ' '.join(text)
+    sentences, tokens = tokenize(text)
+    stop_words = set(stopwords.words('english'))
+
+    terms = list(dict.fromkeys(
+        token.lower() for sent_tokens in tokens for token in sent_tokens
+        if token.lower() not in stop_words
+    ))
+    if not terms:
+        return {}
+
+    if idf_index is not None:
+        tf = token_term_matrix(tokens, terms)[0] if proper_tokens else substring_counts(text, terms)
+        return dict(zip(terms, (tf * idf_index.idf(terms)).tolist()))
+
+    if proper_tokens:
+        tf, matrix = token_term_matrix(tokens, terms)
+    else:
+        tf, matrix = substring_term_matrix(text, sentences, terms)
+    df = matrix.getnnz(axis=0)
+
+    # math.log per distinct DF keeps the scores bit-identical to the scalar definition
+    total_sentences = len(sentences)
+    distinct_df, inverse = np.unique(df, return_inverse=True)
+    idf = np.array([log(total_sentences / (d if d != 0 else 0.5)) for d in distinct_df])
+    scores = tf * idf[inverse]
+
+    return dict(zip(terms, scores.tolist()))
@@ -0,0 +1,22 @@
+def bucket_by_length(lengths, batch_size=8, max_batch_tokens=None, groups=None):
+    """
+    Group indices into batches of similar token length.
+
+    Indices are sorted by length and cut into batches of at most `batch_size`,
+    also closing a batch once its padded size would exceed `max_batch_tokens`.
+    If `groups` is given, indices with different group values never share a batch.
+    """
+    if groups is None:
+        groups = [0] * len(lengths)
+    batches = []
+    batch = []
+    for idx in sorted(range(len(lengths)), key=lambda i: (groups[i], lengths[i])):
+        padded = (len(batch) + 1) * lengths[idx]
+        if batch and (len(batch) == batch_size or (max_batch_tokens and padded > max_batch_tokens)
+                      or groups[batch[0]] != groups[idx]):
+            batches.append(batch)
+            batch = []
+        batch.append(idx)
+    if batch:
+        batches.append(batch)
+    return batches
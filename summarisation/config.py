@@ -38,9 +38,35 @@ THRESHOLD = {
 
 MAX_NEW_TOK = 5000
 
+# New-token budget of each summary type. Chunk and tree-reduce group summaries get
+# `chunk_ratio` of their input tokens, clamped to [chunk_min, chunk_max]; the final
+# summary of a document gets `final`. Every budget is capped at MAX_NEW_TOK.
+TOKEN_BUDGETS = {
+    "eea": {"chunk_ratio": 0.25, "chunk_min": 256, "chunk_max": 2048, "final": 1024},
+    "ea": {"chunk_ratio": 0.15, "chunk_min": 128, "chunk_max": 1024, "final": 320},
+    "abstract": {"chunk_ratio": 0.15, "chunk_min": 128, "chunk_max": 1024, "final": 320},
+}
+# Overrides of TOKEN_BUDGETS fields for a (summary type, dataset), e.g. {("eea", "ilc"): {"final": 1536}}
+DATASET_TOKEN_BUDGETS = {}
+
+# Stop a generation early once it loops (a DEGENERATION_NGRAM-token sequence seen
+# DEGENERATION_MAX_REPEATS times) or its first DEGENERATION_PUNT_WINDOW tokens start like a refusal
+STOP_ON_DEGENERATION = True
+DEGENERATION_NGRAM = 16
+DEGENERATION_MAX_REPEATS = 4
+DEGENERATION_PUNT_WINDOW = 24
+PUNT_PREFIXES = ["i cannot", "i can't", "i can not", "i'm unable", "i am unable", "i'm sorry", "i am sorry",
+                 "please provide", "please consult", "as an ai"]
+
+SUMMARY_CACHE_DIR = "summary_cache"
+SUMMARY_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+EMBEDDING_CACHE_DIR = "embedding_cache"
+
 DATASETS = {
 "ilc": "d0r1h/ILC",
 "civilsum":"civilsum",#add locally by downloading the csv file from https://github.com/ra-MANUJ-an/CivilSum
 "inabs": "Ashreen/dataset-IN-Abs",
 }
 
+CIVILSUM_CSV = "path to civilsum"
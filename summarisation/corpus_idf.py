@@ -0,0 +1,25 @@
+from itertools import islice
+from dataset import DatasetHandler
+from ..extraction.idf_index import IdfIndex
+
+
+def build_idf_index(dataset_name, index_path, split="train", batch_size=1000):
+    """
+    Build or extend the on-disk IDF index at `index_path` with a dataset split.
+
+    Judgments already in the index are skipped, so running this again after new
+    judgments arrive only counts the new ones. The split is streamed
+    `batch_size` judgments at a time.
+    """
+    documents = DatasetHandler().iter_documents(dataset_name, split)
+    index = IdfIndex.open(index_path)
+    added = 0
+    while True:
+        batch = list(islice(documents, batch_size))
+        if not batch:
+            break
+        doc_ids = [f"{dataset_name}:{doc_id}" for doc_id, _, _ in batch]
+        added += index.add_documents([text for _, text, _ in batch], doc_ids)
+    index.save()
+    print(f"Added {added} {dataset_name} {split} documents, index now covers {index.num_documents}")
+    return index
@@ -1,21 +1,92 @@
 import pandas as pd
 from datasets import load_dataset
 import os
-from config import DATASETS
+import hashlib
+from itertools import islice
+from config import DATASETS, DATASET_INDEX, DATASET_DOC, SUMMARY_NAME, CIVILSUM_CSV
+
+
+def shard_of(doc_id, num_shards):
+    """
+    Shard a document belongs to, from a stable hash of its id.
+    """
+    digest = hashlib.sha1(str(doc_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
 
 class DatasetHandler:
     """Handles dataset loading and preprocessing."""
-    
+
     def dataset_loader(self, dataset_name=""):
         dataset_name_hf = DATASETS[dataset_name]
         if dataset_name_hf == 'civilsum':
-            test_set = pd.read_csv('path to civilsum')
+            test_set = pd.read_csv(CIVILSUM_CSV)
             return test_set
         dataset = load_dataset(dataset_name_hf)
         train_set = pd.DataFrame(dataset['train'])
         test_set = pd.DataFrame(dataset['test'])
         return train_set, test_set
-    
+
+    def iter_documents(self, dataset_name="", split="test", source=None, shard_index=0, num_shards=1,
+        offset=0, limit=None, batch_size=256):
+        """
+        Lazily yield (doc_id, text, reference) for a dataset split.
+
+        Records come from the Hugging Face Arrow files of the dataset, the CivilSum
+        csv, or `source` when given: a csv path with the dataset's columns, or a
+        directory of .txt judgments (see `iter_documents_from_directory`). Only
+        `batch_size` rows are held in memory at a time.
+
+        `offset` and `limit` select a window of the split in its stored order; the
+        window is then split into `num_shards` parts by a hash of the doc id and only
+        part `shard_index` is yielded, so every node of a multi-node run can iterate
+        the same split independently.
+        """
+        if source is not None and os.path.isdir(source):
+            records = self.iter_documents_from_directory(source)
+        elif source is not None or DATASETS[dataset_name] == 'civilsum':
+            records = self._iter_csv(dataset_name, source or CIVILSUM_CSV, batch_size)
+        else:
+            records = self._iter_hf(dataset_name, split, batch_size)
+
+        stop = None if limit is None else offset + limit
+        for doc_id, text, reference in islice(records, offset, stop):
+            if num_shards > 1 and shard_of(doc_id, num_shards) != shard_index:
+                continue
+            yield doc_id, text, reference
+
+    def _iter_hf(self, dataset_name, split, batch_size):
+        columns = [DATASET_INDEX[dataset_name], DATASET_DOC[dataset_name], SUMMARY_NAME[dataset_name]]
+        # Memory-mapped Arrow table; rows are only decoded a batch at a time
+        dataset = load_dataset(DATASETS[dataset_name], split=split).select_columns(columns)
+        for batch in dataset.iter(batch_size=batch_size):
+            yield from zip(*(batch[column] for column in columns))
+
+    def _iter_csv(self, dataset_name, path, batch_size):
+        columns = [DATASET_INDEX[dataset_name], DATASET_DOC[dataset_name], SUMMARY_NAME[dataset_name]]
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=batch_size):
+            yield from zip(*(chunk[column].tolist() for column in columns))
+
+    def iter_documents_from_directory(self, directory_path, summary_directory=None):
+        """
+        Lazily yield (filename, text, reference) for the .txt files of a directory,
+        in sorted order. The reference is read from the file of the same name in
+        `summary_directory` (or a `summary` subdirectory) if there is one.
+        """
+        if summary_directory is None:
+            summary_directory = os.path.join(directory_path, "summary")
+        for filename in sorted(os.listdir(directory_path)):
+            if not filename.endswith('.txt'):
+                continue
+            with open(os.path.join(directory_path, filename), 'r', encoding='utf-8') as f:
+                text = f.read()
+            reference = None
+            summary_path = os.path.join(summary_directory, filename)
+            if os.path.exists(summary_path):
+                with open(summary_path, 'r', encoding='utf-8') as f:
+                    reference = f.read()
+            yield filename, text, reference
+
     def load_documents_from_directory(self, directory_path):
         documents = {}
         for filename in os.listdir(directory_path):
@@ -23,5 +94,5 @@ class DatasetHandler:
                 file_path = os.path.join(directory_path, filename)
                 with open(file_path, 'r', encoding='utf-8') as f:
                     documents[filename] = f.read()
-        
-        return documents
\ No newline at end of file
+
+        return documents
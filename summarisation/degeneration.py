@@ -0,0 +1,85 @@
+import torch
+from transformers import StoppingCriteria
+from config import DEGENERATION_NGRAM, DEGENERATION_MAX_REPEATS, DEGENERATION_PUNT_WINDOW, PUNT_PREFIXES
+
+
+def degeneration_settings():
+    """
+    The settings that change what `DegenerationStop` cuts off, for summary cache keys.
+    """
+    return {
+        "ngram": DEGENERATION_NGRAM,
+        "max_repeats": DEGENERATION_MAX_REPEATS,
+        "punt_window": DEGENERATION_PUNT_WINDOW,
+        "punt_prefixes": PUNT_PREFIXES,
+    }
+
+
+class DegenerationStop(StoppingCriteria):
+    """
+    Stops each row of a `model.generate` batch as soon as its output degenerates.
+
+    Every generated token updates a per-row count of the `ngram_size`-grams seen
+    so far; a row stops with reason "repetition" once any of them occurs
+    `max_repeats` times, which is what a looping generation does. When a row has
+    `punt_window` tokens, they are decoded once and the row stops with reason
+    "punt" if they start with one of `punt_prefixes`. `reasons[row]` holds the
+    reason a row was stopped, or None.
+
+    generate() keeps a stopped row in the batch (padding it) until every row is
+    done, so decode time only drops once all rows of a batch have finished.
+    """
+
+    def __init__(self, prompt_length, tokenizer, ngram_size=DEGENERATION_NGRAM, max_repeats=DEGENERATION_MAX_REPEATS,
+        punt_window=DEGENERATION_PUNT_WINDOW, punt_prefixes=PUNT_PREFIXES):
+        self.prompt_length = prompt_length
+        self.tokenizer = tokenizer
+        self.ngram_size = ngram_size
+        self.max_repeats = max_repeats
+        self.punt_window = punt_window
+        self.punt_prefixes = tuple(prefix.lower() for prefix in punt_prefixes)
+        self.end_ids = {tokenizer.eos_token_id, tokenizer.pad_token_id} - {None}
+        self.seen = prompt_length
+        self.generated = []
+        self.counts = []
+        self.reasons = []
+        self.ended = []
+
+    def _reason(self, row, token):
+        generated = self.generated[row]
+        generated.append(token)
+        if len(generated) >= self.ngram_size:
+            ngram = tuple(generated[-self.ngram_size:])
+            count = self.counts[row].get(ngram, 0) + 1
+            self.counts[row][ngram] = count
+            if count >= self.max_repeats:
+                return "repetition"
+        if len(generated) == self.punt_window:
+            text = self.tokenizer.decode(generated, skip_special_tokens=True).strip().lower()
+            if text.startswith(self.punt_prefixes):
+                return "punt"
+        return None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        batch_size = input_ids.shape[0]
+        if not self.generated:
+            self.generated = [[] for _ in range(batch_size)]
+            self.counts = [{} for _ in range(batch_size)]
+            self.reasons = [None] * batch_size
+            self.ended = [False] * batch_size
+        new_tokens = input_ids[:, self.seen:].tolist()
+        self.seen = input_ids.shape[1]
+        for row, tokens in enumerate(new_tokens):
+            for token in tokens:
+                # Rows that already ended are only padded from here on
+                if self.ended[row]:
+                    break
+                if token in self.end_ids:
+                    self.ended[row] = True
+                    break
+                reason = self._reason(row, token)
+                if reason is not None:
+                    self.reasons[row] = reason
+                    self.ended[row] = True
+                    break
+        return torch.tensor([reason is not None for reason in self.reasons], dtype=torch.bool, device=input_ids.device)
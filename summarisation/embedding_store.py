@@ -0,0 +1,109 @@
+import os
+import json
+import fcntl
+import hashlib
+import numpy as np
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Text embeddings of one model stored on disk.
+
+    Vectors are kept as float16 rows appended to `vectors.f16`, which is read back
+    as a memory-mapped array; `keys.json` lists the sha1 of each row's text in row
+    order and `meta.json` records the model name and vector size. Each model gets
+    its own subdirectory of `directory`, so an entry is addressed by
+    (model name, text hash). Writers hold an exclusive lock on `lock` while they
+    append, so several processes can share a store.
+    """
+
+    def __init__(self, directory, model_name):
+        self.model_name = model_name
+        self.path = os.path.join(directory, hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16])
+        self.keys = []
+        self.rows = {}
+        self.dim = None
+        self.vectors = np.zeros((0, 0), dtype=np.float16)
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(os.path.join(self.path, "meta.json")):
+            self._load()
+
+    def _load(self):
+        with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        with open(os.path.join(self.path, "keys.json"), "r", encoding="utf-8") as f:
+            self.keys = json.load(f)
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        if self.keys:
+            self.vectors = np.memmap(os.path.join(self.path, "vectors.f16"), dtype=np.float16, mode="r",
+                                     shape=(len(self.keys), self.dim))
+
+    def _write_json(self, name, data):
+        target = os.path.join(self.path, name)
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(target + ".tmp", target)
+
+    def add(self, texts, vectors):
+        """
+        Append the embeddings of texts not stored yet and persist them.
+
+        The store is re-read under the lock first, so rows another process added
+        since this one loaded are kept and not stored twice.
+        """
+        vectors = np.asarray(vectors, dtype=np.float16)
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(os.path.join(self.path, "meta.json")):
+                self._load()
+            new_keys, new_rows = [], []
+            for text, vector in zip(texts, vectors):
+                key = text_hash(text)
+                if key in self.rows:
+                    continue
+                self.rows[key] = len(self.keys) + len(new_keys)
+                new_keys.append(key)
+                new_rows.append(vector)
+            if not new_keys:
+                return
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            vectors_path = os.path.join(self.path, "vectors.f16")
+            with open(vectors_path, "ab") as f:
+                # Drop rows a crash left behind without a key
+                f.truncate(len(self.keys) * self.dim * 2)
+                f.write(np.stack(new_rows).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self.keys.extend(new_keys)
+            self._write_json("meta.json", {"model_name": self.model_name, "dim": self.dim})
+            self._write_json("keys.json", self.keys)
+        self.vectors = np.memmap(vectors_path, dtype=np.float16, mode="r", shape=(len(self.keys), self.dim))
+
+    def embed(self, texts, embed_fn):
+        """
+        Embeddings of `texts` as a float32 array, calling `embed_fn` only on texts
+        the store does not hold yet. Stored and fresh vectors both go through
+        float16, so a text gets the same vector whether it was cached or not.
+        """
+        missing = list(dict.fromkeys(t for t in texts if text_hash(t) not in self.rows))
+        self.misses += len(missing)
+        self.hits += len(set(texts)) - len(missing)
+        if missing:
+            self.add(missing, embed_fn(missing))
+        return np.asarray(self.vectors[[self.rows[text_hash(t)] for t in texts]], dtype=np.float32)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
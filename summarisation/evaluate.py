@@ -1,63 +1,212 @@
 import torch
-from torch.utils.data import Dataset, DataLoader
+import numpy as np
+import pandas as pd
 from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
-from rouge_score import rouge_scorer
 from bert_score import BERTScorer
+from embedding_store import EmbeddingStore
+from profiling import profiler
+from rouge_batch import rouge_scores_columns
+from store import read_records
+from batching import bucket_by_length
 
 
 def get_device():
     return torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
-class TextDataset(Dataset):
-    def __init__(self, texts):
-        self.texts = texts
+class ScorerRegistry:
+    """
+    Evaluation models loaded once per process and kept resident.
 
-    def __len__(self):
-        return len(self.texts)
+    Each scorer is keyed by the arguments it was built with, so later calls with
+    the same settings reuse the loaded model instead of reading it from disk again.
+    """
 
-    def __getitem__(self, idx):
-        return self.texts[idx]
+    def __init__(self):
+        self.scorers = {}
+        self.loads = 0
 
+    def get(self, key, factory):
+        if key not in self.scorers:
+            self.scorers[key] = factory()
+            self.loads += 1
+        return self.scorers[key]
 
-def embed_texts(texts, tokenizer, model, device, batch_size=8):
-    embeddings = []
-    dataloader = DataLoader(TextDataset(texts), batch_size=batch_size)
-    with torch.no_grad():
-        for batch in dataloader:
-            batch = list(batch)
-            inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=512).to(device)
+    def embedding_model(self, model_name, device, int8=False):
+        def load():
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModel.from_pretrained(model_name).to(device)
+            model.eval()
+            if int8:
+                # Dynamic quantisation only runs on CPU
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            return tokenizer, model
+        return self.get(("embedding", model_name, str(device), int8), load)
+
+    def embedding_store(self, directory, model_name):
+        return self.get(("embedding_store", directory, model_name), lambda: EmbeddingStore(directory, model_name))
+
+    def bertscorer(self, model_name, lang, device, idf, batch_size, num_layers=None):
+        return self.get(("bertscore", model_name, lang, device, idf, num_layers), lambda: BERTScorer(
+            model_type=model_name,
+            num_layers=num_layers,
+            lang=lang,
+            device=device,
+            idf=idf,
+            batch_size=batch_size,
+            rescale_with_baseline=False
+        ))
+
+    def clear(self):
+        self.scorers.clear()
+
+
+scorers = ScorerRegistry()
+
+
+def embed_texts(texts, tokenizer, model, device, batch_size=8, max_batch_tokens=None, max_length=512,
+    inference_mode=True, bf16=False):
+    """
+    Mean-pooled last hidden states of `texts`, in input order.
+
+    Texts are tokenized once, sorted by length and packed into batches of at most
+    `max_batch_tokens` padded tokens (`batch_size` full-length texts by default),
+    so short texts are not padded to the longest one in the input. With `bf16`,
+    the forward pass runs under bfloat16 autocast.
+    """
+    if not texts:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    if max_batch_tokens is None:
+        max_batch_tokens = batch_size * max_length
+    encodings = tokenizer(list(texts), truncation=True, max_length=max_length)
+    features = [{name: encodings[name][i] for name in encodings.keys()} for i in range(len(texts))]
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+
+    embeddings = np.zeros((len(texts), model.config.hidden_size), dtype=np.float32)
+    grad_context = torch.inference_mode() if inference_mode else torch.no_grad()
+    with profiler.stage("embed", tokens_in=sum(lengths)), grad_context, \
+            torch.autocast(torch.device(device).type, dtype=torch.bfloat16, enabled=bf16):
+        for batch in bucket_by_length(lengths, len(texts), max_batch_tokens):
+            inputs = tokenizer.pad([features[i] for i in batch], return_tensors="pt").to(device)
             outputs = model(**inputs)
             attention_mask = inputs['attention_mask'].unsqueeze(-1)
-            hidden_states = outputs.last_hidden_state * attention_mask
+            hidden_states = outputs.last_hidden_state.float() * attention_mask
             summed = hidden_states.sum(dim=1)
             counts = attention_mask.sum(dim=1).clamp(min=1e-9)
             mean_pooled = summed / counts
-            embeddings.append(mean_pooled.cpu())
-    return torch.cat(embeddings, dim=0).numpy()
+            embeddings[batch] = mean_pooled.cpu().numpy()
+    return embeddings
+
+
+def normalize_rows(x):
+    """
+    Rows scaled to unit length as float32; all-zero rows stay zero.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return x / norms
+
+
+def paired_cosine_similarity(a, b):
+    """
+    Cosine similarity of each row of `a` with the same row of `b`.
+    """
+    return np.einsum("ij,ij->i", normalize_rows(a), normalize_rows(b))
+
+
+def cosine_similarity_matrix(a, b):
+    """
+    Cosine similarity of every row of `a` with every row of `b`, shape (len(a), len(b)).
+    """
+    return normalize_rows(a) @ normalize_rows(b).T
+
+
+def embed_unique(texts, model_name="law-ai/InLegalBERT", batch_size=8, embedding_cache_dir=None, precision=None):
+    """
+    Embed each distinct text once. Returns (embeddings, {text: row}).
+
+    With `embedding_cache_dir`, embeddings are read from and added to the
+    `EmbeddingStore` there, so only texts never seen before are embedded.
+    `precision` may be "bf16" (autocast) or "int8" (dynamic quantisation, CPU
+    only) to trade a little accuracy for speed.
+    """
+    device = get_device()
+    if precision not in (None, "bf16", "int8"):
+        raise ValueError(f"Unknown embedding precision {precision!r}, expected None, 'bf16' or 'int8'")
+    if precision == "int8" and device.type != "cpu":
+        raise ValueError("int8 embeddings use dynamic quantisation, which only runs on CPU")
+    texts = list(dict.fromkeys(texts))
+    position = {text: i for i, text in enumerate(texts)}
+
+    def embed(texts):
+        tokenizer, model = scorers.embedding_model(model_name, device, int8=precision == "int8")
+        return embed_texts(texts, tokenizer, model, device, batch_size, bf16=precision == "bf16")
+
+    if embedding_cache_dir is None:
+        emb = embed(texts)
+    else:
+        store_name = model_name if precision is None else f"{model_name}@{precision}"
+        emb = scorers.embedding_store(embedding_cache_dir, store_name).embed(texts, embed)
+    return emb, position
 
 
 def compute_semantic_similarity(
-    generated_summaries, reference_summaries, model_name="law-ai/InLegalBERT", batch_size=8
+    generated_summaries, reference_summaries, model_name="law-ai/InLegalBERT", batch_size=8, embedding_cache_dir=None,
+    precision=None
 ):
-    assert len(generated_summaries) == len(reference_summaries), "Input lists must match length"
-    device = get_device()
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModel.from_pretrained(model_name).to(device)
-    model.eval()
-    gen_emb = embed_texts(generated_summaries, tokenizer, model, device, batch_size)
-    ref_emb = embed_texts(reference_summaries, tokenizer, model, device, batch_size)
-    scores = [cosine_similarity([g],[r])[0][0] for g, r in zip(gen_emb, ref_emb)]
-    return scores
+    return compute_semantic_similarity_columns(
+        {None: generated_summaries}, reference_summaries, model_name, batch_size, embedding_cache_dir, precision
+    )[None]
+
+
+def compute_semantic_similarity_columns(
+    generated_columns, reference_summaries, model_name="law-ai/InLegalBERT", batch_size=8, embedding_cache_dir=None,
+    precision=None
+):
+    """
+    Cosine similarity to the references for several columns of generated summaries.
+
+    `generated_columns` maps a column name to its summaries. Every distinct text,
+    references included, is embedded once in a single pass (see `embed_unique`).
+    Returns {name: float32 array of scores}.
+    """
+    for generated_summaries in generated_columns.values():
+        assert len(generated_summaries) == len(reference_summaries), "Input lists must match length"
+    emb, position = embed_unique(
+        reference_summaries + [t for col in generated_columns.values() for t in col],
+        model_name, batch_size, embedding_cache_dir, precision
+    )
+    ref_emb = emb[[position[r] for r in reference_summaries]]
+    results = {}
+    for name, generated_summaries in generated_columns.items():
+        gen_emb = emb[[position[g] for g in generated_summaries]]
+        results[name] = paired_cosine_similarity(gen_emb, ref_emb)
+    return results
 
 
-def compute_rouge_scores_batch(generated_summaries, reference_summaries):
+def compute_semantic_similarity_matrix(
+    generated_summaries, reference_summaries, model_name="law-ai/InLegalBERT", batch_size=8, embedding_cache_dir=None,
+    precision=None
+):
+    """
+    Cosine similarity of every generated summary with every reference, as a
+    float32 array of shape (len(generated_summaries), len(reference_summaries)).
+    Useful to check whether a summary is closest to its own reference.
+    """
+    emb, position = embed_unique(
+        list(reference_summaries) + list(generated_summaries), model_name, batch_size, embedding_cache_dir, precision
+    )
+    return cosine_similarity_matrix(
+        emb[[position[g] for g in generated_summaries]],
+        emb[[position[r] for r in reference_summaries]]
+    )
+
+
+def compute_rouge_scores_batch(generated_summaries, reference_summaries, workers=1):
     assert len(generated_summaries) == len(reference_summaries), "Input lists must match length"
-    scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
     results = []
-    for g, r in zip(generated_summaries, reference_summaries):
-        scores = scorer.score(r, g)
+    for scores in rouge_scores_columns({None: generated_summaries}, reference_summaries, workers=workers)[None]:
         results.append({
             'rouge1': scores['rouge1'].fmeasure,
             'rouge2': scores['rouge2'].fmeasure,
@@ -72,24 +221,119 @@ def compute_bertscore_batch(
     model_name="roberta-large",
     batch_size=8,
     idf=False,
-    lang="en"
+    lang="en",
+    num_layers=None
 ):
-    assert len(generated_summaries) == len(reference_summaries), "Input lists must match length"
+    return compute_bertscore_columns(
+        {None: generated_summaries}, reference_summaries, model_name, batch_size, idf, lang, num_layers
+    )[None]
+
+
+def compute_bertscore_columns(
+    generated_columns,
+    reference_summaries,
+    model_name="roberta-large",
+    batch_size=8,
+    idf=False,
+    lang="en",
+    num_layers=None
+):
+    """
+    BERTScore against the references for several columns of generated summaries.
+
+    All columns are scored in one `BERTScorer.score` call; BERTScore embeds each
+    distinct sentence once, so the references are encoded a single time. IDF
+    weights, when used, come from the references alone. Returns
+    {name: {"precision", "recall", "f1"}}.
+    """
+    for generated_summaries in generated_columns.values():
+        assert len(generated_summaries) == len(reference_summaries), "Input lists must match length"
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    scorer = BERTScorer(
-        model_type=model_name,
-        lang=lang,
-        device=device,
-        idf=idf,
-        batch_size=batch_size,
-        rescale_with_baseline=False
-    )
-    P, R, F1 = scorer.score(generated_summaries, reference_summaries, batch_size=batch_size, verbose=True)
-    return {
-        "precision": P.cpu().numpy().tolist(),
-        "recall": R.cpu().numpy().tolist(),
-        "f1": F1.cpu().numpy().tolist()
-    }
+    scorer = scorers.bertscorer(model_name, lang, device, idf, batch_size, num_layers)
+    if idf:
+        scorer.compute_idf(reference_summaries)
+    cands = [g for col in generated_columns.values() for g in col]
+    refs = reference_summaries * len(generated_columns)
+    P, R, F1 = scorer.score(cands, refs, batch_size=batch_size, verbose=True)
+    P, R, F1 = P.cpu().numpy().tolist(), R.cpu().numpy().tolist(), F1.cpu().numpy().tolist()
+    results = {}
+    n = len(reference_summaries)
+    for i, name in enumerate(generated_columns):
+        results[name] = {
+            "precision": P[i * n:(i + 1) * n],
+            "recall": R[i * n:(i + 1) * n],
+            "f1": F1[i * n:(i + 1) * n]
+        }
+    return results
+
+
+def evaluate_generations(generations_path, output_csv, embedding_cache_dir=None, rouge_workers=None):
+    """
+    Score stored generations against their references and write the results csv.
+
+    Reads the JSONL written by `process_dataset`, so metrics can be recomputed
+    without regenerating any summaries. ROUGE is scored on `rouge_workers`
+    processes, every core by default.
+
+    With `embedding_cache_dir` (e.g. `config.EMBEDDING_CACHE_DIR`), InLegalBERT
+    embeddings are cached there across runs and the cache hits and misses of
+    this call are stored as `inlegalbert_cache_hits`/`_misses` columns. Cached
+    vectors are float16, so similarities are then float16-rounded, also for
+    texts embedded in this run; without it they are exact.
+
+    Records without a reference summary (e.g. from a directory without
+    summaries) are kept in the csv with empty metric columns.
+    """
+    results_df = pd.DataFrame(read_records(generations_path))
+    has_reference = results_df["reference_summary"].notna()
+    if not has_reference.all():
+        print(f"Skipping metrics for {int((~has_reference).sum())} of {len(results_df)} documents without a reference")
+    scored_df = results_df[has_reference]
+
+    summary_columns = {summ_type: scored_df[summ_type].tolist() for summ_type in ["eea_summary", "ea_summary", "abstract"]}
+    references = scored_df["reference_summary"].tolist()
+
+    def set_column(name, values):
+        results_df.loc[has_reference, name] = values
+
+    if not references:
+        results_df.to_csv(output_csv, index=False)
+        print(f"No references to score; saved generations to {output_csv}")
+        return results_df
+
+    print("Computing ROUGE...")
+    with profiler.stage("rouge"):
+        rouge_columns = rouge_scores_columns(summary_columns, references, workers=rouge_workers)
+    for summ_type, rouges in rouge_columns.items():
+        for rouge_type in ["rouge1", "rouge2", "rougeL"]:
+            set_column(f"{summ_type}_{rouge_type}", [r[rouge_type].fmeasure for r in rouges])
+            set_column(f"{summ_type}_{rouge_type}_p", [r[rouge_type].precision for r in rouges])
+            set_column(f"{summ_type}_{rouge_type}_r", [r[rouge_type].recall for r in rouges])
+
+    print("Computing BERTScore...")
+    with profiler.stage("bertscore"):
+        bert_columns = compute_bertscore_columns(summary_columns, references)
+    for summ_type, berts in bert_columns.items():
+        set_column(f"{summ_type}_bertscore_p", berts["precision"])
+        set_column(f"{summ_type}_bertscore_r", berts["recall"])
+        set_column(f"{summ_type}_bertscore_f1", berts["f1"])
+
+    print("Computing InLegalBERT similarity...")
+    if embedding_cache_dir is not None:
+        store = scorers.embedding_store(embedding_cache_dir, "law-ai/InLegalBERT")
+        hits, misses = store.hits, store.misses
+    with profiler.stage("inlegalbert"):
+        sim_columns = compute_semantic_similarity_columns(summary_columns, references, embedding_cache_dir=embedding_cache_dir)
+    for summ_type, sims in sim_columns.items():
+        set_column(f"{summ_type}_inlegalbert_sim", sims)
+    if embedding_cache_dir is not None:
+        results_df["inlegalbert_cache_hits"] = store.hits - hits
+        results_df["inlegalbert_cache_misses"] = store.misses - misses
+        print(f"InLegalBERT embedding cache: {store.stats()}")
+
+    results_df.to_csv(output_csv, index=False)
+    print(f"Saved all results to {output_csv}")
+    return results_df
 
 
 # def main():
@@ -1,11 +1,16 @@
 import re
-from collections import OrderedDict
-from math import log
+from collections import OrderedDict, deque
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 import json
 import nltk
-from nltk.corpus import stopwords
 from rouge_score import rouge_scorer
 from ..extraction.categorical_corpus import categorical_pairs, categorical_phrases, add_case_variations, update_pairs_with_case_variations
+from ..extraction.cue_matcher import CueMatcher
+from ..extraction.idf_index import IdfIndex
+from ..extraction.tf_idf import calculate_tf_idf
+from profiling import profiler
 
 # Make sure to download these resources once
 # nltk.download('punkt')
@@ -17,6 +22,9 @@ abbreviations = set([
     "Inc.", "Ltd.", "Corp.", "Prof.", "Sr.", "Jr.", "A.M.", "P.M.", "St.", "no.", "No.", "E.g.", "Nos.", "v.", "Rs.", 
 ])
 
+# Compiled once, scans each sentence for every cue phrase and pair in a single pass
+cue_matcher = CueMatcher(categorical_phrases, categorical_pairs)
+
 
 def preprocess_text(text):
     """
@@ -71,24 +79,6 @@ def clean_and_normalize(sentence):
     sentence = re.sub(r'\s+', ' ', sentence).strip()  # Normalize whitespace
     return sentence.lower()
 
-def calculate_tf_idf(text):
-    text = ' '.join(text)
-    words = nltk.word_tokenize(text)
-    stop_words = set(stopwords.words('english'))
-
-
-    total_sentences = len(nltk.sent_tokenize(text))
-    tf_idf_scores = {}
-    for word in set(words):
-        if word.lower() not in stop_words:
-            tf = text.lower().count(word.lower())
-            di = sum(1 for sent in nltk.sent_tokenize(text) if word.lower() in sent.lower())
-            di = di if di != 0 else 0.5  # Avoid division by zero
-            idf = log(total_sentences / di)
-            tf_idf_scores[word.lower()] = tf * idf
-
-    return tf_idf_scores
-
 def calculate_sentence_tf_idf(sentence, tf_idf_scores):
     words = sentence.split()
     score = sum(tf_idf_scores.get(word.lower(), 0) for word in words)
@@ -106,26 +96,12 @@ def rank_by_categories(sentence):
     }
     scores = {'Introduction': 0, 'Context': 0, 'Analysis': 0, 'Conclusion': 0}
 
-    # Check for categorical phrases
-    for category, phrases in categorical_phrases.items():
-        mapped_category = map_to_category(category)
-        for phrase in phrases:
-            if phrase in sentence:
-                scores[mapped_category] += 1
-                scores_categories[category]['score'] += 1
-                scores_categories[category]['phrases'].append(phrase)
-
-    # Check for categorical pairs
-    for category, pairs in categorical_pairs.items():
+    # Check for categorical phrases and pairs
+    for category, details in cue_matcher.match(sentence).items():
         mapped_category = map_to_category(category)
-        for start_phrase, end_phrases in pairs.items():
-            if start_phrase in sentence:
-                start_index = sentence.find(start_phrase)
-                sentence_after_start = sentence[start_index + len(start_phrase):]
-                matched_end_phrases = [end_phrase for end_phrase in end_phrases if end_phrase in sentence_after_start]
-                scores[mapped_category] += len(matched_end_phrases)
-                scores_categories[category]['score'] += len(matched_end_phrases)
-                scores_categories[category]['phrases'].extend(matched_end_phrases)
+        scores[mapped_category] += details['score']
+        scores_categories[category]['score'] += details['score']
+        scores_categories[category]['phrases'].extend(details['phrases'])
 
     # Print the results for debugging purposes
     # print("\nDetailed Scores by Categories:")
@@ -158,13 +134,7 @@ tag_fullform_mapping = {
 }
 
 
-def extraction(file, threshold):
-    # categorical_phrases = add_case_variations(categorical_phrases)
-    # categorical_pairs = update_pairs_with_case_variations(categorical_pairs)
-    sentences, _ = preprocess_text(file)
-    
-    tf_idf_scores = calculate_tf_idf(sentences)
-
+def _tag_sentences(sentences, tf_idf_scores, threshold):
     tagged_sentences = []
     categorized_sentences = {}
     
@@ -172,19 +142,10 @@ def extraction(file, threshold):
         cleaned_sentence = clean_and_normalize(sentence)
         
         scores_categories = {category: 0 for category in categorical_phrases.keys()}
-        
-        for category, phrases in categorical_phrases.items():
-            for phrase in phrases:
-                if phrase in cleaned_sentence:
-                    scores_categories[category] += (1 + tf_idf_scores.get(phrase.lower(), 0))
-
-        for category, pairs in categorical_pairs.items():
-            for start_phrase, end_phrases in pairs.items():
-                if start_phrase in cleaned_sentence:
-                    start_index = cleaned_sentence.find(start_phrase)
-                    sentence_after_start = cleaned_sentence[start_index + len(start_phrase):]
-                    matched_end_phrases = [end_phrase for end_phrase in end_phrases if end_phrase in sentence_after_start]
-                    scores_categories[category] += sum((1 + tf_idf_scores.get(end_phrase.lower(), 0)) for end_phrase in matched_end_phrases)
+
+        for category, details in cue_matcher.match(cleaned_sentence).items():
+            for phrase in details['phrases']:
+                scores_categories[category] += (1 + tf_idf_scores.get(phrase.lower(), 0))
         
         if any(score > threshold for score in scores_categories.values()):
             best_category = max(scores_categories, key=scores_categories.get)
@@ -198,11 +159,88 @@ def extraction(file, threshold):
                 categorized_sentences[best_tag] = []
             
             categorized_sentences[best_tag].append(sentence)
+
+    return tagged_sentences, categorized_sentences
+
+
+def extraction(file, threshold, idf_index=None):
+    # categorical_phrases = add_case_variations(categorical_phrases)
+    # categorical_pairs = update_pairs_with_case_variations(categorical_pairs)
+    with profiler.stage("extraction"):
+        with profiler.stage("preprocess"):
+            sentences, _ = preprocess_text(file)
     
+        # With an IdfIndex the IDF comes from the whole corpus instead of this judgment's sentences
+        with profiler.stage("tf_idf"):
+            tf_idf_scores = calculate_tf_idf(sentences, idf_index=idf_index)
+
+        with profiler.stage("cue_matching"):
+            tagged_sentences, categorized_sentences = _tag_sentences(sentences, tf_idf_scores, threshold)
 
     formatted_output = "\n\n".join(
         f"{category}:\n" + "\n".join(sentences)
         for category, sentences in categorized_sentences.items() if sentences
     )
     
-    return ' '.join(tagged_sentences), formatted_output
\ No newline at end of file
+    return ' '.join(tagged_sentences), formatted_output
+
+
+# Set once per pool worker by _init_extraction_worker
+_worker_idf_index = None
+
+
+def _init_extraction_worker(idf_index_path, generation=None, profile=False):
+    global _worker_idf_index
+    # Each worker memory-maps the index itself instead of receiving a pickled copy of the array
+    _worker_idf_index = IdfIndex.load(idf_index_path) if idf_index_path is not None else None
+    if _worker_idf_index is not None and _worker_idf_index.generation != generation:
+        raise ValueError(f"IDF index at {idf_index_path} was saved again while the extraction pool started")
+    profiler.enable(profile)
+
+
+def _extract_in_worker(files, threshold):
+    # Stage records travel back with each result, since the worker's profiler is its own
+    return [(extraction(file, threshold, _worker_idf_index), profiler.drain()) for file in files]
+
+
+def extract_batch(texts, threshold, workers=None, idf_index=None, chunksize=1, doc_ids=None):
+    """
+    Run `extraction` over many judgments on a process pool.
+
+    The cue phrase automaton is built when a worker imports this module and each
+    worker memory-maps the IDF index from `idf_index.path` once in the pool
+    initializer, so neither is rebuilt per document and the workers share the
+    index pages. With more than one worker the index must therefore match its
+    saved files (`IdfIndex.check_saved`), so scores never depend on the worker
+    count. `texts` may be any iterable and is consumed lazily, with a bounded
+    number of `chunksize` groups in flight. Results are yielded in input
+    order as soon as each is ready. `workers=1` runs in the calling process;
+    `None` uses every core. `doc_ids`, if given, attributes the profiled stages
+    of each text to its document.
+    """
+    doc_ids = iter(doc_ids) if doc_ids is not None else repeat(None)
+    if workers == 1:
+        for file, doc_id in zip(texts, doc_ids):
+            with profiler.document(doc_id):
+                result = extraction(file, threshold, idf_index)
+            yield result
+        return
+
+    initargs = (None, None, profiler.enabled)
+    if idf_index is not None:
+        idf_index.check_saved()
+        initargs = (idf_index.path, idf_index.generation, profiler.enabled)
+    max_pending = 4 * (workers or os.cpu_count() or 1)
+    texts = iter(texts)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_extraction_worker, initargs=initargs) as executor:
+        pending = deque()
+        while True:
+            files = list(islice(texts, chunksize))
+            if files:
+                pending.append(executor.submit(_extract_in_worker, files, threshold))
+            if pending and (not files or len(pending) >= max_pending):
+                for result, records in pending.popleft().result():
+                    profiler.merge(records, next(doc_ids))
+                    yield result
+            elif not files:
+                return
@@ -0,0 +1,112 @@
+import copy
+import hashlib
+import torch
+from transformers import DynamicCache
+
+
+def common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def tokenizer_fingerprint(tokenizer):
+    """
+    Hash of everything that changes how a prompt is rendered and tokenized.
+    """
+    parts = [
+        type(tokenizer).__name__,
+        str(getattr(tokenizer, "name_or_path", "")),
+        str(len(tokenizer)),
+        str(getattr(tokenizer, "chat_template", "")),
+    ]
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class PromptPrefixCache:
+    """
+    Past key/values of the fixed instruction prefix of each prompt type.
+
+    The system and instruction block that `prompt_handler` puts before the document
+    text is prefilled once per (summary type, dataset) and reused for every later
+    generation with the same model. Entries are dropped whenever the tokenizer or
+    its chat template changes.
+    """
+
+    def __init__(self, model, device="cuda"):
+        self.model = model
+        self.device = device
+        self.entries = {}
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.tokens_reused = 0
+
+    def invalidate(self):
+        self.entries.clear()
+        self.fingerprint = None
+
+    def get(self, tokenizer, key, prefix):
+        """
+        Return (prefix token ids, cache) for the prefix, prefilling it on first use.
+        """
+        fingerprint = tokenizer_fingerprint(tokenizer)
+        if fingerprint != self.fingerprint:
+            self.invalidate()
+            self.fingerprint = fingerprint
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != prefix:
+            self.misses += 1
+            prefix_ids = tokenizer(prefix)["input_ids"]
+            with torch.inference_mode():
+                cache = self.model(
+                    input_ids=torch.tensor([prefix_ids], device=self.device),
+                    past_key_values=DynamicCache(),
+                    use_cache=True,
+                ).past_key_values
+            entry = (prefix, prefix_ids, cache)
+            self.entries[key] = entry
+        else:
+            self.hits += 1
+        return entry[1], entry[2]
+
+    def prepare(self, tokenizer, key, prefix, rows):
+        """
+        Build generate() inputs for token id `rows` that all start with `prefix`.
+
+        The shared tokens come from the cache; padding goes between the prefix and
+        the rest of each row so the cached positions line up for the whole batch.
+        Returns None when the rows do not share any cached tokens.
+        """
+        if prefix is None:
+            return None
+        prefix_ids, cache = self.get(tokenizer, key, prefix)
+        # At least one token per row must still be prefilled to start decoding
+        shared = min(min(common_prefix_length(prefix_ids, ids), len(ids) - 1) for ids in rows)
+        if shared <= 0:
+            return None
+
+        past_key_values = copy.deepcopy(cache)
+        if shared < len(prefix_ids):
+            past_key_values.crop(shared)
+        if len(rows) > 1:
+            past_key_values.batch_repeat_interleave(len(rows))
+
+        width = max(len(ids) for ids in rows) - shared
+        input_ids, attention_mask = [], []
+        for ids in rows:
+            rest = ids[shared:]
+            pad = width - len(rest)
+            input_ids.append(ids[:shared] + [tokenizer.pad_token_id] * pad + rest)
+            attention_mask.append([1] * shared + [0] * pad + [1] * len(rest))
+        self.tokens_reused += shared * len(rows)
+
+        return {
+            "input_ids": torch.tensor(input_ids, device=self.device),
+            "attention_mask": torch.tensor(attention_mask, device=self.device),
+            "past_key_values": past_key_values,
+        }
@@ -72,4 +72,103 @@ def chunk_text_by_word_limit(text, word_limit=128000):
     if current_chunk:
         chunks.append(" ".join(current_chunk))
 
-    return chunks
\ No newline at end of file
+    return chunks
+
+def chunk_text_by_token_limit(text, tokenizer, token_limit, reserved_tokens=0, overlap_tokens=0):
+    """
+    Split text into chunks of whole sentences that fit a model's token budget.
+
+    Sentences come from `preprocess_text` and are tokenized together in batch
+    calls, both as they appear at the start of a chunk and after a joining space.
+    A chunk holds at most `token_limit - reserved_tokens` tokens, where
+    `reserved_tokens` covers the prompt template and the generation length. A
+    sentence longer than the budget is split on token boundaries. With
+    `overlap_tokens`, each chunk starts with the trailing sentences of the previous
+    one, up to that many tokens.
+    """
+    budget = token_limit - reserved_tokens
+    if budget <= 0:
+        raise ValueError(f"No room for text: token_limit {token_limit} minus reserved {reserved_tokens}")
+
+    sentences, _ = preprocess_text(text)
+    if not sentences:
+        return []
+    plain_ids = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+    spaced_ids = tokenizer([" " + sent for sent in sentences], add_special_tokens=False)["input_ids"]
+
+    # (text, tokens at the start of a chunk, tokens after a joining space)
+    pieces = []
+    for sent, plain, spaced in zip(sentences, plain_ids, spaced_ids):
+        if max(len(plain), len(spaced)) <= budget:
+            pieces.append((sent, len(plain), len(spaced)))
+        else:
+            for start in range(0, len(plain), budget):
+                window = plain[start:start + budget]
+                pieces.append((tokenizer.decode(window).strip(), len(window), len(window)))
+
+    def prepend(piece, chunk, chunk_tokens):
+        # The old first piece now follows a joining space
+        if chunk:
+            chunk_tokens += chunk[0][2] - chunk[0][1]
+        return [piece] + chunk, chunk_tokens + piece[1]
+
+    chunks = []
+    current_chunk = []
+    current_tokens = 0
+    for piece in pieces:
+        if current_chunk and current_tokens + piece[2] > budget:
+            chunks.append(" ".join(sent for sent, _, _ in current_chunk))
+            carried, carried_tokens = [], 0
+            for prev in reversed(current_chunk):
+                candidate, candidate_tokens = prepend(prev, carried, carried_tokens)
+                if candidate_tokens > overlap_tokens or candidate_tokens + piece[2] > budget:
+                    break
+                carried, carried_tokens = candidate, candidate_tokens
+            current_chunk, current_tokens = carried, carried_tokens
+        current_tokens += piece[2] if current_chunk else piece[1]
+        current_chunk.append(piece)
+
+    if current_chunk:
+        chunks.append(" ".join(sent for sent, _, _ in current_chunk))
+
+    return chunks
+
+
+def group_by_token_limit(texts, tokenizer, token_limit, reserved_tokens=0, max_group_size=None):
+    """
+    Pack consecutive texts into groups whose space-joined text fits a token budget.
+
+    Returns a list of groups (lists of texts). If everything fits, that is a single
+    group. Otherwise each group holds at most `max_group_size` texts, and a text
+    that alone exceeds the budget is split with `chunk_text_by_token_limit` first.
+    """
+    budget = token_limit - reserved_tokens
+    if budget <= 0:
+        raise ValueError(f"No room for text: token_limit {token_limit} minus reserved {reserved_tokens}")
+    if not texts:
+        return []
+    # Counted after a joining space, which never undercounts the first text of a group
+    lengths = [len(ids) for ids in tokenizer([" " + text for text in texts], add_special_tokens=False)["input_ids"]]
+    if sum(lengths) <= budget:
+        return [list(texts)]
+
+    pieces = []
+    for text, length in zip(texts, lengths):
+        if length <= budget:
+            pieces.append((text, length))
+            continue
+        parts = chunk_text_by_token_limit(text, tokenizer, token_limit, reserved_tokens)
+        part_ids = tokenizer([" " + part for part in parts], add_special_tokens=False)["input_ids"]
+        pieces.extend((part, len(ids)) for part, ids in zip(parts, part_ids))
+
+    groups = []
+    group, group_tokens = [], 0
+    for text, length in pieces:
+        if group and (group_tokens + length > budget or (max_group_size and len(group) == max_group_size)):
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(text)
+        group_tokens += length
+    if group:
+        groups.append(group)
+    return groups
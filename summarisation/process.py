@@ -1,107 +1,356 @@
 import os
-import pandas as pd
+from collections import Counter
+from itertools import islice
 from config import MODELS, DATASETS
 from dataset import DatasetHandler
-from evaluate import (
-    compute_rouge_scores_batch,
-    compute_bertscore_batch,
-    compute_semantic_similarity
-)
-from summarise import generate_summary
-from extractive import extraction
-from .preprocess import chunk_text_by_word_limit
-from config import MODELS, MAX_SEQ_LEN, DATASET_INDEX, DATASET_DOC, DATASETS, SUMMARY_NAME, THRESHOLD
+from evaluate import evaluate_generations
+from summarise import generate_summaries_batch, deduplicate_requests, prompt_overhead_tokens, token_budget, max_token_budget
+from extractive import extract_batch
+from .preprocess import chunk_text_by_token_limit, group_by_token_limit
+from config import MODELS, MAX_SEQ_LEN, DATASETS, THRESHOLD
+from config import SUMMARY_CACHE_DIR, SUMMARY_CACHE_MAX_BYTES, STOP_ON_DEGENERATION, EMBEDDING_CACHE_DIR
 from model import ModelLoader
+from prefix_cache import PromptPrefixCache
+from store import append_record, completed_ids
+from summary_cache import SummaryCache
+from profiling import profiler
+from server import GenerationClient
+from transformers import AutoTokenizer
+from ..extraction.idf_index import IdfIndex
 
-def chunked_generate_summary(input_text, model_name, summary_type, dataset_name, max_len, model, tokenizer):
+def chunked_generate_summaries(inputs, dataset_name, max_len, model, tokenizer, batch_size=8, prefix_cache=None,
+    chunk_overlap=0, summary_cache=None, client=None, tree_reduce=True, fan_in=8, max_depth=8, device="cuda",
+    stop_on_degeneration=STOP_ON_DEGENERATION, stop_reasons=None, token_usage=None, deduplicate=True, deduplicated=None):
+    """
+    Chunked summaries for several (doc_id, summary_type, text) inputs at once.
 
-    chunks = chunk_text_by_word_limit(input_text, word_limit=max_len)
-    chunk_summaries = [
-        generate_summary(chunk, model, tokenizer, model_name=model_name, type=summary_type, dataset=dataset_name)
-        for chunk in chunks
+    `max_len` is the model's context length in tokens; each chunk leaves room for
+    the prompt template and the largest new-token budget of its summary type
+    (`max_token_budget`). The chunks of every input are generated together in one
+    batched pass, then the joined chunk summaries of every input are summarised in
+    a final batched pass.
+
+    Chunk and group summaries get a new-token budget proportional to their input,
+    final summaries the type's final budget (see `token_budget`). The
+    `token_usage` dict, if given, receives {generation key: (generated, budget)}.
+
+    With `tree_reduce`, chunk summaries that together would not fit the budget are
+    first merged level by level: at each level they are packed into groups of at
+    most `fan_in` that fit (`group_by_token_limit`), every group of every input is
+    summarised in one batched pass, and the group summaries become the next
+    level's input. Inputs whose summaries already fit stop early, so the final
+    pass never overflows the context unless `max_depth` levels were not enough.
+
+    With a `GenerationClient`, both passes are sent to a running generation
+    server instead and `model` may be None; `tokenizer` is still used to chunk.
+    Returns {(doc_id, summary_type): summary}.
+
+    With `stop_on_degeneration`, looping or refusing generations are cut short;
+    the reason of every stopped chunk, group or final generation is put in the
+    `stop_reasons` dict if one is given, under its generation key.
+
+    With `deduplicate`, each pass generates every distinct (rendered prompt,
+    budget) once and hands the summary to every key that asked for it (see
+    `deduplicate_requests`); keys served that way are put in the `deduplicated`
+    dict as {key: key that was generated}. Served keys get the `stop_reasons` and
+    `token_usage` entries of the key they were served from, so leave them out when
+    counting the work actually done.
+    """
+    if tree_reduce and fan_in < 2:
+        raise ValueError(f"fan_in must be at least 2 for tree reduction to shrink, got {fan_in}")
+    chunk_requests = []
+    with profiler.stage("chunking") as record:
+        for doc_id, summary_type, text in inputs:
+            reserved = prompt_overhead_tokens(tokenizer, summary_type, dataset_name) + max_token_budget(summary_type, dataset_name)
+            chunks = chunk_text_by_token_limit(text, tokenizer, max_len, reserved_tokens=reserved, overlap_tokens=chunk_overlap)
+            for chunk_idx, chunk in enumerate(chunks):
+                chunk_requests.append(((doc_id, summary_type, chunk_idx), chunk, summary_type, dataset_name))
+        record["chunks"] = len(chunk_requests)
+
+    def generate(requests, final=False):
+        if final:
+            budgets = {key: token_budget(type, dataset) for key, _, type, dataset in requests}
+        else:
+            input_ids = tokenizer([text for _, text, _, _ in requests], add_special_tokens=False)["input_ids"] if requests else []
+            budgets = {key: token_budget(type, dataset, len(ids)) for (key, _, type, dataset), ids in zip(requests, input_ids)}
+        served_from = None
+        if deduplicate:
+            requests, served_from = deduplicate_requests(requests, tokenizer, budgets)
+            if deduplicated is not None:
+                deduplicated.update({key: source for key, source in served_from.items() if key != source})
+        if client is not None:
+            summaries = client.generate_summaries(requests, budgets)
+        else:
+            summaries = generate_summaries_batch(requests, model, tokenizer, device=device, batch_size=batch_size,
+                max_new_tokens=budgets, prefix_cache=prefix_cache, summary_cache=summary_cache,
+                stop_on_degeneration=stop_on_degeneration, stop_reasons=stop_reasons, token_usage=token_usage)
+        if served_from is None:
+            return summaries
+        for key, source in served_from.items():
+            if stop_reasons is not None and source in stop_reasons:
+                stop_reasons[key] = stop_reasons[source]
+            if token_usage is not None and source in token_usage:
+                token_usage[key] = token_usage[source]
+        return {key: summaries[source] for key, source in served_from.items()}
+
+    chunk_summaries = generate(chunk_requests)
+
+    combined = {}
+    for key, _, _, _ in chunk_requests:
+        combined.setdefault(key[:2], []).append(chunk_summaries[key])
+
+    pending = [(doc_id, summary_type) for doc_id, summary_type, _ in inputs] if tree_reduce else []
+    for depth in range(1, max_depth + 1):
+        group_requests = []
+        reduced = []
+        with profiler.stage("grouping", depth=depth):
+            for doc_id, summary_type in pending:
+                reserved = prompt_overhead_tokens(tokenizer, summary_type, dataset_name) + max_token_budget(summary_type, dataset_name)
+                groups = group_by_token_limit(combined.get((doc_id, summary_type), []), tokenizer, max_len,
+                    reserved_tokens=reserved, max_group_size=fan_in)
+                if len(groups) <= 1:
+                    continue
+                reduced.append((doc_id, summary_type))
+                for group_idx, group in enumerate(groups):
+                    group_requests.append(((doc_id, summary_type, depth, group_idx), " ".join(group), summary_type, dataset_name))
+        if not group_requests:
+            break
+        group_summaries = generate(group_requests)
+        for key in reduced:
+            combined[key] = []
+        for key, _, _, _ in group_requests:
+            combined[key[:2]].append(group_summaries[key])
+        pending = reduced
+
+    final_requests = [
+        ((doc_id, summary_type), " ".join(combined.get((doc_id, summary_type), [])), summary_type, dataset_name)
+        for doc_id, summary_type, _ in inputs
     ]
-    combined_summary = " ".join(chunk_summaries)
+    return generate(final_requests, final=True)
+
 
-    final_summary = generate_summary(combined_summary, model, tokenizer, model_name=model_name, type=summary_type, dataset=dataset_name)
-    return final_summary
+def chunked_generate_summary(input_text, model_name, summary_type, dataset_name, max_len, model, tokenizer, summary_cache=None,
+    client=None, tree_reduce=True, fan_in=8, stop_on_degeneration=STOP_ON_DEGENERATION):
+    summaries = chunked_generate_summaries([(None, summary_type, input_text)], dataset_name, max_len, model, tokenizer,
+        summary_cache=summary_cache, client=client, tree_reduce=tree_reduce, fan_in=fan_in,
+        stop_on_degeneration=stop_on_degeneration)
+    return summaries[(None, summary_type)]
 
 def process_dataset(
     dataset_name: str,
     model_key: str,
     output_csv: str,
-    split: str = "test"
+    split: str = "test",
+    idf_index_path: str = None,
+    extraction_workers: int = None,
+    generation_batch_size: int = 8,
+    use_prefix_cache: bool = True,
+    chunk_overlap: int = 0,
+    generations_path: str = None,
+    resume: bool = True,
+    run_metrics: bool = True,
+    use_summary_cache: bool = True,
+    summary_cache_dir: str = SUMMARY_CACHE_DIR,
+    source: str = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    offset: int = 0,
+    limit: int = None,
+    generation_url: str = None,
+    tree_reduce: bool = True,
+    fan_in: int = 8,
+    profile_path: str = None,
+    stop_on_degeneration: bool = STOP_ON_DEGENERATION,
+    plan_documents: int = 8,
+    deduplicate: bool = True,
+    embedding_cache_dir: str = EMBEDDING_CACHE_DIR
 ):
-    index = DATASET_INDEX[dataset_name]
+    """
+    Generate eea, ea and abstract summaries for a dataset split and score them.
+
+    Each document's summaries are appended to `generations_path` (a JSONL file,
+    next to `output_csv` by default) as soon as they are produced. With `resume`,
+    documents already in that file are skipped, so a crashed run picks up where it
+    stopped. Metrics are computed from the stored generations by
+    `evaluate_generations`, which can also be run on its own later; InLegalBERT
+    embeddings are kept in the store under `embedding_cache_dir` (None to not
+    keep them).
+
+    Chunk and final summaries are looked up in a `SummaryCache` under
+    `summary_cache_dir` before generating, so reruns that share prompts with an
+    earlier run (e.g. a sweep over thresholds) only generate what changed. Pass
+    `use_summary_cache=False` to always generate.
+
+    Documents are streamed by `DatasetHandler.iter_documents`; `source`,
+    `shard_index`/`num_shards` and `offset`/`limit` are passed through to it.
+
+    With `generation_url`, summaries come from a running `server.GenerationServer`
+    that already holds the model, and only the tokenizer is loaded here. The
+    local summary cache is then not used; the server may have its own.
+
+    With `profile_path`, every stage of every document is timed (wall and CPU
+    time, tokens in/out, peak RSS): per-document totals are stored with each
+    record as `profile_<stage>_<field>` columns, and all stages are written to
+    `profile_path` as a Chrome trace once metrics are done.
+
+    With `stop_on_degeneration`, generations that loop or open like a refusal are
+    stopped early; each record counts them per summary type in
+    `<type>_early_stops`. The generation server has its own decode loop without
+    this check, so it is turned off (with a warning) for a `generation_url`.
+
+    New-token budgets come from `config.TOKEN_BUDGETS`; each record stores the
+    tokens generated and budgeted per summary type (`<type>_tokens_generated`,
+    `<type>_tokens_budgeted`). Budgets are not tracked for a `generation_url`.
+
+    Generation is planned `plan_documents` documents at a time: the prompts of
+    all their summary types are built together, and with `deduplicate` every
+    identical prompt is generated once and shared by all the summaries that need
+    it. Each record counts the generations it got this way in
+    `<type>_deduplicated`; their early stops and tokens are those of the summary
+    they share. A plan's stages are profiled for all its documents together, each
+    record getting an equal share, and its records are appended once the whole
+    plan is generated.
+    """
     max_length = MAX_SEQ_LEN[model_key]
-    doc_name = DATASET_DOC[dataset_name]
-    summary_name = SUMMARY_NAME[dataset_name]
     threshold = THRESHOLD[dataset_name]
     model_name = MODELS[model_key]
     print(f"Loading {dataset_name} ...")
     
-    model_loader = ModelLoader()
-    model, tokenizer = model_loader.load_model(model_name, max_length)
-    
     if dataset_name not in DATASETS:
         raise ValueError(f"Unknown dataset: {dataset_name}")
     dataset_handler = DatasetHandler()
-    train_df, test_df = dataset_handler.dataset_loader(dataset_name)
-    df = test_df if split == "test" else train_df
 
+    if generations_path is None:
+        generations_path = os.path.splitext(output_csv)[0] + ".generations.jsonl"
+    done = set()
+    if resume:
+        done = completed_ids(generations_path)
+        if done:
+            print(f"Resuming: {len(done)} documents already in {generations_path}")
+    elif os.path.exists(generations_path):
+        os.remove(generations_path)
+    if profile_path is not None:
+        profiler.reset()
+        profiler.enable()
+
+    def documents():
+        for doc_id, text, reference in dataset_handler.iter_documents(
+            dataset_name, split, source=source, shard_index=shard_index, num_shards=num_shards, offset=offset, limit=limit
+        ):
+            if str(doc_id) not in done:
+                yield doc_id, text, reference
+
+    # Corpus-level IDF built with corpus_idf.build_idf_index; per-document IDF otherwise
+    idf_index = IdfIndex.load(idf_index_path) if idf_index_path else None
+
+    # Ids are collected as the texts are read, so extraction stages can be attributed to documents
+    extracted_ids = []
+    def texts():
+        for doc_id, text, _ in documents():
+            extracted_ids.append(doc_id)
+            yield text
+
+    print("Extracting...")
+    extractive_summaries = [
+        formatted for _, formatted in extract_batch(texts(), threshold, workers=extraction_workers, idf_index=idf_index,
+            doc_ids=extracted_ids if profiler.enabled else None)
+    ]
+
+    if not extractive_summaries:
+        print(f"All documents already in {generations_path}")
+        if run_metrics:
+            evaluate_generations(generations_path, output_csv, embedding_cache_dir=embedding_cache_dir)
+        return
+
+    client = None
+    if generation_url is not None:
+        if stop_on_degeneration:
+            print("Warning: stop_on_degeneration is not supported by the generation server; generating without it")
+            stop_on_degeneration = False
+        client = GenerationClient(generation_url)
+        model, tokenizer = None, AutoTokenizer.from_pretrained(model_name)
+        use_prefix_cache = False
+    else:
+        # Load the model only after the extraction pool has finished, so workers never fork a loaded model
+        model_loader = ModelLoader()
+        model, tokenizer = model_loader.load_model(model_name, max_length)
+    # Instruction prefixes are prefilled once per (summary type, dataset) for this model
+    prefix_cache = PromptPrefixCache(model) if use_prefix_cache else None
+    summary_cache = SummaryCache(summary_cache_dir, SUMMARY_CACHE_MAX_BYTES, enabled=use_summary_cache)
+
+    early_stops = Counter()
+    total_generated = total_budgeted = total_deduplicated = 0
     print("Generating chunked summaries and references...")
-    results = []
-    for i, row in df.iterrows():
-        doc_id = row[index]
-        input_text = row[doc_name]
-        reference_summary = row[summary_name]
-
-        _, extractive_summary = extraction(input_text, threshold)
-        eea_summary = chunked_generate_summary(extractive_summary, model_key, "eea", dataset_name, max_length, model, tokenizer)
-        ea_summary  = chunked_generate_summary(extractive_summary, model_key, "ea",  dataset_name, max_length, model, tokenizer)
-        abstract    = chunked_generate_summary(input_text, model_key, "abstract", dataset_name, max_length, model, tokenizer)
-
-        results.append({
-            "dataset": dataset_name,
-            "model": model_key,
-            "doc_id": doc_id,
-            "reference_summary": reference_summary,
-            "eea_summary": eea_summary,
-            "ea_summary": ea_summary,
-            "abstract": abstract
-        })
-
-    results_df = pd.DataFrame(results)
-
-    print("Computing ROUGE...")
-    for summ_type in ["eea_summary", "ea_summary", "abstract"]:
-        rouges = compute_rouge_scores_batch(
-            results_df[summ_type].tolist(),
-            results_df["reference_summary"].tolist()
-        )
-        results_df[f"{summ_type}_rouge1"] = [r["rouge1"] for r in rouges]
-        results_df[f"{summ_type}_rouge2"] = [r["rouge2"] for r in rouges]
-        results_df[f"{summ_type}_rougeL"] = [r["rougeL"] for r in rouges]
-
-    print("Computing BERTScore...")
-    for summ_type in ["eea_summary", "ea_summary", "abstract"]:
-        berts = compute_bertscore_batch(
-            results_df[summ_type].tolist(),
-            results_df["reference_summary"].tolist()
-        )
-        results_df[f"{summ_type}_bertscore_p"] = berts["precision"]
-        results_df[f"{summ_type}_bertscore_r"] = berts["recall"]
-        results_df[f"{summ_type}_bertscore_f1"] = berts["f1"]
-
-    print("Computing InLegalBERT similarity...")
-    for summ_type in ["eea_summary", "ea_summary", "abstract"]:
-        sims = compute_semantic_similarity(
-            results_df[summ_type].tolist(),
-            results_df["reference_summary"].tolist()
-        )
-        results_df[f"{summ_type}_inlegalbert_sim"] = sims
-
-    results_df.to_csv(output_csv, index=False)
-    print(f"Saved all results to {output_csv}")
+    # The split is streamed a second time rather than kept in memory alongside the model
+    pending = zip(documents(), extractive_summaries)
+    while True:
+        plan = list(islice(pending, plan_documents))
+        if not plan:
+            break
+        inputs = []
+        for (doc_id, input_text, _), extractive_summary in plan:
+            inputs += [(doc_id, "eea", extractive_summary), (doc_id, "ea", extractive_summary), (doc_id, "abstract", input_text)]
+        stop_reasons = {}
+        token_usage = {}
+        deduplicated = {}
+        with profiler.documents(doc_id for (doc_id, _, _), _ in plan), profiler.stage("generation"):
+            summaries = chunked_generate_summaries(inputs, dataset_name, max_length, model, tokenizer,
+                batch_size=generation_batch_size, prefix_cache=prefix_cache, chunk_overlap=chunk_overlap,
+                summary_cache=summary_cache, client=client, tree_reduce=tree_reduce, fan_in=fan_in,
+                stop_on_degeneration=stop_on_degeneration, stop_reasons=stop_reasons, token_usage=token_usage,
+                deduplicate=deduplicate, deduplicated=deduplicated)
+        # Served keys repeat their source's reason and tokens, so totals count generated keys only
+        early_stops.update(reason for key, reason in stop_reasons.items() if reason is not None and key not in deduplicated)
+        total_deduplicated += len(deduplicated)
+
+        # Generation keys start with (doc_id, summary_type)
+        stopped = Counter(key[:2] for key, reason in stop_reasons.items() if reason is not None)
+        shared = Counter(key[:2] for key in deduplicated)
+        generated, budgeted = Counter(), Counter()
+        for key, (tokens, budget) in token_usage.items():
+            generated[key[:2]] += tokens
+            budgeted[key[:2]] += budget
+            if key not in deduplicated:
+                total_generated += tokens
+                total_budgeted += budget
+
+        for (doc_id, _, reference_summary), _ in plan:
+            eea_summary = summaries[(doc_id, "eea")]
+            ea_summary  = summaries[(doc_id, "ea")]
+            abstract    = summaries[(doc_id, "abstract")]
+
+            append_record(generations_path, {
+                "dataset": dataset_name,
+                "model": model_key,
+                "doc_id": doc_id,
+                "reference_summary": reference_summary,
+                "eea_summary": eea_summary,
+                "ea_summary": ea_summary,
+                "abstract": abstract,
+                **{f"{summary_type}_early_stops": stopped[(doc_id, summary_type)] for summary_type in ["eea", "ea", "abstract"]},
+                **{f"{summary_type}_tokens_generated": generated[(doc_id, summary_type)] for summary_type in ["eea", "ea", "abstract"]},
+                **{f"{summary_type}_tokens_budgeted": budgeted[(doc_id, summary_type)] for summary_type in ["eea", "ea", "abstract"]},
+                **{f"{summary_type}_deduplicated": shared[(doc_id, summary_type)] for summary_type in ["eea", "ea", "abstract"]},
+                **profiler.document_columns(doc_id)
+            })
+
+    if use_summary_cache and client is None:
+        print(f"Summary cache: {summary_cache.stats()}")
+    if stop_on_degeneration:
+        print(f"Generations stopped early: {dict(early_stops)}")
+    if deduplicate:
+        print(f"Generations saved by deduplication: {total_deduplicated}")
+    if total_budgeted:
+        print(f"New tokens: {total_generated} generated of {total_budgeted} budgeted "
+              f"({total_generated / total_budgeted:.0%})")
+
+    if run_metrics:
+        evaluate_generations(generations_path, output_csv, embedding_cache_dir=embedding_cache_dir)
+
+    if profile_path is not None:
+        profiler.write_trace(profile_path)
+        profiler.enable(False)
+        print(f"Saved stage trace to {profile_path}")
 
 
 # if __name__ == "__main__":
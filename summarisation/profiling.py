@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import resource
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process so far, in MB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _NullRecord(dict):
+    # Token counts written while profiling is off are dropped
+    def __setitem__(self, key, value):
+        pass
+
+
+class _NullContext:
+
+    def __enter__(self):
+        return _null_record
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_record = _NullRecord()
+_null_context = _NullContext()
+
+
+class StageProfiler:
+    """
+    Per-document, per-stage timings of a pipeline run.
+
+    `stage(name)` is a context manager recording wall time, CPU time and the
+    process peak RSS when it ends, tagged with the document set by `document`. It
+    yields the record, so code can store token counts in it (`tokens_in`,
+    `tokens_out`). Stages run for several documents at once (`documents`) are
+    shared equally between them. While disabled, `stage`, `document` and
+    `documents` return a shared no-op context and nothing is measured.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self.by_document = defaultdict(list)
+        self.doc_id = None
+        self.doc_ids = None
+        self.origin = time.perf_counter()
+        self.origin_time = time.time()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self.records = []
+        self.by_document = defaultdict(list)
+        self.doc_id = None
+        self.doc_ids = None
+        self.origin = time.perf_counter()
+        self.origin_time = time.time()
+
+    def _fields(self):
+        # Shared stages carry every document they ran for; doc_id stays None
+        if self.doc_ids is not None:
+            return {"doc_id": None, "doc_ids": self.doc_ids}
+        return {"doc_id": self.doc_id}
+
+    def _timestamps(self, start):
+        # start_s places the stage on this run's timeline; start_time is absolute, for merging
+        return {"start_s": start - self.origin, "start_time": self.origin_time + (start - self.origin)}
+
+    def stage(self, name, **fields):
+        if not self.enabled:
+            return _null_context
+        return self._stage(name, fields)
+
+    @contextmanager
+    def _stage(self, name, fields):
+        record = {**self._fields(), "stage": name, **fields}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.update(self._timestamps(wall))
+            record["wall_s"] = time.perf_counter() - wall
+            record["cpu_s"] = time.process_time() - cpu
+            record["peak_rss_mb"] = peak_rss_mb()
+            record["pid"] = os.getpid()
+            self._append(record)
+
+    def add(self, name, start, wall_s, **fields):
+        """
+        Record a stage timed by the caller, from `time.perf_counter()` value `start`.
+        """
+        if self.enabled:
+            self._append({**self._fields(), "stage": name, **fields, **self._timestamps(start),
+                          "wall_s": wall_s, "peak_rss_mb": peak_rss_mb(), "pid": os.getpid()})
+
+    def _append(self, record):
+        self.records.append(record)
+        for doc_id in record.get("doc_ids") or [record["doc_id"]]:
+            self.by_document[doc_id].append(record)
+
+    def document(self, doc_id):
+        """
+        Attribute the stages run inside this context to `doc_id`.
+        """
+        if not self.enabled:
+            return _null_context
+        return self._document(doc_id)
+
+    @contextmanager
+    def _document(self, doc_id, doc_ids=None):
+        previous = self.doc_id, self.doc_ids
+        self.doc_id, self.doc_ids = doc_id, doc_ids
+        try:
+            yield
+        finally:
+            self.doc_id, self.doc_ids = previous
+
+    def documents(self, doc_ids):
+        """
+        Attribute the stages run inside this context to all of `doc_ids` together,
+        e.g. one batched generation for several documents. Each document's columns
+        get an equal share of their time and tokens.
+        """
+        if not self.enabled:
+            return _null_context
+        return self._document(None, list(doc_ids))
+
+    def drain(self):
+        """
+        Remove and return the records so far, e.g. to send them back from a pool worker.
+        """
+        records = self.records
+        self.records = []
+        self.by_document = defaultdict(list)
+        return records
+
+    def merge(self, records, doc_id=None):
+        """
+        Add records from another process, filling in `doc_id` where they have none.
+        Their start times are rebased onto this process's timeline.
+        """
+        for record in records:
+            if record["doc_id"] is None and not record.get("doc_ids"):
+                record["doc_id"] = doc_id
+            record["start_s"] = record["start_time"] - self.origin_time
+            self._append(record)
+
+    def document_columns(self, doc_id):
+        """
+        Totals per stage for one document, as flat `profile_<stage>_<field>` columns.
+        Shared stages count with this document's share.
+        """
+        columns = {}
+        for record in self.by_document.get(doc_id, []):
+            prefix = f"profile_{record['stage']}_"
+            share = 1 / len(record["doc_ids"]) if record.get("doc_ids") else 1
+            for field in ["wall_s", "cpu_s", "tokens_in", "tokens_out"]:
+                if field in record:
+                    columns[prefix + field] = columns.get(prefix + field, 0) + share * record[field]
+            columns[prefix + "peak_rss_mb"] = max(columns.get(prefix + "peak_rss_mb", 0), record["peak_rss_mb"])
+        return columns
+
+    def write_trace(self, path):
+        """
+        Write the records as a Chrome trace (chrome://tracing, Perfetto). Stages
+        from pool workers appear under their own pid, on the same timeline.
+        """
+        events = [{
+            "name": record["stage"],
+            "ph": "X",
+            "ts": record["start_s"] * 1e6,
+            "dur": record["wall_s"] * 1e6,
+            "pid": record["pid"],
+            "tid": 0,
+            "args": {key: value for key, value in record.items() if key not in ("stage", "start_s", "start_time", "pid")},
+        } for record in self.records]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events}, f, default=str)
+
+
+# Shared by every module of a process; disabled unless a run asks for it
+profiler = StageProfiler()
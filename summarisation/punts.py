@@ -1,24 +1,29 @@
+import functools
+import numpy as np
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
 from sentence_transformers import SentenceTransformer
 from collections import Counter
-from nltk.tokenize import sent_tokenize
 import nltk
+from repetition import jaccard_repetition
+
+generic_punts = [
+    "I cannot provide legal advice.",
+    "Please consult a professional.",
+    "I'm unable to answer that.",
+    "I cannot generate a summary.",
+    "I cannot generate a summary of a legal judgment.",
+    "Please provide text to summarise.",
+    "Provide text that you require for me to summarise",
+    "Please consult a lawyer.",
+    "I cannot provide a summary of the judgment in words or less."
+]
 
 # Helper for model and generic punts setup
+# Loaded once per process; later calls return the same model and embeddings
+@functools.lru_cache(maxsize=None)
 def load_punt_detection_model_and_embeddings(model_name="sentence-transformers/paraphrase-mpnet-base-v2"):
     model = SentenceTransformer(model_name)
-    generic_punts = [
-        "I cannot provide legal advice.",
-        "Please consult a professional.",
-        "I'm unable to answer that.",
-        "I cannot generate a summary.",
-        "I cannot generate a summary of a legal judgment.",
-        "Please provide text to summarise.",
-        "Provide text that you require for me to summarise",
-        "Please consult a lawyer.",
-        "I cannot provide a summary of the judgment in words or less."
-    ]
     generic_embeddings = model.encode(generic_punts)
     return model, generic_embeddings, generic_punts
 
@@ -33,6 +38,58 @@ def is_punt_response(response, model, generic_embeddings, threshold=0.65):
     except Exception:
         return True  # Treat encoding errors as punts
 
+def punt_similarities(responses, model, generic_embeddings, batch_size=64):
+    """
+    Highest cosine similarity of each response to the generic punts.
+
+    Distinct responses are sorted by length and encoded `batch_size` at a time,
+    then compared with every punt in a single matrix product. If a batch fails
+    to encode, its responses are retried one by one; a response that still
+    fails gets a NaN similarity (and is flagged as a punt by `detect_punts`,
+    like an encoding error in `is_punt_response`).
+    """
+    unique = list(dict.fromkeys(responses))
+    if not unique:
+        return np.zeros(0, dtype=np.float32)
+    generic = np.asarray(generic_embeddings, dtype=np.float32)
+    generic = generic / np.clip(np.linalg.norm(generic, axis=1, keepdims=True), 1e-12, None)
+
+    def similarities(texts):
+        embeddings = np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+        embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return (embeddings @ generic.T).max(axis=1)
+
+    best = np.full(len(unique), np.nan, dtype=np.float32)
+    order = sorted(range(len(unique)), key=lambda i: len(unique[i]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        try:
+            best[batch] = similarities([unique[i] for i in batch])
+        except Exception:
+            for i in batch:
+                try:
+                    best[i] = similarities([unique[i]])[0]
+                except Exception:
+                    pass
+    index = {response: i for i, response in enumerate(unique)}
+    return best[[index[response] for response in responses]]
+
+
+def detect_punts(df, summary_cols, model, generic_embeddings, threshold=0.65, batch_size=64):
+    """
+    Add `<col>_punt` flags and `<col>_punt_similarity` columns to `df` for each
+    summary column. Responses that could not be encoded have a NaN similarity
+    and count as punts.
+    """
+    for col in summary_cols:
+        # str() rather than astype(str), which keeps missing values as NaN in pandas 3
+        responses = [str(response) for response in df[col]] if col in df else [""] * len(df)
+        similarities = punt_similarities(responses, model, generic_embeddings, batch_size)
+        df[f"{col}_punt_similarity"] = similarities
+        df[f"{col}_punt"] = (similarities > threshold) | np.isnan(similarities)
+    return df
+
+
 def has_ngram_repetition(text, n=3):
     tokens = text.split()
     ngrams = [' '.join(tokens[i:i+n]) for i in range(len(tokens)-n+1)]
@@ -40,60 +97,61 @@ def has_ngram_repetition(text, n=3):
     return any(c > 1 for c in count.values())
 
 def has_jaccard_repetition(text, threshold=0.95):
-    sentences = sent_tokenize(text)
-    for i in range(len(sentences)):
-        for j in range(i + 1, len(sentences)):
-            set1 = set(sentences[i].lower().split())
-            set2 = set(sentences[j].lower().split())
-            if len(set1 | set2) == 0:
-                continue
-            sim = len(set1 & set2) / len(set1 | set2)
-            if sim > threshold:
-                return True
-    return False
+    """
+    Whether any two sentences have word-set Jaccard similarity above `threshold`
+    (see `repetition.jaccard_repetition` for the pairs and a repetition ratio).
+    """
+    return bool(jaccard_repetition(text, threshold, max_pairs=1).pairs)
 
 def analyze_punts_and_repetitions(
     df: pd.DataFrame,
     model=None,
     generic_embeddings=None,
-    summary_cols=None
+    summary_cols=None,
+    batch_size=64,
+    annotate=False
 ):
+    """
+    Count punts and repetitive responses in each summary column.
 
+    Returns {col: counts}. `df` is left unchanged unless `annotate` is set, in
+    which case the per-row columns are added to it: `<col>_punt`,
+    `<col>_punt_similarity` (see `detect_punts`), `<col>_ngram_repetition` and
+    `<col>_jaccard_repetition` for each summary column.
+    """
     if summary_cols is None:
         summary_cols = ['abstract_summary', 'ea_summary', 'eea_summary']
+    if not annotate:
+        df = df.copy()
 
     if model is None or generic_embeddings is None:
         model, generic_embeddings, _ = load_punt_detection_model_and_embeddings()
+    detect_punts(df, summary_cols, model, generic_embeddings, batch_size=batch_size)
     results = {}
 
     for col in summary_cols:
-        punts = 0
-        ngram_repeats = 0
-        jaccard_repeats = 0
-        total = 0
-
-        for _, row in df.iterrows():
-            response = str(row.get(col, ""))
-            total += 1
-            if is_punt_response(response, model, generic_embeddings):
-                punts += 1
-            if has_ngram_repetition(response):
-                ngram_repeats += 1
-            if has_jaccard_repetition(response):
-                jaccard_repeats += 1
+        responses = [str(response) for response in df[col]] if col in df else [""] * len(df)
+        df[f"{col}_ngram_repetition"] = [has_ngram_repetition(response) for response in responses]
+        df[f"{col}_jaccard_repetition"] = [has_jaccard_repetition(response) for response in responses]
 
         results[col] = {
-            "punt_count": punts,
-            "ngram_repetition_count": ngram_repeats,
-            "jaccard_repetition_count": jaccard_repeats,
-            "total": total
+            "punt_count": int(df[f"{col}_punt"].sum()),
+            "ngram_repetition_count": int(df[f"{col}_ngram_repetition"].sum()),
+            "jaccard_repetition_count": int(df[f"{col}_jaccard_repetition"].sum()),
+            "total": len(df)
         }
 
     return results
 
-def analyze_punts_and_repetitions_from_csv(csv_path, model=None, generic_embeddings=None, summary_cols=None):
+def analyze_punts_and_repetitions_from_csv(csv_path, model=None, generic_embeddings=None, summary_cols=None,
+    annotated_csv=None):
     """
-    Loads a CSV and analyzes punts and repetitions.
+    Loads a CSV and analyzes punts and repetitions. With `annotated_csv`, the rows
+    are written there with their per-row punt and repetition columns.
     """
     df = pd.read_csv(csv_path, encoding="utf-8")
-    return analyze_punts_and_repetitions(df, model=model, generic_embeddings=generic_embeddings, summary_cols=summary_cols)
\ No newline at end of file
+    results = analyze_punts_and_repetitions(df, model=model, generic_embeddings=generic_embeddings,
+        summary_cols=summary_cols, annotate=annotated_csv is not None)
+    if annotated_csv is not None:
+        df.to_csv(annotated_csv, index=False, encoding="utf-8")
+    return results
\ No newline at end of file
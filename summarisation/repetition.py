@@ -0,0 +1,129 @@
+import zlib
+from collections import namedtuple
+from itertools import combinations, islice
+import numpy as np
+from nltk.tokenize import sent_tokenize
+
+Repetition = namedtuple("Repetition", ["pairs", "ratio", "sentences"])
+
+# Universal hashing (a * x + b) mod p; with p < 2**31 the products fit in int64
+_PRIME = (1 << 31) - 1
+# Highest probability that LSH misses a pair at exactly the threshold
+_MISS_PROBABILITY = 1e-11
+
+
+def jaccard(set1, set2):
+    union = len(set1 | set2)
+    return len(set1 & set2) / union if union else 0.0
+
+
+def minhash_signatures(word_sets, num_perm=64, seed=0):
+    """
+    MinHash signature of each non-empty word set, as a (len(word_sets), num_perm) array.
+
+    Each distinct word is hashed once; the signature of a set is the minimum
+    of every permutation over its words, taken with one `np.minimum.reduceat`.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    vocabulary = {}
+    word_ids = [vocabulary.setdefault(word, len(vocabulary)) for words in word_sets for word in words]
+    hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) % _PRIME for word in vocabulary),
+                         dtype=np.int64, count=len(vocabulary))
+    permuted = (hashes[:, None] * a + b) % _PRIME
+    offsets = np.cumsum([0] + [len(words) for words in word_sets[:-1]])
+    return np.minimum.reduceat(permuted[np.asarray(word_ids, dtype=np.int64)], offsets, axis=0)
+
+
+def lsh_candidates(signatures, bands):
+    """
+    Pairs (i, j), i < j, of rows whose signatures agree on all rows of at least one band.
+    """
+    candidates = set()
+    for band in np.array_split(signatures, bands, axis=1):
+        _, bucket = np.unique(band, axis=0, return_inverse=True)
+        order = np.argsort(bucket.ravel(), kind="stable")
+        buckets = np.split(order, np.flatnonzero(np.diff(bucket.ravel()[order])) + 1)
+        for members in buckets:
+            if len(members) > 1:
+                candidates.update(combinations(members.tolist(), 2))
+    return candidates
+
+
+def lsh_bands(threshold, num_perm=64, miss_probability=_MISS_PROBABILITY):
+    """
+    Fewest bands of `num_perm` MinHash rows that miss a pair at similarity
+    `threshold` with at most `miss_probability`, or None if even one row per band
+    cannot (a low threshold), in which case pairs must be compared exactly.
+    """
+    for bands in range(1, num_perm + 1):
+        # np.array_split makes the first bands one row longer, and longer bands miss more
+        rows = -(-num_perm // bands)
+        if (1 - threshold ** rows) ** bands <= miss_probability:
+            return bands
+    return None
+
+
+def jaccard_repetition(text, threshold=0.95, num_perm=64, bands=None, max_pairs=None, exact_below=64,
+    pair_limit=100_000):
+    """
+    Sentence pairs of `text` whose word-set Jaccard similarity exceeds `threshold`.
+
+    Sentences and word sets are those of `has_jaccard_repetition`. Identical word
+    sets are grouped first; the distinct sets are MinHashed and split into `bands`
+    bands, and only pairs that share a band bucket are checked with the exact
+    Jaccard similarity. By default the bands come from `lsh_bands`, so a pair just
+    above `threshold` is missed with probability below 1e-11; thresholds too low
+    for that are compared exactly. Up to `exact_below` distinct sets are simply
+    compared pairwise.
+
+    Returns a `Repetition` of the repeating (i, j) sentence index pairs, the
+    fraction of sentences in at least one pair, and the sentences. Pairs are
+    expanded from the groups lazily and at most `pair_limit` are listed (a
+    looping text has quadratically many); the ratio counts every group member.
+    With `max_pairs`, stops once that many pairs are found, so the ratio is a
+    lower bound.
+    """
+    sentences = sent_tokenize(text)
+    groups = {}
+    for i, sentence in enumerate(sentences):
+        words = frozenset(sentence.lower().split())
+        if words:
+            groups.setdefault(words, []).append(i)
+    word_sets = list(groups)
+    members = list(groups.values())
+
+    limit = pair_limit if max_pairs is None else min(max_pairs, pair_limit)
+    pairs = []
+    repeated = set()
+
+    def found(x, y, new_pairs):
+        repeated.update((x, y))
+        if len(pairs) < limit:
+            pairs.extend(islice(new_pairs, limit - len(pairs)))
+        return max_pairs is not None and len(pairs) >= max_pairs
+
+    def finish():
+        ratio = sum(len(members[x]) for x in repeated) / len(sentences) if sentences else 0.0
+        return Repetition(sorted(pairs), ratio, sentences)
+
+    # Sentences with the same word set have similarity 1
+    if threshold < 1:
+        for x, indices in enumerate(members):
+            if len(indices) > 1 and found(x, x, combinations(indices, 2)):
+                return finish()
+
+    if bands is None:
+        bands = lsh_bands(threshold, num_perm)
+    if len(word_sets) <= exact_below or bands is None:
+        candidates = combinations(range(len(word_sets)), 2)
+    else:
+        candidates = sorted(lsh_candidates(minhash_signatures(word_sets, num_perm), bands))
+    for x, y in candidates:
+        if jaccard(word_sets[x], word_sets[y]) > threshold:
+            new_pairs = (tuple(sorted(pair)) for pair in ((i, j) for i in members[x] for j in members[y]))
+            if found(x, y, new_pairs):
+                break
+    return finish()
@@ -0,0 +1,123 @@
+import re
+import collections
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from nltk.stem import porter
+from rouge_score import scoring, tokenize
+
+
+class MemoStemmer:
+    """
+    Porter stemmer that remembers every word it has stemmed.
+    """
+
+    def __init__(self):
+        self.stemmer = porter.PorterStemmer()
+        self.stem = lru_cache(maxsize=None)(self.stemmer.stem)
+
+
+_stemmer = MemoStemmer()
+
+
+def rouge_tokenize(text, use_stemmer=True):
+    """
+    Tokens exactly as `rouge_scorer.RougeScorer` produces them.
+    """
+    return tokenize.tokenize(text, _stemmer if use_stemmer else None)
+
+
+def ngram_counts(tokens, n):
+    return collections.Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def lcs_length(a, b):
+    """
+    Length of the longest common subsequence of two token lists.
+
+    Bit-parallel: each bit of `v` stands for one position of `a`, so a whole row
+    of the dynamic programming table is updated with a few integer operations.
+    """
+    if not a or not b:
+        return 0
+    masks = {}
+    for i, token in enumerate(a):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for token in b:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count("1")
+
+
+def _score(overlap, target_count, prediction_count):
+    precision = overlap / max(prediction_count, 1)
+    recall = overlap / max(target_count, 1)
+    return scoring.Score(precision=precision, recall=recall, fmeasure=scoring.fmeasure(precision, recall))
+
+
+def score_tokens(target_tokens, prediction_tokens, rouge_types, target_ngrams=None):
+    """
+    ROUGE scores of one pre-tokenized pair, equal to `RougeScorer.score`.
+    `target_ngrams` may hold the target's n-gram counts keyed by n.
+    """
+    result = {}
+    for rouge_type in rouge_types:
+        if rouge_type == "rougeL":
+            if not target_tokens or not prediction_tokens:
+                result[rouge_type] = scoring.Score(precision=0, recall=0, fmeasure=0)
+                continue
+            lcs = lcs_length(target_tokens, prediction_tokens)
+            precision = lcs / len(prediction_tokens)
+            recall = lcs / len(target_tokens)
+            result[rouge_type] = scoring.Score(precision=precision, recall=recall,
+                                               fmeasure=scoring.fmeasure(precision, recall))
+        elif re.match(r"rouge[0-9]$", rouge_type):
+            n = int(rouge_type[5:])
+            if n <= 0:
+                raise ValueError("rougen requires positive n: %s" % rouge_type)
+            target = target_ngrams[n] if target_ngrams and n in target_ngrams else ngram_counts(target_tokens, n)
+            prediction = ngram_counts(prediction_tokens, n)
+            overlap = 0
+            for ngram, count in target.items():
+                overlap += min(count, prediction[ngram])
+            result[rouge_type] = _score(overlap, sum(target.values()), sum(prediction.values()))
+        else:
+            raise ValueError("Invalid rouge type: %s" % rouge_type)
+    return result
+
+
+def _score_reference(task):
+    target_tokens, predictions, rouge_types = task
+    ngram_sizes = {int(t[5:]) for t in rouge_types if re.match(r"rouge[0-9]$", t)}
+    target_ngrams = {n: ngram_counts(target_tokens, n) for n in ngram_sizes if n > 0}
+    return [score_tokens(target_tokens, prediction, rouge_types, target_ngrams) for prediction in predictions]
+
+
+def rouge_scores_columns(generated_columns, reference_summaries, rouge_types=("rouge1", "rouge2", "rougeL"),
+    use_stemmer=True, workers=1, chunksize=8):
+    """
+    ROUGE of several columns of generated summaries against one reference set.
+
+    `generated_columns` maps a column name to its summaries. Each distinct text is
+    tokenized and stemmed once, and each reference's n-grams are counted once for
+    all columns. Scoring is spread over `workers` processes (`None` uses every
+    core). Returns {name: [{rouge_type: Score(precision, recall, fmeasure)}]}, with
+    the same values as `rouge_scorer.RougeScorer(rouge_types, use_stemmer).score`.
+    """
+    for generated in generated_columns.values():
+        assert len(generated) == len(reference_summaries), "Input lists must match length"
+    names = list(generated_columns)
+    texts = dict.fromkeys(list(reference_summaries) + [t for name in names for t in generated_columns[name]])
+    tokens = {text: rouge_tokenize(text, use_stemmer) for text in texts}
+
+    tasks = [
+        (tokens[reference], [tokens[generated_columns[name][i]] for name in names], tuple(rouge_types))
+        for i, reference in enumerate(reference_summaries)
+    ]
+    if workers == 1:
+        scored = [_score_reference(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            scored = list(executor.map(_score_reference, tasks, chunksize=chunksize))
+    return {name: [row[j] for row in scored] for j, name in enumerate(names)}
@@ -0,0 +1,319 @@
+import time
+import asyncio
+from collections import deque
+import torch
+import requests
+from aiohttp import web
+from transformers import DynamicCache
+from summarise import build_prompt, summary_cache_key, token_budget, _extract_summary
+
+
+def _cache_tensors(cache):
+    # transformers >= 4.56 keeps one object per layer; older versions keep two lists
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def _build_cache(tensors):
+    cache = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(tensors):
+        cache.update(keys, values, layer_idx)
+    return cache
+
+
+def _left_pad(tensor, width, dim):
+    pad = width - tensor.shape[dim]
+    if pad == 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = pad
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class _Request:
+
+    def __init__(self, prompt_ids, max_new_tokens, future):
+        self.prompt_ids = prompt_ids
+        self.max_new_tokens = max_new_tokens
+        self.future = future
+        self.generated = []
+        self.arrived = time.perf_counter()
+        self.first_token = None
+
+
+class GenerationServer:
+    """
+    One loaded model serving summarisation requests with continuous batching.
+
+    Requests wait in a queue and are admitted into the running decode batch
+    whenever a slot is free: each new prompt is prefilled on its own, then its
+    key/value cache is left-padded and stacked onto the batch's cache, and every
+    step decodes one greedy token for all running requests. Finished requests
+    leave the batch immediately instead of waiting for the longest one. Decoding
+    matches `generate_summary` (greedy, same prompt and decoding of the output).
+    """
+
+    def __init__(self, model, tokenizer, device="cuda", max_batch_size=8, max_new_tokens=5000, summary_cache=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_new_tokens = max_new_tokens
+        self.summary_cache = summary_cache
+        eos = model.generation_config.eos_token_id
+        if eos is None:
+            eos = tokenizer.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, (list, tuple)) else [eos])
+
+        self.queue = asyncio.Queue()
+        self.rows = []
+        self.cache = None
+        self.attention_mask = None
+        self.completed = 0
+        self.generated_tokens = 0
+        self.steps = 0
+        self.batch_rows = 0
+        self.latencies = deque(maxlen=1000)
+        self.first_token_latencies = deque(maxlen=1000)
+        self.started = time.perf_counter()
+
+    async def submit(self, text, type="eea", dataset="civilsum", max_new_tokens=None):
+        """
+        Queue one summarisation request and wait for its summary. Without
+        `max_new_tokens`, the final-summary `token_budget` of its type is used.
+        """
+        max_new_tokens = min(max_new_tokens or token_budget(type, dataset), self.max_new_tokens)
+        cache_key = None
+        if self.summary_cache is not None:
+            cache_key = summary_cache_key(self.model, text, type, dataset, max_new_tokens)
+            summary = self.summary_cache.get(cache_key)
+            if summary is not None:
+                return summary
+        prompt_ids = self.tokenizer(build_prompt(text, self.tokenizer, type, dataset))["input_ids"]
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(_Request(prompt_ids, max_new_tokens, future))
+        summary = await future
+        if self.summary_cache is not None:
+            self.summary_cache.put(cache_key, summary)
+        return summary
+
+    async def run(self):
+        """
+        Scheduler loop: admit waiting requests, then run one decode step, forever.
+        Model calls run in a worker thread so the event loop keeps accepting requests.
+
+        If a step fails (out of memory, a CUDA error, a bad input), every request
+        it was running fails with that exception, the batch is emptied and the
+        loop goes on with the next requests in the queue.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.rows:
+                admitted = [await self.queue.get()]
+            else:
+                admitted = []
+            while len(self.rows) + len(admitted) < self.max_batch_size and not self.queue.empty():
+                admitted.append(self.queue.get_nowait())
+            try:
+                finished = await loop.run_in_executor(None, self._step, admitted)
+            except Exception as e:
+                self._fail(admitted + self.rows, e)
+                continue
+            for request in finished:
+                self._finish(request)
+
+    def _fail(self, requests, error):
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(error)
+        self.rows = []
+        self.cache = None
+        self.attention_mask = None
+
+    def _finish(self, request):
+        now = time.perf_counter()
+        self.completed += 1
+        self.latencies.append(now - request.arrived)
+        ids = request.prompt_ids + request.generated
+        summary = _extract_summary(self.tokenizer.decode(ids, skip_special_tokens=True))
+        if not request.future.done():
+            request.future.set_result(summary)
+
+    def _done(self, request):
+        return request.generated[-1] in self.eos_token_ids or len(request.generated) >= request.max_new_tokens
+
+    def _step(self, admitted):
+        finished = []
+        with torch.inference_mode():
+            for request in admitted:
+                out = self.model(
+                    input_ids=torch.tensor([request.prompt_ids], device=self.device),
+                    past_key_values=DynamicCache(),
+                    use_cache=True,
+                )
+                request.generated.append(int(out.logits[0, -1].argmax()))
+                request.first_token = time.perf_counter()
+                self.first_token_latencies.append(request.first_token - request.arrived)
+                self.generated_tokens += 1
+                if self._done(request):
+                    finished.append(request)
+                else:
+                    self._admit(request, _cache_tensors(out.past_key_values))
+
+            if not self.rows:
+                return finished
+
+            self.attention_mask = torch.cat([self.attention_mask, self.attention_mask.new_ones((len(self.rows), 1))], dim=1)
+            out = self.model(
+                input_ids=torch.tensor([[r.generated[-1]] for r in self.rows], device=self.device),
+                attention_mask=self.attention_mask,
+                position_ids=torch.tensor([[len(r.prompt_ids) + len(r.generated) - 1] for r in self.rows], device=self.device),
+                past_key_values=self.cache,
+                use_cache=True,
+            )
+            self.cache = out.past_key_values
+            self.steps += 1
+            self.batch_rows += len(self.rows)
+            for request, token in zip(self.rows, out.logits[:, -1].argmax(dim=-1).tolist()):
+                request.generated.append(token)
+                self.generated_tokens += 1
+
+            keep = [i for i, request in enumerate(self.rows) if not self._done(request)]
+            finished.extend(request for request in self.rows if self._done(request))
+            if len(keep) < len(self.rows):
+                self._evict(keep)
+        return finished
+
+    def _admit(self, request, tensors):
+        length = len(request.prompt_ids)
+        mask = torch.ones((1, length), dtype=torch.long, device=self.device)
+        if not self.rows:
+            self.cache = _build_cache(tensors)
+            self.attention_mask = mask
+        else:
+            width = max(self.attention_mask.shape[1], length)
+            self.cache = _build_cache([
+                (torch.cat([_left_pad(k, width, 2), _left_pad(nk, width, 2)]),
+                 torch.cat([_left_pad(v, width, 2), _left_pad(nv, width, 2)]))
+                for (k, v), (nk, nv) in zip(_cache_tensors(self.cache), tensors)
+            ])
+            self.attention_mask = torch.cat([_left_pad(self.attention_mask, width, 1), _left_pad(mask, width, 1)])
+        self.rows.append(request)
+
+    def _evict(self, keep):
+        self.rows = [self.rows[i] for i in keep]
+        if not self.rows:
+            self.cache = None
+            self.attention_mask = None
+            return
+        index = torch.tensor(keep, device=self.device)
+        mask = self.attention_mask[index]
+        # Drop leading columns that are padding for every remaining row
+        start = int(mask.any(dim=0).nonzero()[0])
+        self.attention_mask = mask[:, start:]
+        self.cache = _build_cache([
+            (k[index][:, :, start:], v[index][:, :, start:]) for k, v in _cache_tensors(self.cache)
+        ])
+
+    def metrics(self):
+        def percentile(values, q):
+            if not values:
+                return None
+            values = sorted(values)
+            return values[min(len(values) - 1, int(q * len(values)))]
+        return {
+            "queue_depth": self.queue.qsize(),
+            "active": len(self.rows),
+            "completed": self.completed,
+            "generated_tokens": self.generated_tokens,
+            "mean_batch_size": self.batch_rows / self.steps if self.steps else 0.0,
+            "latency_p50": percentile(self.latencies, 0.5),
+            "latency_p95": percentile(self.latencies, 0.95),
+            "first_token_p50": percentile(self.first_token_latencies, 0.5),
+            "uptime": time.perf_counter() - self.started,
+        }
+
+
+def make_app(server):
+    """
+    HTTP API of a `GenerationServer`:
+
+        POST /generate  {"requests": [{"text", "type", "dataset", "max_new_tokens"?}]}
+                        -> {"summaries": [...]} in request order
+        GET  /metrics   queue depth, batch size and latency figures
+    """
+    async def generate(request):
+        body = await request.json()
+        try:
+            summaries = await asyncio.gather(*(
+                server.submit(r["text"], r.get("type", "eea"), r.get("dataset", "civilsum"), r.get("max_new_tokens"))
+                for r in body["requests"]
+            ))
+        except Exception as e:
+            return web.json_response({"error": f"{type(e).__name__}: {e}"}, status=500)
+        return web.json_response({"summaries": summaries})
+
+    async def metrics(request):
+        return web.json_response(server.metrics())
+
+    async def start_scheduler(app):
+        app["scheduler"] = asyncio.create_task(server.run())
+
+    async def stop_scheduler(app):
+        app["scheduler"].cancel()
+
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post("/generate", generate)
+    app.router.add_get("/metrics", metrics)
+    app.on_startup.append(start_scheduler)
+    app.on_cleanup.append(stop_scheduler)
+    return app
+
+
+def serve(model_key, host="127.0.0.1", port=8765, max_batch_size=8, summary_cache=None):
+    """
+    Load `model_key` once with `ModelLoader` and serve it until interrupted.
+    """
+    from config import MODELS, MAX_SEQ_LEN, MAX_NEW_TOK
+    from model import ModelLoader
+    model, tokenizer = ModelLoader().load_model(MODELS[model_key], MAX_SEQ_LEN[model_key])
+    server = GenerationServer(model, tokenizer, max_batch_size=max_batch_size, max_new_tokens=MAX_NEW_TOK,
+                              summary_cache=summary_cache)
+    web.run_app(make_app(server), host=host, port=port)
+
+
+class GenerationClient:
+    """
+    Client of a `GenerationServer`, a drop-in for `generate_summaries_batch`.
+
+    `timeout` is passed to `requests`: (connect, read) seconds by default, where
+    the read timeout bounds the wait for a whole batch of summaries.
+    """
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=(10, 3600)):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def generate_summaries(self, generation_requests, max_new_tokens=None):
+        """
+        `generation_requests` is a list of (key, text, type, dataset); returns {key: summary}.
+        `max_new_tokens` is one budget for all requests or a dict {key: budget}.
+        """
+        payload = {"requests": [
+            {"text": text, "type": type, "dataset": dataset,
+             "max_new_tokens": max_new_tokens.get(key) if isinstance(max_new_tokens, dict) else max_new_tokens}
+            for key, text, type, dataset in generation_requests
+        ]}
+        response = self.session.post(f"{self.url}/generate", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return {key: summary for (key, _, _, _), summary in zip(generation_requests, response.json()["summaries"])}
+
+    def generate_summary(self, text, type="eea", dataset="civilsum", max_new_tokens=None):
+        return self.generate_summaries([(None, text, type, dataset)], max_new_tokens)[None]
+
+    def metrics(self):
+        response = self.session.get(f"{self.url}/metrics", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,147 @@
+import os
+import json
+import multiprocessing
+from itertools import product
+from config import MODELS, DATASETS, EMBEDDING_CACHE_DIR
+from dataset import DatasetHandler
+from evaluate import evaluate_generations
+from store import read_records
+
+
+def shard_generations_path(output_csv, shard_index, num_shards):
+    return os.path.splitext(output_csv)[0] + f".shard{shard_index}of{num_shards}.generations.jsonl"
+
+
+def run_shard(dataset_name, model_key, output_csv, shard_index, num_shards, embedding_cache_dir=EMBEDDING_CACHE_DIR,
+    **kwargs):
+    """
+    Generate the summaries of one shard of a dataset split into its own JSONL file.
+
+    The shard is the set of documents whose doc id hashes to `shard_index` (see
+    `dataset.shard_of`), so any process on any machine can run any shard. Metrics
+    are left to `merge_shards`.
+    """
+    # Imported here so merging and sweep planning do not load the generation stack
+    from .process import process_dataset
+    process_dataset(
+        dataset_name, model_key, output_csv,
+        shard_index=shard_index,
+        num_shards=num_shards,
+        generations_path=shard_generations_path(output_csv, shard_index, num_shards),
+        run_metrics=False,
+        embedding_cache_dir=embedding_cache_dir,
+        **kwargs
+    )
+
+
+def merge_shards(dataset_name, model_key, output_csv, num_shards, split="test", source=None, offset=0, limit=None,
+    run_metrics=True, embedding_cache_dir=EMBEDDING_CACHE_DIR):
+    """
+    Merge the shard JSONL files of a run into `<output_csv>.generations.jsonl` and score it.
+
+    Records are written in the order of the dataset split, so the merged file and
+    csv are the same whatever the number of shards or the order they finished in.
+    InLegalBERT embeddings are kept under `embedding_cache_dir` (see
+    `evaluate_generations`). Returns the merged records.
+    """
+    records = {}
+    for shard_index in range(num_shards):
+        for record in read_records(shard_generations_path(output_csv, shard_index, num_shards)):
+            records[str(record["doc_id"])] = record
+
+    order = {}
+    for doc_id, _, _ in DatasetHandler().iter_documents(dataset_name, split, source=source, offset=offset, limit=limit):
+        order.setdefault(str(doc_id), len(order))
+    merged = [records[doc_id] for doc_id in sorted(records, key=lambda d: (order.get(d, len(order)), d))]
+
+    generations_path = os.path.splitext(output_csv)[0] + ".generations.jsonl"
+    with open(generations_path + ".tmp", "w", encoding="utf-8") as f:
+        for record in merged:
+            f.write(json.dumps(record) + "\n")
+    os.replace(generations_path + ".tmp", generations_path)
+    print(f"Merged {len(merged)} documents from {num_shards} shards into {generations_path}")
+
+    if run_metrics:
+        evaluate_generations(generations_path, output_csv, embedding_cache_dir=embedding_cache_dir)
+    return merged
+
+
+def _shard_worker(shard_fn, device, args, kwargs):
+    if device is not None:
+        # Each local worker sees only its own GPU, which it then addresses as "cuda"
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(device)
+    shard_fn(*args, **kwargs)
+
+
+def run_sharded(dataset_name, model_key, output_csv, num_shards, devices=None, run_metrics=True, shard_fn=run_shard,
+    **kwargs):
+    """
+    Run `process_dataset` as `num_shards` local processes and merge their outputs.
+
+    Each process loads its own model; `devices`, if given, assigns GPU ids to
+    shards round-robin. Processes are spawned rather than forked so none inherits a
+    CUDA context. Unless `extraction_workers` is given, the cores are split
+    between the shards' extraction pools. Remaining keyword arguments go to
+    `process_dataset`. `shard_fn` is what each process runs, `run_shard` unless
+    replaced (e.g. by a stand-in generator in tests); it must be picklable.
+    """
+    kwargs.setdefault("extraction_workers", max(1, (os.cpu_count() or 1) // num_shards))
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for shard_index in range(num_shards):
+        device = devices[shard_index % len(devices)] if devices else None
+        worker = context.Process(
+            target=_shard_worker,
+            args=(shard_fn, device, (dataset_name, model_key, output_csv, shard_index, num_shards), kwargs),
+        )
+        worker.start()
+        workers.append(worker)
+    for worker in workers:
+        worker.join()
+    failed = [shard_index for shard_index, worker in enumerate(workers) if worker.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Shards {failed} of {dataset_name}/{model_key} failed; rerun them to resume")
+
+    merge_keys = ("split", "source", "offset", "limit", "embedding_cache_dir")
+    return merge_shards(dataset_name, model_key, output_csv, num_shards, run_metrics=run_metrics,
+                        **{key: kwargs[key] for key in merge_keys if key in kwargs})
+
+
+def sweep_tasks(datasets=None, models=None, num_shards=1):
+    """
+    Every (dataset, model, shard index) of a sweep, in a fixed order.
+    """
+    datasets = list(DATASETS) if datasets is None else datasets
+    models = list(MODELS) if models is None else models
+    return list(product(datasets, models, range(num_shards)))
+
+
+def sweep_output_csv(output_dir, dataset_name, model_key):
+    return os.path.join(output_dir, f"{dataset_name}_{model_key}.csv")
+
+
+def run_sweep_node(node_index, num_nodes, output_dir, datasets=None, models=None, num_shards=1, **kwargs):
+    """
+    Run this machine's share of a dataset x model sweep.
+
+    The tasks of `sweep_tasks` are dealt out round-robin over `num_nodes`
+    machines; every machine runs the same call with its own `node_index` and
+    writes shard files under a shared `output_dir`. Once all nodes are done, run
+    `merge_sweep` once.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = sweep_tasks(datasets, models, num_shards)
+    for dataset_name, model_key, shard_index in tasks[node_index::num_nodes]:
+        print(f"Node {node_index}: {dataset_name} / {model_key}, shard {shard_index + 1} of {num_shards}")
+        run_shard(dataset_name, model_key, sweep_output_csv(output_dir, dataset_name, model_key),
+                  shard_index, num_shards, **kwargs)
+
+
+def merge_sweep(output_dir, datasets=None, models=None, num_shards=1, **kwargs):
+    """
+    Merge and score every (dataset, model) run of a sweep written by `run_sweep_node`.
+    """
+    datasets = list(DATASETS) if datasets is None else datasets
+    models = list(MODELS) if models is None else models
+    for dataset_name, model_key in product(datasets, models):
+        merge_shards(dataset_name, model_key, sweep_output_csv(output_dir, dataset_name, model_key), num_shards, **kwargs)
@@ -0,0 +1,73 @@
+import os
+import json
+
+
+def _to_json(value):
+    # numpy scalars such as doc ids read through pandas
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _drop_partial_line(f):
+    """
+    Truncate a last line left without its newline by a crash, back to the previous newline.
+    """
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        return
+    f.seek(end - 1)
+    if f.read(1) == b"\n":
+        return
+    pos = end
+    while pos > 0:
+        step = min(pos, 1 << 16)
+        pos -= step
+        f.seek(pos)
+        newline = f.read(step).rfind(b"\n")
+        if newline >= 0:
+            f.truncate(pos + newline + 1)
+            return
+    f.truncate(0)
+
+
+def append_record(path, record):
+    """
+    Append one record to a JSONL file and flush it to disk, so it survives a crash.
+    A partial last line left by an earlier crash is removed first, so the record
+    starts on a line of its own.
+    """
+    with open(path, "a+b") as f:
+        _drop_partial_line(f)
+        f.write((json.dumps(record, default=_to_json) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_records(path):
+    """
+    Read all records of a JSONL file. A truncated last line left by a crash is
+    skipped; a malformed line anywhere else raises `ValueError`.
+    """
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            if line_number == len(lines) and not line.endswith("\n"):
+                continue
+            raise ValueError(f"{path}:{line_number}: malformed record") from e
+    return records
+
+
+def completed_ids(path, key="doc_id"):
+    """
+    Ids already stored in a JSONL file, as strings.
+    """
+    return {str(record[key]) for record in read_records(path) if key in record}
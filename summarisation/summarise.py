@@ -1,5 +1,10 @@
-import re, torch
-from model import ModelLoader
+import re, time, torch
+from transformers import LogitsProcessor, LogitsProcessorList, StoppingCriteria, StoppingCriteriaList
+from config import STOP_ON_DEGENERATION, MAX_NEW_TOK, TOKEN_BUDGETS, DATASET_TOKEN_BUDGETS
+from summary_cache import SummaryCache, model_identity
+from batching import bucket_by_length
+from profiling import profiler
+from degeneration import DegenerationStop, degeneration_settings
 
 SUMMARY_RE = re.compile(r"summary:assistant\s*(.*)", re.I | re.S)
 
@@ -54,23 +59,277 @@ Your summary should present a unified narrative that integrates these categories
         ]
 
 
-def generate_summary(text, model, tokenizer, reference=None,
-    model_name="phi-4",
-    device="cuda", dataset="inabs", type="eea"):
-    
+def build_prompt(text, tokenizer, type="eea", dataset="civilsum"):
     prompt_msgs = prompt_handler(text, type, dataset)
-    prompt = tokenizer.apply_chat_template(prompt_msgs,
+    return tokenizer.apply_chat_template(prompt_msgs,
         tokenize=False,
         add_generation_prompt=True)
+
+
+def prompt_overhead_tokens(tokenizer, type="eea", dataset="civilsum"):
+    """
+    Number of tokens the prompt template adds around the document text.
+    """
+    return len(tokenizer(build_prompt("", tokenizer, type, dataset))["input_ids"])
+
+
+PROMPT_TEXT_MARKER = "<<<document text>>>"
+
+def prompt_prefix(tokenizer, type="eea", dataset="civilsum"):
+    """
+    The rendered prompt up to where the document text starts, or None if the
+    prompt does not contain the text verbatim.
+    """
+    prompt = build_prompt(PROMPT_TEXT_MARKER, tokenizer, type, dataset)
+    if PROMPT_TEXT_MARKER not in prompt:
+        return None
+    return prompt.split(PROMPT_TEXT_MARKER)[0]
+
+
+def _budget_policy(type, dataset):
+    return {**TOKEN_BUDGETS.get(type, TOKEN_BUDGETS["abstract"]), **DATASET_TOKEN_BUDGETS.get((type, dataset), {})}
+
+
+def token_budget(type="eea", dataset="civilsum", input_tokens=None):
+    """
+    Max new tokens for one generation: the final-summary budget of the summary
+    type, or with `input_tokens`, the budget of a chunk (or group) summary of that
+    many tokens. See `config.TOKEN_BUDGETS`.
+    """
+    policy = _budget_policy(type, dataset)
+    if input_tokens is None:
+        budget = policy["final"]
+    else:
+        budget = min(max(int(policy["chunk_ratio"] * input_tokens), policy["chunk_min"]), policy["chunk_max"])
+    return min(budget, MAX_NEW_TOK)
+
+
+def max_token_budget(type="eea", dataset="civilsum"):
+    """
+    The largest budget any generation of this summary type can get, to reserve in the context.
+    """
+    policy = _budget_policy(type, dataset)
+    return min(max(policy["chunk_max"], policy["final"]), MAX_NEW_TOK)
+
+
+def generation_params(max_new_tokens=5000):
+    return {"max_new_tokens": max_new_tokens, "temperature": 0.6, "top_p": 0.9, "do_sample": False}
+
+
+def summary_cache_key(model, text, type="eea", dataset="civilsum", max_new_tokens=5000,
+    stop_on_degeneration=False):
+    params = generation_params(max_new_tokens)
+    if stop_on_degeneration:
+        # Early-stopped outputs differ from full ones, so they are cached apart
+        params["degeneration"] = degeneration_settings()
+    return SummaryCache.make_key(model_identity(model), prompt_handler(text, type, dataset), params)
+
+
+class _FirstStepTimer(LogitsProcessor):
+    """
+    Notes when generate() first asks for logits, i.e. when prefill has finished.
+    """
+
+    def __init__(self):
+        self.first_step = None
+
+    def __call__(self, input_ids, scores):
+        if self.first_step is None:
+            self.first_step = time.perf_counter()
+        return scores
+
+
+def _generate(model, tokens, **kwargs):
+    """
+    model.generate, recorded as generate/prefill/decode stages while profiling.
+    """
+    if not profiler.enabled:
+        return model.generate(**tokens, **kwargs)
+    timer = _FirstStepTimer()
+    start = time.perf_counter()
+    with profiler.stage("generate") as record:
+        out = model.generate(**tokens, logits_processor=LogitsProcessorList([timer]), **kwargs)
+    end = time.perf_counter()
+    prompt_length = tokens["input_ids"].shape[1]
+    tokens_in = int(tokens["attention_mask"].sum()) if "attention_mask" in tokens else tokens["input_ids"].numel()
+    new_tokens = out[:, prompt_length:]
+    pad_token_id = kwargs.get("pad_token_id")
+    tokens_out = int((new_tokens != pad_token_id).sum()) if pad_token_id is not None else new_tokens.numel()
+    record["tokens_in"], record["tokens_out"] = tokens_in, tokens_out
+    if timer.first_step is not None:
+        profiler.add("prefill", start, timer.first_step - start, tokens_in=tokens_in)
+        profiler.add("decode", timer.first_step, end - timer.first_step, tokens_out=tokens_out)
+    return out
+
+
+class _RowBudgetStop(StoppingCriteria):
+    """
+    Stops each row of a batch once it has its own number of new tokens.
+    """
+
+    def __init__(self, prompt_length, budgets):
+        self.prompt_length = prompt_length
+        self.budgets = budgets
+
+    def __call__(self, input_ids, scores, **kwargs):
+        budgets = torch.tensor(self.budgets, device=input_ids.device)
+        return (input_ids.shape[1] - self.prompt_length) >= budgets
+
+
+def stopping_kwargs(*criteria):
+    criteria = [criterion for criterion in criteria if criterion is not None]
+    return {"stopping_criteria": StoppingCriteriaList(criteria)} if criteria else {}
+
+
+def generate_summary(text, model, tokenizer, reference=None,
+    model_name="phi-4",
+    device="cuda", dataset="inabs", type="eea", max_new_tokens=None, prefix_cache=None, summary_cache=None,
+    stop_on_degeneration=STOP_ON_DEGENERATION):
+    
+    if max_new_tokens is None:
+        max_new_tokens = token_budget(type, dataset)
+    cache_key = None
+    if summary_cache is not None:
+        cache_key = summary_cache_key(model, text, type, dataset, max_new_tokens, stop_on_degeneration)
+        summary = summary_cache.get(cache_key)
+        if summary is not None:
+            return summary
+
+    prompt = build_prompt(text, tokenizer, type, dataset)
     
     with torch.inference_mode():
-        tokens = tokenizer(prompt, return_tensors='pt').to(device)
-        out = model.generate(**tokens,
-        max_new_tokens=5000,
-        temperature=0.6,
-        top_p=0.9,
-        do_sample=False)
+        tokens = None
+        if prefix_cache is not None:
+            tokens = prefix_cache.prepare(tokenizer, (type, dataset), prompt_prefix(tokenizer, type, dataset),
+                [tokenizer(prompt)["input_ids"]])
+        if tokens is None:
+            tokens = tokenizer(prompt, return_tensors='pt').to(device)
+        stop = DegenerationStop(tokens["input_ids"].shape[1], tokenizer) if stop_on_degeneration else None
+        out = _generate(model, tokens, **generation_params(max_new_tokens), **stopping_kwargs(stop))
         summary = _extract_summary(tokenizer.decode(out[0], skip_special_tokens=True))
+    if summary_cache is not None:
+        summary_cache.put(cache_key, summary, stop.reasons[0] if stop is not None and stop.reasons else None)
     if reference is None:
         return summary
-    return summary
\ No newline at end of file
+    return summary
+
+
+def deduplicate_requests(requests, tokenizer, budgets):
+    """
+    Drop requests that would repeat an earlier generation.
+
+    `requests` is a list of (key, text, type, dataset) for one model and one set
+    of generation settings, with a new-token budget per key in `budgets`. Two
+    requests are the same generation when their rendered prompts and budgets
+    match, e.g. the ea and abstract prompts of a chunk, which use the same
+    template. Returns the unique requests and {key: key that is generated} for
+    every request.
+    """
+    generated_as = {}
+    unique = []
+    served_from = {}
+    for request in requests:
+        key, text, type, dataset = request
+        identity = (build_prompt(text, tokenizer, type, dataset), budgets[key])
+        if identity not in generated_as:
+            generated_as[identity] = key
+            unique.append(request)
+        served_from[key] = generated_as[identity]
+    return unique, served_from
+
+
+def generate_summaries_batch(requests, model, tokenizer,
+    device="cuda", batch_size=8, max_batch_tokens=None, max_new_tokens=None, prefix_cache=None, summary_cache=None,
+    stop_on_degeneration=STOP_ON_DEGENERATION, stop_reasons=None, token_usage=None):
+    """
+    Generate summaries for many prompts at once.
+
+    `requests` is a list of (key, text, type, dataset), where the key is any hashable
+    id such as (doc_id, summary_type, chunk_idx). Prompts are bucketed by token
+    length, left-padded and generated together. Returns {key: summary}.
+
+    With a `PromptPrefixCache`, batches are formed per (type, dataset) and the
+    shared instruction prefix is taken from the cache instead of being prefilled.
+    With a `SummaryCache`, prompts it already holds are not generated again.
+
+    `max_new_tokens` is one budget for every request, a dict {key: budget}, or
+    None for the final-summary `token_budget` of each request's type. Every row
+    stops at its own budget, and with `max_batch_tokens` a batch is sized by its
+    prompt plus budget tokens, the most its KV cache can hold. If a `token_usage`
+    dict is given, it receives {key: (generated tokens, budget)}.
+
+    With `stop_on_degeneration`, each row stops as soon as it loops or starts
+    like a refusal (`degeneration.DegenerationStop`); if a `stop_reasons` dict is
+    given, it receives {key: reason} for every generated or cached key, None if
+    not stopped; cached summaries keep the reason they were stored with.
+    """
+    budgets = {}
+    for key, _, type, dataset in requests:
+        if isinstance(max_new_tokens, dict):
+            budgets[key] = max_new_tokens[key]
+        else:
+            budgets[key] = max_new_tokens if max_new_tokens is not None else token_budget(type, dataset)
+
+    summaries = {}
+    cache_keys = {}
+    if summary_cache is not None:
+        pending = []
+        for key, text, type, dataset in requests:
+            cache_key = summary_cache_key(model, text, type, dataset, budgets[key], stop_on_degeneration)
+            entry = summary_cache.get_entry(cache_key)
+            if entry is None:
+                cache_keys[key] = cache_key
+                pending.append((key, text, type, dataset))
+            else:
+                summaries[key] = entry[0]
+                if stop_on_degeneration and stop_reasons is not None:
+                    stop_reasons[key] = entry[1]
+        requests = pending
+    if not requests:
+        return summaries
+
+    keys = [key for key, _, _, _ in requests]
+    prompt_types = [(type, dataset) for _, _, type, dataset in requests]
+    with profiler.stage("tokenize") as record:
+        prompts = [build_prompt(text, tokenizer, type, dataset) for _, text, type, dataset in requests]
+        input_ids = tokenizer(prompts)["input_ids"]
+        record["tokens_out"] = sum(len(ids) for ids in input_ids)
+    lengths = [len(ids) + budgets[key] for ids, key in zip(input_ids, keys)]
+    groups = prompt_types if prefix_cache is not None else None
+
+    padding_side, pad_token = tokenizer.padding_side, tokenizer.pad_token
+    tokenizer.padding_side = "left"
+    if pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    try:
+        with torch.inference_mode():
+            for batch in bucket_by_length(lengths, batch_size, max_batch_tokens, groups):
+                tokens = None
+                if prefix_cache is not None:
+                    type, dataset = prompt_types[batch[0]]
+                    tokens = prefix_cache.prepare(tokenizer, (type, dataset), prompt_prefix(tokenizer, type, dataset),
+                        [input_ids[i] for i in batch])
+                if tokens is None:
+                    tokens = tokenizer([prompts[i] for i in batch], return_tensors='pt', padding=True).to(device)
+                prompt_length = tokens["input_ids"].shape[1]
+                batch_budgets = [budgets[keys[i]] for i in batch]
+                stop = DegenerationStop(prompt_length, tokenizer) if stop_on_degeneration else None
+                row_budgets = _RowBudgetStop(prompt_length, batch_budgets) if len(set(batch_budgets)) > 1 else None
+                out = _generate(model, tokens, **generation_params(max(batch_budgets)),
+                pad_token_id=tokenizer.pad_token_id, **stopping_kwargs(stop, row_budgets))
+                for row_idx, (i, row) in enumerate(zip(batch, out)):
+                    summaries[keys[i]] = _extract_summary(tokenizer.decode(row, skip_special_tokens=True))
+                    if token_usage is not None:
+                        generated = int((row[prompt_length:] != tokenizer.pad_token_id).sum())
+                        token_usage[keys[i]] = (generated, batch_budgets[row_idx])
+                    reason = stop.reasons[row_idx] if stop is not None and stop.reasons else None
+                    if stop is not None and stop_reasons is not None:
+                        stop_reasons[keys[i]] = reason
+                    if summary_cache is not None:
+                        summary_cache.put(cache_keys[keys[i]], summaries[keys[i]], reason)
+    finally:
+        tokenizer.padding_side = padding_side
+        if pad_token is None:
+            tokenizer.pad_token = None
+    return summaries
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+
+def model_identity(model):
+    """
+    Name the model was loaded from, used as part of the cache key.
+    """
+    config = getattr(model, "config", None)
+    return getattr(config, "_name_or_path", None) or type(model).__name__
+
+
+class SummaryCache:
+    """
+    Disk-backed cache of generated summaries, addressed by content.
+
+    The key is a hash of the model id, the prompt messages from `prompt_handler`
+    and the generation parameters, so any change to one of them is a miss. Entries
+    live in a SQLite file under `directory`; once their total size passes
+    `max_bytes` the least recently used ones are evicted. With `enabled=False`
+    every lookup misses and nothing is stored. Each entry also keeps the reason
+    its generation was stopped early, if it was (see `degeneration.DegenerationStop`).
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = None
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(os.path.join(directory, "summaries.sqlite"), timeout=60)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, summary TEXT, size INTEGER, last_access REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(entries)")}
+            if "stop_reason" not in columns:
+                # Caches written before stop reasons were stored
+                self.conn.execute("ALTER TABLE entries ADD COLUMN stop_reason TEXT")
+            self.conn.commit()
+
+    @staticmethod
+    def make_key(model_id, messages, params):
+        payload = json.dumps({"model": model_id, "messages": messages, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """
+        (summary, stop reason) stored under `key`, or None on a miss.
+        """
+        if not self.enabled:
+            self.misses += 1
+            return None
+        row = self.conn.execute("SELECT summary, stop_reason FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return row[0], row[1]
+
+    def put(self, key, summary, stop_reason=None):
+        if not self.enabled:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, summary, size, last_access, stop_reason) VALUES (?, ?, ?, ?, ?)",
+            (key, summary, len(summary.encode("utf-8")), time.time(), stop_reason),
+        )
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
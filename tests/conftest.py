@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules import each other flat, as the notebooks and benchmarks run them
+for path in ["summarisation", "extraction", "benchmarks"]:
+    sys.path.insert(0, os.path.join(ROOT, path))
+sys.path.insert(0, os.path.dirname(ROOT))
@@ -0,0 +1,92 @@
+"""
+`PhraseAutomaton` and `CueMatcher` against the original substring loops, offline.
+"""
+import random
+
+import nltk
+import pytest
+
+from categorical_corpus import categorical_phrases, categorical_pairs, add_case_variations, \
+    update_pairs_with_case_variations
+from cue_matcher import PhraseAutomaton, CueMatcher
+from legal_text import legal_document
+
+
+def substring_match(sentence, phrases, pairs):
+    """
+    The original per-phrase loops from `rank_by_categories`.
+    """
+    results = {category: {'score': 0, 'phrases': []} for category in list(phrases) + list(pairs)}
+    for category, category_phrases in phrases.items():
+        for phrase in category_phrases:
+            if phrase in sentence:
+                results[category]['score'] += 1
+                results[category]['phrases'].append(phrase)
+
+    for category, category_pairs in pairs.items():
+        for start_phrase, end_phrases in category_pairs.items():
+            if start_phrase in sentence:
+                start_index = sentence.find(start_phrase)
+                sentence_after_start = sentence[start_index + len(start_phrase):]
+                matched_end_phrases = [end_phrase for end_phrase in end_phrases if end_phrase in sentence_after_start]
+                results[category]['score'] += len(matched_end_phrases)
+                results[category]['phrases'].extend(matched_end_phrases)
+    return results
+
+
+def assert_same(expected, actual):
+    assert set(expected) == set(actual)
+    for category in expected:
+        assert actual[category]['score'] == expected[category]['score']
+        assert sorted(actual[category]['phrases']) == sorted(expected[category]['phrases'])
+
+
+def occurrences(text, patterns):
+    return sorted((pid, start, start + len(pattern)) for pid, pattern in enumerate(patterns)
+                  for start in range(len(text)) if text.startswith(pattern, start))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_automaton_finds_every_overlapping_occurrence(seed):
+    rnd = random.Random(seed)
+    patterns = ["a", "aa", "aba", "ba", "Ab", "bab", "b a", "aA"]
+    for _ in range(200):
+        text = "".join(rnd.choice("abA ") for _ in range(rnd.randint(0, 30)))
+        found = list(PhraseAutomaton(patterns).finditer(text))
+        assert [end for _, _, end in found] == sorted(end for _, _, end in found)
+        assert sorted(found) == occurrences(text, patterns)
+
+
+OVERLAPPING_PHRASES = {"X": ["of", "of the", "the", "court of"], "Y": ["The", "the court"], "Z": []}
+OVERLAPPING_PAIRS = {
+    "X": {"held": ["that", "held", "held that"]},
+    "Z": {"the": ["of", "the"], "of the": ["court"]},
+}
+OVERLAPPING_SENTENCES = [
+    "", "held", "held that held", "that held", "held that", "heldheld", "hel d that",
+    "the court of the court", "of the court of the", "The the", "the", "thethe of", "of the the court",
+    "HELD that the court held", "It was held that the order of the High Court of the State was held bad.",
+]
+
+
+@pytest.mark.parametrize("sentence", OVERLAPPING_SENTENCES)
+def test_overlapping_phrases_and_pairs(sentence):
+    matcher = CueMatcher(OVERLAPPING_PHRASES, OVERLAPPING_PAIRS)
+    assert_same(substring_match(sentence, OVERLAPPING_PHRASES, OVERLAPPING_PAIRS), matcher.match(sentence))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_original_on_legal_text(seed):
+    matcher = CueMatcher(categorical_phrases, categorical_pairs)
+    for sentence in nltk.sent_tokenize(legal_document(1500, seed=seed)):
+        assert_same(substring_match(sentence, categorical_phrases, categorical_pairs), matcher.match(sentence))
+
+
+def test_matches_original_with_case_variants():
+    phrases = {category: sorted(add_case_variations(values)) for category, values in categorical_phrases.items()}
+    pairs = {category: {start: sorted(ends) for start, ends in values.items()}
+             for category, values in update_pairs_with_case_variations(categorical_pairs).items()}
+    matcher = CueMatcher(phrases, pairs)
+    for sentence in nltk.sent_tokenize(legal_document(1500, seed=7)):
+        for variant in [sentence, sentence.lower(), sentence.upper(), sentence.capitalize()]:
+            assert_same(substring_match(variant, phrases, pairs), matcher.match(variant))
@@ -0,0 +1,141 @@
+"""
+`DegenerationStop` on hand-fed token streams and in batched generation with a
+tiny stand-in model, and its handling when generating through a server.
+"""
+import os
+
+import pytest
+import torch
+
+from _bootstrap import process_module
+from config import TOKEN_BUDGETS
+from degeneration import DegenerationStop
+from store import read_records
+from summarise import generate_summaries_batch, prompt_handler
+from tiny_lm import load_tiny_lm
+from bench_batched_generation import synthetic_document
+
+
+class WordTokenizer:
+    """
+    Token i is the word words[i]; 0 is padding and 1 the end of text.
+    """
+    pad_token_id = 0
+    eos_token_id = 1
+
+    def __init__(self, words):
+        self.words = ["<pad>", "<eos>"] + words
+        self.ids = {word: i for i, word in enumerate(self.words)}
+
+    def encode(self, text):
+        return [self.ids[word] for word in text.split()]
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(self.words[i] for i in ids if i > 1)
+
+
+TOKENIZER = WordTokenizer("i cannot summarise the appeal was dismissed with costs and allowed".split())
+PROMPT = TOKENIZER.encode("the appeal")
+
+
+def feed(stop, rows):
+    """
+    Call the criterion once per generated token, as generate() does; returns the step each row stopped at.
+    """
+    length = max(len(row) for row in rows)
+    padded = [row + [TOKENIZER.pad_token_id] * (length - len(row)) for row in rows]
+    stopped = [None] * len(rows)
+    for step in range(1, length + 1):
+        done = stop(torch.tensor([PROMPT + row[:step] for row in padded]), None)
+        for row, is_done in enumerate(done.tolist()):
+            if is_done and stopped[row] is None:
+                stopped[row] = step
+    return stopped
+
+
+def test_repetition_stops_each_row_on_its_own():
+    loop = TOKENIZER.encode("the appeal was dismissed " * 6)
+    clean = TOKENIZER.encode("the appeal was dismissed with costs and allowed")
+    stop = DegenerationStop(len(PROMPT), TOKENIZER, ngram_size=4, max_repeats=3, punt_window=50)
+    stopped = feed(stop, [loop, clean])
+    assert stop.reasons == ["repetition", None]
+    # The third "the appeal was dismissed" completes the third occurrence of the 4-gram
+    assert stopped == [12, None]
+
+
+def test_end_of_text_ends_tracking():
+    looping_after_end = TOKENIZER.encode("the appeal was dismissed") + [TOKENIZER.eos_token_id] \
+        + TOKENIZER.encode("the appeal was dismissed " * 4)
+    stop = DegenerationStop(len(PROMPT), TOKENIZER, ngram_size=4, max_repeats=2, punt_window=50)
+    assert feed(stop, [looping_after_end]) == [None]
+    assert stop.reasons == [None]
+
+
+@pytest.mark.parametrize("reply, reason", [
+    ("i cannot summarise the appeal", "punt"),
+    ("the appeal i cannot summarise", None),
+    ("i cannot", None),
+])
+def test_punt_is_checked_once_the_window_is_full(reply, reason):
+    stop = DegenerationStop(len(PROMPT), TOKENIZER, ngram_size=4, max_repeats=3, punt_window=5,
+                            punt_prefixes=["I cannot"])
+    stopped = feed(stop, [TOKENIZER.encode(reply)])
+    assert stop.reasons == [reason]
+    assert stopped == [5 if reason else None]
+
+
+def test_stopped_rows_are_prefixes_of_the_full_output():
+    documents = [synthetic_document(seed, n_sentences=6) for seed in range(4)]
+    model, tokenizer = load_tiny_lm(documents + [m["content"] for m in prompt_handler("", "abstract")], seed=1)
+    requests = [(i, document, "abstract", "civilsum") for i, document in enumerate(documents)]
+
+    full = generate_summaries_batch(requests, model, tokenizer, device="cpu", max_new_tokens=160,
+                                    stop_on_degeneration=False)
+    reasons = {}
+    stopped = generate_summaries_batch(requests, model, tokenizer, device="cpu", max_new_tokens=160,
+                                       stop_on_degeneration=True, stop_reasons=reasons)
+    assert set(reasons) == set(full)
+    assert any(reason == "repetition" for reason in reasons.values())
+    for key in full:
+        if reasons[key] is None:
+            assert stopped[key] == full[key]
+        else:
+            assert len(stopped[key]) < len(full[key]) and full[key].startswith(stopped[key])
+
+
+class StubClient:
+    """
+    Stands in for `GenerationClient`, answering every request with the start of its text.
+    """
+
+    def __init__(self, url):
+        self.url = url
+
+    def generate_summaries(self, generation_requests, max_new_tokens=None):
+        return {key: " ".join(text.split()[:5]) for key, text, _, _ in generation_requests}
+
+
+def test_generation_server_runs_without_degeneration_stop(tmp_path, monkeypatch, capsys):
+    process = process_module()
+
+    source = tmp_path / "judgments"
+    source.mkdir()
+    for i in range(3):
+        (source / f"case{i}.txt").write_text(synthetic_document(i, n_sentences=8), encoding="utf-8")
+    _, tokenizer = load_tiny_lm([synthetic_document(i, n_sentences=8) for i in range(3)])
+    monkeypatch.setattr(process, "GenerationClient", StubClient)
+    monkeypatch.setattr(process.AutoTokenizer, "from_pretrained", lambda name: tokenizer)
+    for summary_type in ["eea", "ea", "abstract"]:
+        monkeypatch.setitem(TOKEN_BUDGETS, summary_type, {"chunk_ratio": 0, "chunk_min": 16, "chunk_max": 16, "final": 16})
+
+    output_csv = str(tmp_path / "out.csv")
+    process.process_dataset("inabs", "phi-4", output_csv, source=str(source), extraction_workers=1,
+                            run_metrics=False, summary_cache_dir=str(tmp_path / "summary_cache"),
+                            generation_url="http://127.0.0.1:1", stop_on_degeneration=True)
+
+    out = capsys.readouterr().out
+    assert "stop_on_degeneration is not supported by the generation server" in out
+    assert "Generations stopped early" not in out
+    records = read_records(os.path.splitext(output_csv)[0] + ".generations.jsonl")
+    assert len(records) == 3
+    assert all(record[f"{summary_type}_early_stops"] == 0 for record in records for summary_type in ["eea", "ea", "abstract"])
@@ -0,0 +1,46 @@
+"""
+Extraction with a corpus `IdfIndex` scores the same on one worker as on a pool.
+"""
+import pytest
+
+from _bootstrap import repo_module
+from legal_text import legal_document
+
+extractive = repo_module("summarisation.extractive")
+IdfIndex = repo_module("extraction.idf_index").IdfIndex
+
+DOCUMENTS = [legal_document(400, seed=seed) for seed in range(4)]
+
+
+def extract(index, workers):
+    return list(extractive.extract_batch(DOCUMENTS, 0.1, workers=workers, idf_index=index))
+
+
+def test_pool_uses_the_same_index(tmp_path):
+    index = IdfIndex(str(tmp_path))
+    index.add_documents(DOCUMENTS, doc_ids=range(len(DOCUMENTS)))
+    index.save()
+    assert extract(index, workers=2) == extract(index, workers=1)
+
+
+def test_pool_rejects_unsaved_changes(tmp_path):
+    index = IdfIndex(str(tmp_path))
+    index.add_documents(DOCUMENTS[:2], doc_ids=[0, 1])
+    with pytest.raises(ValueError, match="unsaved"):
+        extract(index, workers=2)
+    index.save()
+    index.add_documents(DOCUMENTS[2:], doc_ids=[2, 3])
+    with pytest.raises(ValueError, match="unsaved"):
+        extract(index, workers=2)
+
+
+def test_pool_rejects_stale_index(tmp_path):
+    index = IdfIndex(str(tmp_path))
+    index.add_documents(DOCUMENTS[:2], doc_ids=[0, 1])
+    index.save()
+    stale = IdfIndex.load(str(tmp_path))
+    index.add_documents(DOCUMENTS[2:], doc_ids=[2, 3])
+    index.save()
+    with pytest.raises(ValueError, match="load it again"):
+        extract(stale, workers=2)
+    assert extract(IdfIndex.load(str(tmp_path)), workers=2) == extract(index, workers=1)
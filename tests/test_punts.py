@@ -0,0 +1,85 @@
+"""
+Batched `detect_punts` against the per-response `is_punt_response`, with a stub encoder.
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from punts import generic_punts, is_punt_response, detect_punts, analyze_punts_and_repetitions, \
+    analyze_punts_and_repetitions_from_csv
+
+
+class HashingEncoder:
+    """
+    Bag-of-words vectors hashed into a few dimensions; texts containing "\\x00" fail to encode.
+    """
+    dim = 16
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls += 1
+        if any("\x00" in text for text in texts):
+            raise ValueError("cannot encode")
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode("utf-8")) % self.dim] += 1
+        return vectors
+
+
+RESPONSES = generic_punts[:3] + [
+    "I cannot provide a summary.",
+    "Please consult a professional lawyer about this.",
+    "The appellant was convicted under section 302 and the appeal was dismissed.",
+    "The High Court set aside the decree and remanded the suit for fresh trial.",
+    "Costs of the appeal were awarded to the respondent.",
+    "",
+    "broken \x00 response",
+    "The appellant was convicted under section 302 and the appeal was dismissed.",
+]
+
+
+def frame():
+    return pd.DataFrame({
+        "eea_summary": RESPONSES,
+        "ea_summary": list(reversed(RESPONSES)),
+    })
+
+
+def test_detect_punts_matches_is_punt_response():
+    model = HashingEncoder()
+    generic_embeddings = model.encode(generic_punts)
+    df = detect_punts(frame(), ["eea_summary", "ea_summary"], model, generic_embeddings, batch_size=4)
+    for col in ["eea_summary", "ea_summary"]:
+        expected = [is_punt_response(response, model, generic_embeddings) for response in df[col]]
+        assert df[f"{col}_punt"].tolist() == expected
+    assert df["eea_summary_punt"].any() and not df["eea_summary_punt"].all()
+    assert np.isnan(df["eea_summary_punt_similarity"].iloc[RESPONSES.index("broken \x00 response")])
+
+
+def test_annotate_leaves_frame_unless_asked():
+    model = HashingEncoder()
+    generic_embeddings = model.encode(generic_punts)
+    df = frame()
+    counts = analyze_punts_and_repetitions(df, model, generic_embeddings, summary_cols=["eea_summary"])
+    assert list(df.columns) == ["eea_summary", "ea_summary"]
+    assert counts["eea_summary"]["total"] == len(RESPONSES)
+
+    analyze_punts_and_repetitions(df, model, generic_embeddings, summary_cols=["eea_summary"], annotate=True)
+    assert int(df["eea_summary_punt"].sum()) == counts["eea_summary"]["punt_count"]
+
+
+def test_csv_annotated_output(tmp_path):
+    model = HashingEncoder()
+    generic_embeddings = model.encode(generic_punts)
+    csv_path, annotated_path = tmp_path / "results.csv", tmp_path / "annotated.csv"
+    frame().to_csv(csv_path, index=False)
+    counts = analyze_punts_and_repetitions_from_csv(csv_path, model, generic_embeddings,
+        summary_cols=["eea_summary", "ea_summary"], annotated_csv=annotated_path)
+    annotated = pd.read_csv(annotated_path)
+    for col in ["eea_summary", "ea_summary"]:
+        assert int(annotated[f"{col}_punt"].sum()) == counts[col]["punt_count"]
+        assert f"{col}_jaccard_repetition" in annotated
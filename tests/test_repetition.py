@@ -0,0 +1,64 @@
+"""
+`jaccard_repetition` against the original all-pairs comparison, at several thresholds.
+"""
+import random
+
+import pytest
+from nltk.tokenize import sent_tokenize
+
+from repetition import jaccard_repetition
+from legal_text import generated_summary
+
+
+def original_pairs(text, threshold):
+    """
+    Every pair the original all-pairs `has_jaccard_repetition` compares and finds above `threshold`.
+    """
+    sentences = sent_tokenize(text)
+    pairs = []
+    for i in range(len(sentences)):
+        for j in range(i + 1, len(sentences)):
+            set1 = set(sentences[i].lower().split())
+            set2 = set(sentences[j].lower().split())
+            if len(set1 | set2) == 0:
+                continue
+            if len(set1 & set2) / len(set1 | set2) > threshold:
+                pairs.append((i, j))
+    return pairs
+
+
+def edited_repeats(n_words, seed):
+    """
+    A summary whose sentences come back with a few words dropped, so repeated pairs span many similarities.
+    """
+    rnd = random.Random(seed)
+    sentences = sent_tokenize(generated_summary(n_words, seed=seed))
+    for sentence in list(sentences):
+        words = sentence.split()
+        if rnd.random() < 0.3 and len(words) > 4:
+            sentences.append(" ".join(word for word in words if rnd.random() > 0.4))
+    rnd.shuffle(sentences)
+    return " ".join(sentences)
+
+
+TEXTS = [
+    generated_summary(2000, seed=0),
+    generated_summary(2000, seed=1, repeat_every=10),
+    edited_repeats(2000, seed=2),
+    edited_repeats(3000, seed=3),
+]
+
+
+@pytest.mark.parametrize("threshold", [0.2, 0.4, 0.5, 0.6, 0.8, 0.95])
+@pytest.mark.parametrize("text", TEXTS, ids=["clean", "looping", "edited", "edited_long"])
+def test_matches_original(text, threshold):
+    # Well above exact_below, so LSH candidates are used wherever the threshold allows
+    assert len(set(sentence.lower() for sentence in sent_tokenize(text))) > 64
+    assert jaccard_repetition(text, threshold).pairs == original_pairs(text, threshold)
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.95])
+def test_max_pairs_finds_repetition(threshold):
+    for text in TEXTS:
+        found = bool(jaccard_repetition(text, threshold, max_pairs=1).pairs)
+        assert found == bool(original_pairs(text, threshold))
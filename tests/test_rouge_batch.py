@@ -0,0 +1,47 @@
+"""
+`rouge_scores_columns` against one `RougeScorer.score` call per pair and per
+summary column: every precision, recall and F value must be exactly equal.
+"""
+import pytest
+from rouge_score import rouge_scorer
+
+from rouge_batch import rouge_scores_columns
+from legal_text import generated_summary
+
+ROUGE_TYPES = ["rouge1", "rouge2", "rougeL"]
+EDGE_CASES = [
+    ("", "The appeal is dismissed."),
+    ("The appeal is dismissed.", ""),
+    ("", ""),
+    ("!!! ... ???", "section 302 IPC"),
+    ("Section 302 I.P.C. applies; appeal allowed.", "section 302 ipc applies appeal allowed"),
+    ("running runs ran runner", "run running runs"),
+    ("Müller’s appeal — allowed.", "muller s appeal allowed"),
+]
+
+
+def summary_columns(docs=40):
+    references = [generated_summary(120, seed=seed) for seed in range(docs)]
+    columns = {
+        name: [generated_summary(80, seed=10_000 * (k + 1) + seed, repeat_every=5 if k == 2 else 0)
+               for seed in range(docs)]
+        for k, name in enumerate(["eea_summary", "ea_summary", "abstract"])
+    }
+    # Identical candidates across columns, as happens when two summary types agree
+    columns["ea_summary"][::5] = columns["eea_summary"][::5]
+    references += [r for r, _ in EDGE_CASES]
+    for name in columns:
+        columns[name] += [g for _, g in EDGE_CASES]
+    return columns, references
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_matches_rouge_score(workers):
+    columns, references = summary_columns()
+    scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, use_stemmer=True)
+    batched = rouge_scores_columns(columns, references, ROUGE_TYPES, workers=workers)
+    for name, generated in columns.items():
+        for g, r, got in zip(generated, references, batched[name]):
+            want = scorer.score(r, g)
+            for rouge_type in ROUGE_TYPES:
+                assert tuple(want[rouge_type]) == tuple(got[rouge_type]), (name, rouge_type, g, r)
@@ -0,0 +1,106 @@
+"""
+Local sharded runs and multi-node sweeps with a stand-in generator, and shards
+run through the real per-document pipeline with a tiny stand-in model: merging
+the shard files must give every document of the split exactly once, in split
+order.
+"""
+import os
+from functools import partial
+
+from _bootstrap import repo_module, process_module
+from config import MODELS, TOKEN_BUDGETS
+from dataset import DatasetHandler
+from store import append_record
+from summarise import prompt_handler
+from tiny_lm import load_tiny_lm
+
+sharded = repo_module("summarisation.sharded")
+
+DATASET = "inabs"
+MODEL = next(iter(MODELS))
+
+
+def stub_shard(dataset_name, model_key, output_csv, shard_index, num_shards, source=None, extraction_workers=None,
+    **kwargs):
+    """
+    Writes what `run_shard` would, with the first words of each judgment as its summaries.
+    """
+    path = sharded.shard_generations_path(output_csv, shard_index, num_shards)
+    for doc_id, text, reference in DatasetHandler().iter_documents(
+        dataset_name, source=source, shard_index=shard_index, num_shards=num_shards
+    ):
+        summary = " ".join(text.split()[:5])
+        append_record(path, {"dataset": dataset_name, "model": model_key, "doc_id": doc_id,
+                             "reference_summary": reference, "eea_summary": summary, "ea_summary": summary,
+                             "abstract": summary, "shard": shard_index, "extraction_workers": extraction_workers})
+
+
+def judgments(directory, n=23):
+    os.makedirs(directory)
+    for i in range(n):
+        with open(os.path.join(directory, f"case{i:03d}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Judgment {i}. The appeal number {i} is dismissed with costs.")
+    return sorted(os.listdir(directory))
+
+
+def test_run_sharded_merges_every_document_once(tmp_path):
+    source = str(tmp_path / "judgments")
+    doc_ids = judgments(source)
+    num_shards = 3
+
+    merged = sharded.run_sharded(DATASET, MODEL, str(tmp_path / "out.csv"), num_shards, run_metrics=False,
+                                 shard_fn=stub_shard, source=source)
+
+    assert [record["doc_id"] for record in merged] == doc_ids
+    assert len({record["shard"] for record in merged}) == num_shards
+    assert {record["extraction_workers"] for record in merged} == {max(1, (os.cpu_count() or 1) // num_shards)}
+
+
+def test_sweep_nodes_merge_every_document_once(tmp_path, monkeypatch):
+    source = str(tmp_path / "judgments")
+    doc_ids = judgments(source)
+    output_dir = str(tmp_path / "sweep")
+    monkeypatch.setattr(sharded, "run_shard", stub_shard)
+
+    num_nodes, num_shards = 2, 3
+    for node_index in range(num_nodes):
+        sharded.run_sweep_node(node_index, num_nodes, output_dir, datasets=[DATASET], models=[MODEL],
+                               num_shards=num_shards, source=source)
+    sharded.merge_sweep(output_dir, datasets=[DATASET], models=[MODEL], num_shards=num_shards, source=source,
+                        run_metrics=False)
+
+    merged = sharded.read_records(os.path.splitext(sharded.sweep_output_csv(output_dir, DATASET, MODEL))[0]
+                                  + ".generations.jsonl")
+    assert [record["doc_id"] for record in merged] == doc_ids
+
+
+class TinyModelLoader:
+    """
+    Stands in for `model.ModelLoader`, loading the tiny CPU model of the benchmarks.
+    """
+
+    def load_model(self, model_name, max_length):
+        corpus = [f"Judgment {i}. The appeal number {i} is dismissed with costs." for i in range(23)]
+        return load_tiny_lm(corpus + [m["content"] for m in prompt_handler("", "abstract")])
+
+
+def test_run_shard_generates_every_document_once(tmp_path, monkeypatch):
+    source = str(tmp_path / "judgments")
+    doc_ids = judgments(source, n=7)
+    output_csv = str(tmp_path / "out.csv")
+    process = process_module()
+    monkeypatch.setattr(process, "ModelLoader", TinyModelLoader)
+    # process_dataset generates and prefills prompt prefixes on the default "cuda" device
+    monkeypatch.setattr(process, "chunked_generate_summaries", partial(process.chunked_generate_summaries, device="cpu"))
+    monkeypatch.setattr(process, "PromptPrefixCache", partial(process.PromptPrefixCache, device="cpu"))
+    for summary_type in ["eea", "ea", "abstract"]:
+        monkeypatch.setitem(TOKEN_BUDGETS, summary_type, {"chunk_ratio": 0, "chunk_min": 8, "chunk_max": 8, "final": 8})
+
+    num_shards = 2
+    for shard_index in range(num_shards):
+        sharded.run_shard(DATASET, MODEL, output_csv, shard_index, num_shards, source=source, extraction_workers=1,
+                          summary_cache_dir=str(tmp_path / "summary_cache"))
+    merged = sharded.merge_shards(DATASET, MODEL, output_csv, num_shards, source=source, run_metrics=False)
+
+    assert [record["doc_id"] for record in merged] == doc_ids
+    assert all(record[column] for record in merged for column in ["eea_summary", "ea_summary", "abstract"])
@@ -0,0 +1,22 @@
+"""
+Crash recovery of the JSONL generation store.
+"""
+import pytest
+
+from store import append_record, read_records, completed_ids
+
+
+def test_append_after_partial_line(tmp_path):
+    path = tmp_path / "generations.jsonl"
+    path.write_text('{"doc_id": 1}\n{"doc_id": 2, "summary": "cut sho', encoding="utf-8")
+    assert completed_ids(str(path)) == {"1"}
+
+    append_record(str(path), {"doc_id": 2, "summary": "regenerated"})
+    assert read_records(str(path)) == [{"doc_id": 1}, {"doc_id": 2, "summary": "regenerated"}]
+
+
+def test_malformed_line_before_the_end_raises(tmp_path):
+    path = tmp_path / "generations.jsonl"
+    path.write_text('{"doc_id": 1}\n{"doc_id": 2\n{"doc_id": 3}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=":2:"):
+        read_records(str(path))
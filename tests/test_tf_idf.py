@@ -0,0 +1,59 @@
+"""
+`calculate_tf_idf` against the original per-word definition, offline.
+"""
+from math import log
+
+import nltk
+import pytest
+from nltk.corpus import stopwords
+
+from tf_idf import calculate_tf_idf, substring_counts
+from legal_text import legal_document
+
+
+def original_tf_idf(text):
+    """
+    The original quadratic `calculate_tf_idf`.
+    """
+    text = ' '.join(text)
+    words = nltk.word_tokenize(text)
+    stop_words = set(stopwords.words('english'))
+
+    total_sentences = len(nltk.sent_tokenize(text))
+    tf_idf_scores = {}
+    for word in set(words):
+        if word.lower() not in stop_words:
+            tf = text.lower().count(word.lower())
+            di = sum(1 for sent in nltk.sent_tokenize(text) if word.lower() in sent.lower())
+            di = di if di != 0 else 0.5
+            idf = log(total_sentences / di)
+            tf_idf_scores[word.lower()] = tf * idf
+
+    return tf_idf_scores
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_original_on_legal_text(seed):
+    sentences = nltk.sent_tokenize(legal_document(1500, seed=seed))
+    assert calculate_tf_idf(sentences) == original_tf_idf(sentences)
+
+
+@pytest.mark.parametrize("sentences", [
+    ["Der Beklagte zahlte 500 € an Müller.", "Straße und STRASSE sind nicht gleich."],
+    ["İstanbul court held ΣΊΣΥΦΟΣ liable.", "The ﬁnal order was stayed — costs to the appellant."],
+    ["The appellant's counsel (Mr. Rao) relied on § 34.", "“Held”: the appeal is dismissed."],
+])
+def test_matches_original_on_unicode(sentences):
+    assert calculate_tf_idf(sentences) == original_tf_idf(sentences)
+
+
+@pytest.mark.parametrize("sentences", [[], [""], ["   "], ["the of and"]])
+def test_empty_input(sentences):
+    assert calculate_tf_idf(sentences) == original_tf_idf(sentences) == {}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_substring_counts_match_str_count(seed):
+    text = legal_document(800, seed=seed)
+    terms = list(dict.fromkeys(text.lower().split())) + ["aa", "a a", "the the"]
+    assert substring_counts(text, terms).tolist() == [text.lower().count(term) for term in terms]